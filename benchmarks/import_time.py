@@ -0,0 +1,71 @@
+"""
+Measures how long it takes to import pb4py and to start the pb4.py CLI. Each
+command is run in a fresh interpreter several times and the best and median
+wall clock times are written as JSON:
+
+	python -m benchmarks.import_time --runs 20 --output startup.json
+
+A bare interpreter start is included so it can be subtracted out.
+"""
+
+import argparse
+import collections
+import json
+import os
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+CLI  = os.path.join(ROOT, 'scripts', 'pb4.py')
+
+COMMANDS = collections.OrderedDict([
+	('python',                [sys.executable, '-c', 'pass']),
+	('import pb4py',          [sys.executable, '-c', 'import pb4py']),
+	('import pb4py.Client',   [sys.executable, '-c', 'import pb4py; pb4py.Client']),
+	('pb4.py --help',         [sys.executable, CLI, '--help']),
+	('pb4.py generate-config', [sys.executable, CLI, 'generate-config']),
+	('pb4.py pushes --help',  [sys.executable, CLI, 'pushes', '--help']),
+])
+
+def time_command(command, runs):
+	env = dict(os.environ)
+	env['PYTHONPATH'] = os.pathsep.join(filter(None, [ROOT, env.get('PYTHONPATH')]))
+
+	timings = []
+	for _ in range(runs):
+		started = time.time()
+		subprocess.check_call(command, env = env, stdout = subprocess.DEVNULL)
+		timings.append(time.time() - started)
+
+	timings.sort()
+
+	return {
+		'best':   timings[0],
+		'median': timings[len(timings) // 2],
+	}
+
+def main():
+	parser = argparse.ArgumentParser(description = 'Measure pb4py import and CLI start up times')
+	parser.add_argument('--runs',   type = int, default = 10, help = 'Times each command is run')
+	parser.add_argument('--output', default = None,           help = 'File to write the JSON results to (default stdout)')
+	args = parser.parse_args()
+
+	report = {
+		'python':  sys.version.split()[0],
+		'runs':    args.runs,
+		'results': collections.OrderedDict(
+			(name, time_command(command, args.runs))
+			for name, command in COMMANDS.items()
+		),
+	}
+
+	if args.output:
+		with open(args.output, 'w') as fh:
+			json.dump(report, fh, indent = 2)
+	else:
+		json.dump(report, sys.stdout, indent = 2)
+		print()
+
+if __name__ == '__main__':
+	main()
@@ -0,0 +1,447 @@
+"""
+A local stand-in for the PushBullet /v2 API and realtime event stream, used by
+the benchmarks. It keeps everything in memory, can add latency to every
+request and can fail a fraction of them with a 503.
+
+	python -m benchmarks.mock_server --port 8080 --pushes 1000
+"""
+
+import argparse
+import base64
+import hashlib
+import itertools
+import json
+import socket
+import struct
+import random
+import threading
+import time
+import urllib.parse
+import uuid
+
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from socketserver import BaseRequestHandler, ThreadingMixIn, TCPServer
+
+WEBSOCKET_GUID = '258EAFA5-E914-47DA-95CA-C5AB0DC85B11'
+
+COLLECTIONS = ['pushes', 'devices', 'contacts', 'subscriptions']
+
+class MockState(object):
+	"""
+	The data served by the mock API.
+	"""
+
+	def __init__(self, pushes = 0, devices = 0, contacts = 0, subscriptions = 0):
+		self.lock     = threading.Lock()
+		self.counter  = itertools.count(1)
+		self.requests = 0
+		self.uploaded = 0
+		self.clock    = time.time()
+		self.data     = {name: [] for name in COLLECTIONS}
+
+		for _ in range(devices):
+			self.create('devices', {'nickname': 'device', 'type': 'stream'})
+
+		for _ in range(contacts):
+			self.create('contacts', {'name': 'contact', 'email': 'contact@example.com'})
+
+		for _ in range(subscriptions):
+			self.create('subscriptions', {'channel': {'tag': 'tag', 'name': 'channel'}})
+
+		for _ in range(pushes):
+			self.create('pushes', {
+				'type':                      'note',
+				'dismissed':                 False,
+				'guid':                      uuid.uuid4().hex,
+				'direction':                 'self',
+				'title':                     'title',
+				'body':                      'body',
+				'sender_iden':               'u1',
+				'sender_email':              'sender@example.com',
+				'sender_email_normalized':   'sender@example.com',
+				'sender_name':               'Sender',
+				'receiver_iden':             'u1',
+				'receiver_email':            'sender@example.com',
+				'receiver_email_normalized': 'sender@example.com',
+				'source_device_iden':        'd1',
+				'awake_app_guids':           ['extension-1'],
+			})
+
+	def tick(self):
+		# Modification times are unique and follow the wall clock, like the API's
+		self.clock = max(self.clock + 0.001, time.time())
+
+		return self.clock
+
+	def create(self, collection, fields):
+		with self.lock:
+			now  = self.tick()
+			elem = {
+				'iden':     '{}{}'.format(collection[0], next(self.counter)),
+				'active':   True,
+				'created':  now,
+				'modified': now,
+			}
+			elem.update(fields)
+
+			self.data[collection].append(elem)
+
+			return dict(elem)
+
+	def find(self, collection, iden):
+		for elem in self.data[collection]:
+			if elem['iden'] == iden and elem['active']:
+				return elem
+
+		return None
+
+	def update(self, collection, iden, fields):
+		with self.lock:
+			elem = self.find(collection, iden)
+			if elem is None:
+				return None
+
+			elem.update(fields)
+			elem['modified'] = self.tick()
+
+			return dict(elem)
+
+	def delete(self, collection, iden):
+		with self.lock:
+			elem = self.find(collection, iden)
+			if elem is None:
+				return False
+
+			for key in list(elem.keys()):
+				if key not in ('iden', 'created'):
+					del elem[key]
+
+			elem['active']   = False
+			elem['modified'] = self.tick()
+
+			return True
+
+	def delete_all(self, collection):
+		with self.lock:
+			idens = [elem['iden'] for elem in self.data[collection] if elem['active']]
+
+		for iden in idens:
+			self.delete(collection, iden)
+
+	def page(self, collection, modified_after = 0.0, active = False, limit = 500, cursor = None):
+		"""
+		Return a page of elements sorted by modification time, newest first,
+		the way the real API does.
+		"""
+
+		with self.lock:
+			elems = sorted(
+				(
+					elem for elem in self.data[collection]
+					if elem['modified'] > modified_after and (elem['active'] or not active)
+				),
+				key     = lambda elem: elem['modified'],
+				reverse = True,
+			)
+
+		start = int(cursor) if cursor else 0
+		end   = start + limit
+
+		return [dict(elem) for elem in elems[start:end]], (str(end) if end < len(elems) else None)
+
+def make_handler(state, latency = 0.0, error_rate = 0.0):
+	class MockHandler(BaseHTTPRequestHandler):
+		protocol_version = 'HTTP/1.1'
+
+		# The headers and body are written separately, without this every
+		# response waits on the client's delayed ACK
+		disable_nagle_algorithm = True
+
+		def log_message(self, *args):
+			pass
+
+		def _reply(self, status, body = None, headers = None):
+			payload = json.dumps(body).encode('utf-8') if body is not None else b''
+
+			self.send_response(status)
+			self.send_header('Content-Type',   'application/json')
+			self.send_header('Content-Length', str(len(payload)))
+			for key, value in (headers or {}).items():
+				self.send_header(key, value)
+			self.end_headers()
+
+			self.wfile.write(payload)
+
+		def _read_body(self):
+			length = int(self.headers.get('Content-Length') or 0)
+			if length:
+				return self.rfile.read(length)
+
+			if self.headers.get('Transfer-Encoding', '').lower() == 'chunked':
+				chunks = []
+				while True:
+					size = int(self.rfile.readline().strip(), 16)
+					if size == 0:
+						self.rfile.readline()
+						break
+					chunks.append(self.rfile.read(size))
+					self.rfile.readline()
+
+				return b''.join(chunks)
+
+			return b''
+
+		def _fields(self, body):
+			if not body:
+				return {}
+
+			if 'json' in (self.headers.get('Content-Type') or ''):
+				return json.loads(body.decode('utf-8'))
+
+			return {
+				key: values[-1]
+				for key, values in urllib.parse.parse_qs(body.decode('utf-8')).items()
+			}
+
+		def _handle(self, method):
+			with state.lock:
+				state.requests += 1
+
+			if latency:
+				time.sleep(latency)
+
+			body  = self._read_body()
+			parts = urllib.parse.urlparse(self.path)
+			path  = parts.path.rstrip('/').split('/')[1:]
+			query = {key: values[-1] for key, values in urllib.parse.parse_qs(parts.query).items()}
+
+			if error_rate and random.random() < error_rate:
+				return self._reply(503, {'error': {'message': 'Injected failure'}})
+
+			if path == ['upload']:
+				state.uploaded += len(body)
+
+				return self._reply(204)
+
+			if len(path) < 2 or path[0] != 'v2':
+				return self._reply(404, {'error': {'message': 'Not found'}})
+
+			resource = path[1]
+			iden     = path[2] if len(path) > 2 else None
+			fields   = self._fields(body)
+
+			if resource == 'users' and iden == 'me':
+				return self._reply(200, {'iden': 'u1', 'email': 'me@example.com', 'name': 'Me'})
+
+			if resource == 'channel-info':
+				return self._reply(200, {
+					'iden':             'c1',
+					'tag':              query.get('tag'),
+					'name':             'Channel',
+					'subscriber_count': 1,
+				})
+
+			if resource == 'upload-request':
+				host = self.headers.get('Host')
+
+				return self._reply(200, {
+					'file_name':  fields.get('file_name'),
+					'file_type':  fields.get('file_type'),
+					'file_url':   'http://{}/files/{}'.format(host, fields.get('file_name')),
+					'upload_url': 'http://{}/upload'.format(host),
+				})
+
+			if resource not in COLLECTIONS:
+				return self._reply(404, {'error': {'message': 'Not found'}})
+
+			if method == 'GET' and iden is None:
+				elems, cursor = state.page(
+					resource,
+					modified_after = float(query.get('modified_after', 0)),
+					active         = query.get('active') == 'true',
+					limit          = int(query.get('limit', 500)),
+					cursor         = query.get('cursor'),
+				)
+
+				resp = {resource: elems}
+				if cursor:
+					resp['cursor'] = cursor
+
+				return self._reply(200, resp, {'X-Ratelimit-Limit': '16384', 'X-Ratelimit-Remaining': '16000'})
+
+			if method == 'POST' and iden is None:
+				return self._reply(200, state.create(resource, fields))
+
+			if method == 'POST':
+				elem = state.update(resource, iden, fields)
+
+				return self._reply(200, elem) if elem else self._reply(404, {'error': {'message': 'Not found'}})
+
+			if method == 'DELETE' and iden is None:
+				state.delete_all(resource)
+
+				return self._reply(200, {})
+
+			if method == 'DELETE':
+				found = state.delete(resource, iden)
+
+				return self._reply(200, {}) if found else self._reply(404, {'error': {'message': 'Not found'}})
+
+			return self._reply(405, {'error': {'message': 'Method not allowed'}})
+
+		def do_GET(self):
+			self._handle('GET')
+
+		def do_POST(self):
+			self._handle('POST')
+
+		def do_DELETE(self):
+			self._handle('DELETE')
+
+	return MockHandler
+
+class MockServer(ThreadingMixIn, HTTPServer):
+	"""
+	Threaded mock API server. Use as a context manager to run it in a
+	background thread.
+	"""
+
+	daemon_threads      = True
+	request_queue_size  = 1024
+	allow_reuse_address = True
+
+	def __init__(self, state = None, latency = 0.0, error_rate = 0.0, host = '127.0.0.1', port = 0):
+		self.state = state or MockState()
+
+		HTTPServer.__init__(self, (host, port), make_handler(self.state, latency, error_rate))
+
+	@property
+	def api_root(self):
+		return 'http://{}:{}'.format(*self.server_address)
+
+	def __enter__(self):
+		self._thread = threading.Thread(target = self.serve_forever)
+		self._thread.daemon = True
+		self._thread.start()
+
+		return self
+
+	def __exit__(self, exc_type, exc_value, traceback):
+		self.shutdown()
+		self.server_close()
+
+class StreamHandler(BaseRequestHandler):
+	def handle(self):
+		request = b''
+		while b'\r\n\r\n' not in request:
+			chunk = self.request.recv(4096)
+			if not chunk:
+				return
+			request += chunk
+
+		headers = {}
+		for line in request.decode('latin-1').split('\r\n')[1:]:
+			name, _, value = line.partition(':')
+			headers[name.strip().lower()] = value.strip()
+
+		key    = headers.get('sec-websocket-key', '') + WEBSOCKET_GUID
+		accept = base64.b64encode(hashlib.sha1(key.encode('ascii')).digest()).decode('ascii')
+
+		self.request.sendall((
+			'HTTP/1.1 101 Switching Protocols\r\n'
+			'Upgrade: websocket\r\n'
+			'Connection: Upgrade\r\n'
+			'Sec-WebSocket-Accept: {}\r\n\r\n'
+		).format(accept).encode('ascii'))
+
+		with self.server.lock:
+			self.server.connections.append(self.request)
+
+		# Block until the client goes away, the frames it sends are ignored
+		try:
+			while self.request.recv(4096):
+				pass
+		except (OSError, IOError):
+			pass
+		finally:
+			with self.server.lock:
+				if self.request in self.server.connections:
+					self.server.connections.remove(self.request)
+
+class MockStreamServer(ThreadingMixIn, TCPServer):
+	"""
+	Stand-in for the realtime event stream. Messages given to send() are
+	delivered to every connected client as websocket text frames.
+	"""
+
+	daemon_threads      = True
+	allow_reuse_address = True
+
+	def __init__(self, host = '127.0.0.1', port = 0):
+		self.lock        = threading.Lock()
+		self.connections = []
+
+		TCPServer.__init__(self, (host, port), StreamHandler)
+
+	@property
+	def url(self):
+		return 'ws://{}:{}/websocket/'.format(*self.server_address)
+
+	@staticmethod
+	def frame(payload, opcode = 0x1):
+		header = bytearray([0x80 | opcode])
+		if len(payload) < 126:
+			header.append(len(payload))
+		elif len(payload) < (1 << 16):
+			header.append(126)
+			header.extend(struct.pack('!H', len(payload)))
+		else:
+			header.append(127)
+			header.extend(struct.pack('!Q', len(payload)))
+
+		return bytes(header) + payload
+
+	def send(self, message):
+		data = MockStreamServer.frame(json.dumps(message).encode('utf-8'))
+
+		with self.lock:
+			for conn in list(self.connections):
+				conn.sendall(data)
+
+	def disconnect(self):
+		"""
+		Drop every connected client to exercise reconnects.
+		"""
+
+		with self.lock:
+			for conn in self.connections:
+				conn.shutdown(socket.SHUT_RDWR)
+				conn.close()
+
+			del self.connections[:]
+
+	def __enter__(self):
+		self._thread = threading.Thread(target = self.serve_forever)
+		self._thread.daemon = True
+		self._thread.start()
+
+		return self
+
+	def __exit__(self, exc_type, exc_value, traceback):
+		self.shutdown()
+		self.server_close()
+
+def main():
+	parser = argparse.ArgumentParser(description = 'Run a local mock of the PushBullet API')
+	parser.add_argument('--port',       type = int,   default = 8080)
+	parser.add_argument('--latency',    type = float, default = 0.0, help = 'Seconds of latency added per request')
+	parser.add_argument('--error-rate', type = float, default = 0.0, help = 'Fraction of requests that fail with a 503')
+	parser.add_argument('--pushes',     type = int,   default = 0,   help = 'Number of pushes to seed')
+	args = parser.parse_args()
+
+	server = MockServer(MockState(pushes = args.pushes), args.latency, args.error_rate, port = args.port)
+	print('Serving on {}'.format(server.api_root))
+	server.serve_forever()
+
+if __name__ == '__main__':
+	main()
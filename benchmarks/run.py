@@ -0,0 +1,235 @@
+"""
+Benchmarks pb4py's Client against a local mock of the PushBullet API and
+writes the results as JSON so runs can be compared across commits:
+
+	python -m benchmarks.run --output before.json
+	python -m benchmarks.run --latency 0.005 --error-rate 0.01 --output after.json
+
+Each scenario is run twice against a fresh mock server. The first run measures
+throughput and latency, the second measures the peak memory allocated by
+Python while the scenario runs (tracemalloc slows everything down, so it is
+kept out of the timings).
+"""
+
+import argparse
+import collections
+import io
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+import tracemalloc
+
+import pb4py
+import pb4py.exceptions
+
+from benchmarks.mock_server import MockServer, MockState
+
+SCENARIOS = collections.OrderedDict()
+
+def scenario(name = None, history = False, **settings):
+	"""
+	Register a scenario. When history is set the mock is seeded with
+	--history-size pushes, and settings are added to the client's settings.
+	"""
+
+	def register(func):
+		SCENARIOS[name or func.__name__] = (func, history, settings)
+
+		return func
+
+	return register
+
+def attempt(func, *args, **kwargs):
+	"""
+	Call func and return whether it succeeded. API errors are expected when
+	errors are being injected, so they are counted rather than raised.
+	"""
+
+	try:
+		func(*args, **kwargs)
+	except pb4py.exceptions.PB4PyAPIException:
+		return False
+
+	return True
+
+@scenario()
+def single_push(client, args):
+	"""
+	Send note pushes one after another.
+	"""
+
+	errors = 0
+	for i in range(args.iterations):
+		if not attempt(client.push, 'note', email = 'target@example.com', title = 'Push {}'.format(i), body = 'body'):
+			errors += 1
+
+	return args.iterations, errors, 0
+
+@scenario()
+def fanout(client, args):
+	"""
+	Send the same push to many targets with push_many.
+	"""
+
+	targets = ['target{}@example.com'.format(i) for i in range(args.iterations)]
+	errors  = 0
+
+	for result in client.push_many('note', targets, max_workers = args.max_workers, title = 'Fanout', body = 'body'):
+		if not result.ok:
+			errors += 1
+
+	return len(targets), errors, 0
+
+@scenario(history = True)
+def history(client, args):
+	"""
+	Page through the whole push history.
+	"""
+
+	count = 0
+	try:
+		for _ in client.iter_push_history(page_size = args.page_size):
+			count += 1
+	except pb4py.exceptions.PB4PyAPIException:
+		return count, 1, 0
+
+	return count, 0, 0
+
+@scenario('hold_history_models', history = True, models = True)
+@scenario(history = True)
+def hold_history(client, args):
+	"""
+	Load the whole push history into memory, as dictionaries or as models.
+	"""
+
+	pushes = list(client.iter_push_history(page_size = args.page_size))
+
+	return len(pushes), 0, 0
+
+@scenario()
+def upload(client, args):
+	"""
+	Upload files from memory, including the upload-request call.
+	"""
+
+	payload = os.urandom(args.upload_size)
+	errors  = 0
+
+	for i in range(args.uploads):
+		if not attempt(client.upload_file, io.BytesIO(payload), 'file{}.bin'.format(i), 'application/octet-stream'):
+			errors += 1
+
+	return args.uploads, errors, args.uploads * args.upload_size
+
+def percentile(values, q):
+	if not values:
+		return None
+
+	values = sorted(values)
+
+	return values[min(len(values) - 1, int(round(q * (len(values) - 1))))]
+
+def run_once(name, args, measure_memory):
+	func, history, extra_settings = SCENARIOS[name]
+
+	state = MockState(pushes = args.history_size if history else 0)
+
+	with MockServer(state, args.latency, args.error_rate) as server:
+		settings = {
+			'auth':      {'type': 'basic', 'access_token': 'benchmark'},
+			'api_root':  server.api_root,
+			'metrics':   {},
+			'scheduler': {'backoff': args.backoff},
+		}
+		settings.update(extra_settings)
+
+		with pb4py.Client(settings) as client:
+			latencies = []
+			client.metrics.add_hook('post_request', lambda info: latencies.append(info.elapsed))
+
+			if measure_memory:
+				tracemalloc.start()
+
+			started                    = time.time()
+			operations, errors, nbytes = func(client, args)
+			elapsed                    = time.time() - started
+
+			if measure_memory:
+				_, peak = tracemalloc.get_traced_memory()
+				tracemalloc.stop()
+
+				return {'peak_bytes': peak}
+
+	return {
+		'operations':          operations,
+		'errors':              errors,
+		'requests':            state.requests,
+		'seconds':             elapsed,
+		'operations_per_sec':  operations / elapsed,
+		'requests_per_sec':    state.requests / elapsed,
+		'bytes_per_sec':       nbytes / elapsed if nbytes else None,
+		'latency_p50':         percentile(latencies, 0.5),
+		'latency_p99':         percentile(latencies, 0.99),
+	}
+
+def git_commit():
+	try:
+		return subprocess.check_output(
+			['git', 'rev-parse', 'HEAD'],
+			cwd    = os.path.dirname(os.path.abspath(__file__)),
+			stderr = subprocess.STDOUT,
+		).decode('ascii').strip()
+	except (OSError, subprocess.CalledProcessError):
+		return None
+
+def main():
+	parser = argparse.ArgumentParser(description = 'Benchmark pb4py against a local mock of the PushBullet API')
+	parser.add_argument('scenarios',      nargs = '*', metavar = 'scenario', help = 'Scenarios to run, of {} (default all)'.format(', '.join(SCENARIOS)))
+	parser.add_argument('--iterations',   type = int,   default = 200,     help = 'Pushes sent by single_push and fanout')
+	parser.add_argument('--max-workers',  type = int,   default = None,    help = 'Threads used by fanout')
+	parser.add_argument('--history-size', type = int,   default = 5000,    help = 'Pushes paged through by history')
+	parser.add_argument('--page-size',    type = int,   default = 100,     help = 'Page size used by history')
+	parser.add_argument('--uploads',      type = int,   default = 20,      help = 'Files uploaded by upload')
+	parser.add_argument('--upload-size',  type = int,   default = 1 << 20, help = 'Size of each uploaded file in bytes')
+	parser.add_argument('--latency',      type = float, default = 0.0,     help = 'Seconds of latency the mock adds per request')
+	parser.add_argument('--error-rate',   type = float, default = 0.0,     help = 'Fraction of requests the mock fails with a 503')
+	parser.add_argument('--backoff',      type = float, default = 0.01,    help = 'Client retry backoff in seconds')
+	parser.add_argument('--no-memory',    action = 'store_true',           help = 'Skip the memory measurement runs')
+	parser.add_argument('--output',       default = None,                  help = 'File to write the JSON results to (default stdout)')
+	args = parser.parse_args()
+
+	# Checked here rather than with choices, which before Python 3.12 also
+	# rejects the empty list nargs='*' gives when no scenario is named
+	for name in args.scenarios:
+		if name not in SCENARIOS:
+			parser.error('unknown scenario {!r} (choose from {})'.format(name, ', '.join(SCENARIOS)))
+
+	results = collections.OrderedDict()
+	for name in args.scenarios or SCENARIOS:
+		print('Running {}'.format(name), file = sys.stderr)
+
+		results[name] = run_once(name, args, False)
+		if not args.no_memory:
+			results[name].update(run_once(name, args, True))
+
+	report = {
+		'commit':    git_commit(),
+		'python':    platform.python_version(),
+		'platform':  platform.platform(),
+		'timestamp': time.time(),
+		'options':   {key: value for key, value in vars(args).items() if key != 'output'},
+		'results':   results,
+	}
+
+	if args.output:
+		with open(args.output, 'w') as fh:
+			json.dump(report, fh, indent = 2)
+	else:
+		json.dump(report, sys.stdout, indent = 2)
+		print()
+
+if __name__ == '__main__':
+	main()
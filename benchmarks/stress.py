@@ -0,0 +1,180 @@
+"""
+Concurrency stress test for a single Client shared between many threads. For
+each thread count every thread runs the same mix of calls against a fresh
+mock server through one client, then the results are checked:
+
+	* no call raised
+	* every push was created exactly once and came back with its own title
+	* every push was dismissed
+	* every devices() call saw all of the devices
+	* the client's metrics add up to the requests the server received
+
+Throughput is reported for each thread count so scaling can be compared. The
+mock runs in the same process and competes for the GIL, so with little
+latency it is the bottleneck long before the client is:
+
+	python -m benchmarks.stress --threads 1,8,64 --latency 0.03
+"""
+
+import argparse
+import collections
+import json
+import sys
+import threading
+import time
+
+import pb4py
+
+from benchmarks.mock_server import MockServer, MockState
+
+DEVICES = 5
+
+def worker(client, index, args, results):
+	"""
+	Run args.operations rounds of: push, dismiss it, list devices and every
+	tenth round read the newest pushes.
+	"""
+
+	pushes  = []
+	devices = []
+	errors  = []
+
+	for i in range(args.operations):
+		title = 'thread {} push {}'.format(index, i)
+
+		try:
+			push = client.push('note', email = 'target@example.com', title = title, body = 'body')
+			pushes.append((title, push))
+
+			client.dismiss_push(push['iden'])
+			devices.append(len(client.devices()))
+
+			if i % 10 == 0:
+				list(client.iter_push_history(limit = 5))
+		except Exception as ex: # pylint: disable=broad-except
+			errors.append(repr(ex))
+
+	results[index] = (pushes, devices, errors)
+
+def check(state, client, results, args, threads):
+	"""
+	Check the results of a run and return a list of the problems found.
+	"""
+
+	problems = []
+	expected = set()
+
+	for pushes, devices, errors in results.values():
+		problems.extend(errors)
+
+		for title, push in pushes:
+			expected.add(title)
+
+			if push['title'] != title:
+				problems.append('Push {} came back with title {!r}, expected {!r}'.format(push['iden'], push['title'], title))
+
+		problems.extend(
+			'devices() returned {} devices, expected {}'.format(count, DEVICES)
+			for count in devices
+			if count != DEVICES
+		)
+
+	created = collections.Counter(push['title'] for push in state.data['pushes'])
+
+	if len(expected) != threads * args.operations:
+		problems.append('{} pushes were sent, expected {}'.format(len(expected), threads * args.operations))
+
+	problems.extend('Push {!r} was created {} times'.format(title, count) for title, count in created.items() if count != 1)
+	problems.extend('Push {!r} was not dismissed'.format(push['title']) for push in state.data['pushes'] if not push['dismissed'])
+
+	# Calls answered from the cache or by sharing another call don't reach the
+	# server, retries do
+	sent = sum(
+		endpoint['requests'] - endpoint['cache_hits'] - endpoint['coalesced'] + endpoint['retries']
+		for endpoint in client.metrics.snapshot().values()
+	)
+
+	if sent != state.requests:
+		problems.append('The metrics count {} requests but the server received {}'.format(sent, state.requests))
+
+	return problems
+
+def run(threads, args):
+	state = MockState(devices = DEVICES)
+
+	with MockServer(state, args.latency) as server:
+		settings = {
+			'auth':      {'type': 'basic', 'access_token': 'stress'},
+			'api_root':  server.api_root,
+			'metrics':   {},
+			'cache':     {},
+			'transport': {'pool_maxsize': threads},
+		}
+
+		with pb4py.Client(settings) as client:
+			results = {}
+			workers = [
+				threading.Thread(target = worker, args = (client, index, args, results))
+				for index in range(threads)
+			]
+
+			started = time.time()
+
+			for thread in workers:
+				thread.start()
+
+			for thread in workers:
+				thread.join()
+
+			elapsed = time.time() - started
+
+			problems = check(state, client, results, args, threads)
+
+	calls = threads * args.operations
+
+	return {
+		'threads':         threads,
+		'rounds':          calls,
+		'requests':        state.requests,
+		'seconds':         elapsed,
+		'rounds_per_sec':  calls / elapsed,
+		'problems':        problems,
+	}
+
+def main():
+	parser = argparse.ArgumentParser(description = 'Stress a Client shared between threads against a local mock of the PushBullet API')
+	parser.add_argument('--threads',    default = '1,2,4,8,16,32,64', help = 'Comma separated thread counts to run with')
+	parser.add_argument('--operations', type = int,   default = 50,    help = 'Rounds of calls made by each thread')
+	parser.add_argument('--latency',    type = float, default = 0.005, help = 'Seconds of latency the mock adds per request')
+	parser.add_argument('--output',     default = None,                help = 'File to write the JSON results to (default stdout)')
+	args = parser.parse_args()
+
+	results = []
+	for threads in [int(count) for count in args.threads.split(',')]:
+		print('Running with {} threads'.format(threads), file = sys.stderr)
+
+		result = run(threads, args)
+		result['speedup'] = result['rounds_per_sec'] / results[0]['rounds_per_sec'] if results else 1.0
+
+		results.append(result)
+
+		for problem in result['problems'][:10]:
+			print('  ' + problem, file = sys.stderr)
+
+	report = {
+		'options': {key: value for key, value in vars(args).items() if key != 'output'},
+		'results': results,
+	}
+
+	if args.output:
+		with open(args.output, 'w') as fh:
+			json.dump(report, fh, indent = 2)
+	else:
+		json.dump(report, sys.stdout, indent = 2)
+		print()
+
+	if any(result['problems'] for result in results):
+		sys.exit(1)
+
+if __name__ == '__main__':
+	main()
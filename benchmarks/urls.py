@@ -0,0 +1,68 @@
+"""
+Micro-benchmark of building request URLs. The client compiles each endpoint's
+template once and keeps the full URLs of endpoints without placeholders, where
+it used to parse the API root and rebuild the URL on every request and then
+parse the URL again to get the path that cached responses and in-flight
+requests are keyed by. Both ways are timed, in nanoseconds per request:
+
+	python -m benchmarks.urls --number 200000
+"""
+
+import argparse
+import json
+import sys
+import timeit
+import urllib.parse
+
+import pb4py
+
+from pb4py.helpers import ChannelHelper, PushHelper
+
+ENDPOINTS = [
+	('static',      PushHelper.URL_PUSH_HISTORY, {}),
+	('placeholder', PushHelper.URL_PUSH_DISMISS, {'push': 'ujpah72o0sjAoRtnM0jc'}),
+	('channel',     ChannelHelper.URL_CHANNEL_INFO, {}),
+]
+
+def parse_every_time(api_root, url, url_kwargs):
+	"""
+	How URLs were built before templates were compiled.
+	"""
+
+	url_parts = urllib.parse.urlparse(api_root)
+	url       = urllib.parse.urlunparse((url_parts.scheme, url_parts.netloc, url.format(**url_kwargs), '', '', ''))
+
+	return url, urllib.parse.urlparse(url).path
+
+def best(func, number, repeat):
+	return min(timeit.repeat(func, number = number, repeat = repeat)) / number * 1e9
+
+def main():
+	parser = argparse.ArgumentParser(description = 'Time building request URLs')
+	parser.add_argument('--number', type = int, default = 100000, help = 'Calls per timing')
+	parser.add_argument('--repeat', type = int, default = 5,      help = 'Timings to take the best of')
+	args = parser.parse_args()
+
+	client  = pb4py.Client({'auth': {'type': 'basic', 'access_token': 'urls'}})
+	results = []
+
+	for name, template, url_kwargs in ENDPOINTS:
+		if parse_every_time(client.api_root, template, url_kwargs) != client.urls.build(template, url_kwargs):
+			print('The URLs built for {} differ'.format(name), file = sys.stderr)
+			sys.exit(1)
+
+		before = best(lambda: parse_every_time(client.api_root, template, url_kwargs), args.number, args.repeat)
+		after  = best(lambda: client.urls.build(template, url_kwargs), args.number, args.repeat)
+
+		results.append({
+			'endpoint':  name,
+			'before_ns': round(before, 1),
+			'after_ns':  round(after, 1),
+			'speedup':   round(before / after, 1),
+		})
+
+	json.dump({'options': vars(args), 'results': results}, sys.stdout, indent = 2)
+	print()
+
+if __name__ == '__main__':
+	main()
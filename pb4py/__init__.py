@@ -1,9 +1,38 @@
-from pb4py import auth, exceptions
-from pb4py.client import Client
+import importlib
+
+from pb4py import exceptions
 
 __all__ = [
 	'auth',
 	'exceptions',
+	'AsyncClient',
 	'Client',
+	'ClientPool',
 ]
 
+# Importing the clients pulls in requests (and aiohttp for the asyncio client)
+# so they are only imported when first used. This keeps "import pb4py" cheap
+# for the CLI.
+_LAZY_ATTRIBUTES = {
+	'auth':        ('pb4py.auth',   None),
+	'AsyncClient': ('pb4py.aio',    'AsyncClient'),
+	'Client':      ('pb4py.client', 'Client'),
+	'ClientPool':  ('pb4py.pool',   'ClientPool'),
+}
+
+def __getattr__(name):
+	if name not in _LAZY_ATTRIBUTES:
+		raise AttributeError('module {!r} has no attribute {!r}'.format(__name__, name))
+
+	module_name, attribute = _LAZY_ATTRIBUTES[name]
+
+	value = importlib.import_module(module_name)
+	if attribute is not None:
+		value = getattr(value, attribute)
+
+	globals()[name] = value
+
+	return value
+
+def __dir__():
+	return sorted(set(globals()) | set(_LAZY_ATTRIBUTES))
@@ -0,0 +1,418 @@
+import asyncio
+import functools
+
+from pb4py import exceptions, models
+from pb4py.client import Client
+from pb4py.coalesce import AsyncCoalescer
+from pb4py.fanout import BatchReport, FanoutResult
+from pb4py.helpers import Helper
+from pb4py.metrics import RequestInfo
+from pb4py.stream import AsyncStream
+from pb4py.transport import BufferedResponse, Transport
+from pb4py.upload import MultipartStream
+
+# aiohttp is only needed for the asyncio client so it is an optional
+# dependency. Importing this module without it is fine, creating an
+# AsyncClient is not.
+try:
+	import aiohttp
+except ImportError:
+	aiohttp = None
+
+async def async_fanout(func, items, max_workers):
+	"""
+	asyncio version of pb4py.fanout.fanout. Await func for each item with at
+	most max_workers calls in flight and yield a FanoutResult for each item as
+	it completes.
+	"""
+
+	async def run(item):
+		try:
+			return FanoutResult(item, response = await func(item))
+		except Exception as ex: # pylint: disable=broad-except
+			return FanoutResult(item, error = ex)
+
+	items   = iter(items)
+	pending = set()
+
+	def submit(count):
+		for item in items:
+			pending.add(asyncio.ensure_future(run(item)))
+
+			count -= 1
+			if count == 0:
+				break
+
+	try:
+		submit(max_workers)
+
+		while pending:
+			done, _ = await asyncio.wait(pending, return_when = asyncio.FIRST_COMPLETED)
+
+			for task in done:
+				pending.discard(task)
+
+				yield task.result()
+
+			submit(len(done))
+	finally:
+		for task in pending:
+			task.cancel()
+
+class AsyncTransport(object):
+	"""
+	Non-blocking, pooled HTTP transport backed by aiohttp. It accepts the same
+	settings as Transport plus:
+
+		* max_concurrency - the maximum number of requests in flight at once
+	"""
+
+	DEFAULT_MAX_CONCURRENCY = 100
+
+	CONNECTION_ERRORS = (aiohttp.ClientConnectionError, asyncio.TimeoutError) if aiohttp else ()
+	REQUEST_ERRORS    = (aiohttp.ClientError,) if aiohttp else ()
+
+	def __init__(self, settings = None):
+		if aiohttp is None:
+			raise exceptions.PB4PyConfigurationException(
+				'aiohttp is required for the asyncio client. Install pb4py[async]',
+			)
+
+		settings = settings or {}
+
+		self.pool_connections = settings.get('pool_connections', Transport.DEFAULT_POOL_CONNECTIONS)
+		self.pool_maxsize     = settings.get('pool_maxsize',     Transport.DEFAULT_POOL_MAXSIZE)
+		self.keep_alive       = settings.get('keep_alive',       Transport.DEFAULT_KEEP_ALIVE)
+		self.max_concurrency  = settings.get('max_concurrency',  AsyncTransport.DEFAULT_MAX_CONCURRENCY)
+		self.timeout          = AsyncTransport._parse_timeout(settings.get('timeout', Transport.DEFAULT_TIMEOUT))
+
+		self._session   = None
+		self._semaphore = None
+
+	@staticmethod
+	def _parse_timeout(timeout):
+		if isinstance(timeout, (list, tuple)):
+			connect, read = timeout
+
+			return aiohttp.ClientTimeout(sock_connect = connect, sock_read = read)
+
+		return aiohttp.ClientTimeout(total = timeout)
+
+	def _get_session(self):
+		# The session has to be created from inside of the running event loop
+		if self._session is None:
+			connector = aiohttp.TCPConnector(
+				limit          = self.pool_connections * self.pool_maxsize,
+				limit_per_host = self.pool_maxsize,
+				force_close    = not self.keep_alive,
+			)
+
+			self._session   = aiohttp.ClientSession(connector = connector, timeout = self.timeout)
+			self._semaphore = asyncio.Semaphore(self.max_concurrency)
+
+		return self._session
+
+	async def request(self, method, url, auth = None, **kwargs):
+		"""
+		Send a request over the pooled session and read the whole response.
+		"""
+
+		session = self._get_session()
+
+		if auth is not None:
+			auth = aiohttp.BasicAuth(*auth)
+
+		async with self._semaphore:
+			async with session.request(method, url, auth = auth, **kwargs) as resp:
+				content = await resp.read()
+
+				return BufferedResponse(resp.status, resp.headers, content)
+
+	async def close(self):
+		"""
+		Close all of the pooled connections.
+		"""
+
+		if self._session is not None:
+			await self._session.close()
+
+			self._session = None
+
+class AsyncClient(Client):
+	"""
+	asyncio PushBullet client. Every helper method returns an awaitable
+	instead of blocking on the request.
+	"""
+
+	def _create_transport(self, transport_settings):
+		return AsyncTransport(transport_settings)
+
+	def _create_coalescer(self):
+		return AsyncCoalescer()
+
+	def _create_sync_engine(self, sync_settings):
+		# Local replicas are refreshed with blocking requests so they are not
+		# used by the asyncio client.
+		return None
+
+	async def _send_request(self, url, method, url_kwargs = {}, skip_auth = False, transform = None, **kwargs):
+		info      = RequestInfo(method, url)
+		url, path, auth = self._prepare_request(url, url_kwargs, skip_auth)
+		info.url        = url
+
+		self._before_request(info, kwargs)
+
+		try:
+			cache_key = self._cache_key(method, path, auth, kwargs)
+			resp      = self.cache.lookup(cache_key, kwargs) if cache_key else None
+
+			if resp is None and self._coalesces(method, kwargs):
+				resp, info.coalesced = await self.coalescer.do(
+					Helper._request_key(path, auth, kwargs),
+					lambda: self._send_and_store(info, auth, kwargs, cache_key),
+				)
+
+				info.status_code = resp.status_code
+			elif resp is None:
+				resp = await self._send_and_store(info, auth, kwargs, cache_key)
+			else:
+				info.cached      = True
+				info.status_code = resp.status_code
+
+			if method != 'GET':
+				self._invalidate(path)
+
+			return self._handle_response(resp, transform, info)
+		except Exception as ex:
+			info.error = ex
+			raise
+		finally:
+			self._after_request(info)
+
+	async def _iter_collection(self, url, key, params = None, page_size = None, limit = None, model = None, fields = None, match = None):
+		params = dict(params or {})
+		count  = 0
+
+		while limit is None or count < limit:
+			page_limit = Helper._page_limit(page_size, None if match else limit, count)
+			if page_limit:
+				params['limit'] = page_limit
+
+			page = await self._send_request(url, 'GET', params = params)
+
+			for element in page[key]:
+				if match is not None and not match(element):
+					continue
+
+				if fields is not None:
+					element = Helper._project(element, fields)
+
+				yield model(element) if model else element
+
+				count += 1
+				if limit is not None and count >= limit:
+					return
+
+			cursor = page.get('cursor')
+			if not cursor:
+				return
+
+			params['cursor'] = cursor
+
+	async def search_pushes(self, refresh = True, limit = None, **filters):
+		"""
+		Search the local push store. See PushHelper.search_pushes.
+		"""
+
+		if refresh:
+			await self.push_store.sync_async(self)
+
+		return self._wrap_all(models.Push, self.push_store.query(limit = limit, **filters))
+
+	async def _batch(self, func, items, max_workers = None):
+		return BatchReport([result async for result in async_fanout(func, items, max_workers or self.transport.max_concurrency)])
+
+	async def _send_and_store(self, info, auth, kwargs, cache_key):
+		resp = await self._send_scheduled(info, auth, kwargs)
+
+		if cache_key:
+			stored = self.cache.store(cache_key, resp)
+
+			if stored is None:
+				# A 304 for an entry that has been evicted since, fetch it whole
+				self.cache.unconditional(kwargs)
+
+				resp   = await self._send_scheduled(info, auth, kwargs)
+				stored = self.cache.store(cache_key, resp) or resp
+
+			resp = stored
+
+		return resp
+
+	async def _send_scheduled(self, info, auth, kwargs):
+		key = auth[0] if auth else None
+
+		while True:
+			delay = self.scheduler.throttle_delay(key)
+			if delay:
+				await asyncio.sleep(delay)
+
+			info.attempts += 1
+
+			try:
+				resp = await self.transport.request(info.method, info.url, auth = auth, **kwargs)
+			except self.transport.CONNECTION_ERRORS as ex:
+				delay = self.scheduler.retry_delay(info.method, info.attempts - 1, error = ex)
+				if delay is None:
+					self._raise_connection_error(info.url, ex)
+			except self.transport.REQUEST_ERRORS as ex:
+				self._raise_connection_error(info.url, ex)
+			else:
+				self.scheduler.record(key, resp)
+
+				info.status_code = resp.status_code
+
+				delay = self.scheduler.retry_delay(info.method, info.attempts - 1, resp = resp)
+				if delay is None:
+					return resp
+
+			self.logger.warning('Retrying %s %s in %.2fs (attempt %d)', info.method, info.url, delay, info.attempts)
+			await asyncio.sleep(delay)
+
+	@property
+	def outbox(self):
+		"""
+		The outbox sends pushes from worker threads through the blocking client
+		methods, which are coroutines here.
+		"""
+
+		raise TypeError('The outbox only works with a Client, not an AsyncClient')
+
+	def stream(self, include_nops = False):
+		"""
+		Get an async iterator over the realtime event stream. See
+		pb4py.stream.AsyncStream.
+		"""
+
+		return AsyncStream(self, include_nops)
+
+	async def upload_file(self, file, filename = None, file_type = None, file_size = None, progress = None):
+		"""
+		Upload a file so it can be pushed. See PushHelper.upload_file.
+		"""
+
+		return await self._upload_source(self._file_source(file, filename, file_type, file_size), progress)
+
+	async def push_file(self, file, body = None, filename = None, file_type = None, file_size = None, progress = None, **kwargs):
+		"""
+		Upload a file and push it. See PushHelper.push_file.
+		"""
+
+		source = self._file_source(file, filename, file_type, file_size)
+		upload = await self._upload_source(source, progress)
+
+		return await self.push('file', **self._file_push_data(upload, body, kwargs))
+
+	def push_files(self, files, body = None, max_workers = None, progress = None, **kwargs):
+		"""
+		Upload and push several files concurrently. This returns an async
+		generator that yields a FanoutResult for each file as its push
+		completes. See PushHelper.push_files.
+		"""
+
+		sources = [(file, self._file_source(file)) for file in files]
+
+		async def send(item):
+			file, source = item
+
+			upload = await self._upload_source(source, functools.partial(progress, file) if progress else None)
+
+			return await self.push('file', **self._file_push_data(upload, body, kwargs))
+
+		async def results():
+			async for result in async_fanout(send, sources, max_workers or self.transport.max_concurrency):
+				result.item = result.item[0]
+
+				yield result
+
+		return results()
+
+	async def _upload_source(self, source, progress = None):
+		upload = await self._send_request(
+			self.URL_FILE_UPLOAD,
+			'POST',
+			data = {'file_name': source.file_name, 'file_type': source.file_type},
+		)
+
+		body = MultipartStream(source, upload.get('data'), progress)
+
+		async def chunks():
+			for chunk in body:
+				yield chunk
+
+		try:
+			resp = await self.transport.request(
+				'POST',
+				upload['upload_url'],
+				data    = chunks(),
+				headers = {'Content-Type': body.content_type, 'Content-Length': str(len(body))},
+			)
+		except self.transport.REQUEST_ERRORS as ex:
+			self._raise_connection_error(upload['upload_url'], ex)
+
+		self._check_upload(resp)
+
+		return upload
+
+	def push_many(self, push_type, targets, target_type = 'email', max_workers = None, **kwargs):
+		"""
+		Send the same push to many targets with at most max_workers pushes in
+		flight. This returns an async generator that yields a FanoutResult for each
+		target as its push completes. See PushHelper.push_many.
+		"""
+
+		self._check_push_type(push_type)
+		self._check_target_type(target_type)
+
+		async def send(target):
+			data = dict(kwargs)
+			data.update(self._target_params(target, target_type))
+
+			return await self.push(push_type, **data)
+
+		return async_fanout(send, targets, max_workers or self.transport.max_concurrency)
+
+	async def push_many_processes(self, push_type, targets, target_type = 'email', processes = None, max_workers = None, **kwargs):
+		"""
+		Send the same push to many targets from several processes. The
+		processes are waited for in a thread so the event loop keeps running.
+		See PushHelper.push_many_processes.
+		"""
+
+		return await asyncio.get_event_loop().run_in_executor(
+			None,
+			functools.partial(Client.push_many_processes, self, push_type, targets, target_type, processes, max_workers, **kwargs),
+		)
+
+	async def close(self):
+		"""
+		Release the client's pooled connections.
+		"""
+
+		with self._lock:
+			push_store, self._push_store = self._push_store, None
+
+		if self._owns_transport:
+			await self.transport.close()
+
+		if push_store is not None:
+			push_store.close()
+
+	def __enter__(self):
+		raise TypeError('Use "async with" with an AsyncClient')
+
+	async def __aenter__(self):
+		return self
+
+	async def __aexit__(self, exc_type, exc_value, traceback):
+		await self.close()
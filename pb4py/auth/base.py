@@ -1,23 +1,19 @@
 import abc
 
-import requests
-
 from pb4py import utils
 from pb4py.logger import Logs
 
-class Authenticator(object):
+class Authenticator(metaclass = abc.ABCMeta):
 	"""
 	Base authentication mechanism
 	"""
 
-	__metaclass__ = abc.ABCMeta
-
 	def __init__(self, settings):
 		"""
 		Create the authenticator with the given settings
 		"""
 
-		self.logger   = Logs.getLogger('PyBullet:Request')
+		self.logger   = Logs.getLogger('auth')
 		self.settings = settings
 
 	@abc.abstractmethod
@@ -0,0 +1,192 @@
+import collections
+import threading
+import time
+
+import requests.structures
+
+from pb4py.transport import BufferedResponse
+
+class CacheEntry(object):
+	"""
+	A cached response body along with what is needed to revalidate it.
+	"""
+
+	__slots__ = ('path', 'content', 'headers', 'expires', 'etag', 'last_modified')
+
+	def __init__(self, path, content, headers, expires):
+		# Header names are often lower case (HTTP/2, proxies)
+		headers = requests.structures.CaseInsensitiveDict(headers)
+
+		self.path          = path
+		self.content       = content
+		self.headers       = headers
+		self.expires       = expires
+		self.etag          = headers.get('ETag')
+		self.last_modified = headers.get('Last-Modified')
+
+	def is_fresh(self):
+		return time.time() < self.expires
+
+	def response(self):
+		return BufferedResponse(200, self.headers, self.content)
+
+class ResponseCache(object):
+	"""
+	TTL + LRU cache of GET responses for the read-only endpoints. Only paths
+	that have a TTL are cached. Expired entries that came with an ETag or
+	Last-Modified header are revalidated with a conditional request instead
+	of being downloaded again.
+	"""
+
+	DEFAULT_MAX_SIZE = 256
+	DEFAULT_TTLS     = {
+		'/v2/users/me':      300,
+		'/v2/devices':       60,
+		'/v2/subscriptions': 300,
+		'/v2/channel-info':  600,
+	}
+
+	CONDITIONAL_HEADERS = ('If-None-Match', 'If-Modified-Since')
+
+	def __init__(self, settings = None):
+		"""
+		Create the cache from the "cache" section of the settings:
+
+			* max_size - the maximum number of responses to keep
+			* ttl      - map of API path to the seconds its responses are kept,
+			             merged over the defaults. A TTL of 0 disables caching
+			             for the path.
+		"""
+
+		settings = settings or {}
+
+		self.max_size = settings.get('max_size', ResponseCache.DEFAULT_MAX_SIZE)
+		self.ttls     = dict(ResponseCache.DEFAULT_TTLS)
+		self.ttls.update(settings.get('ttl', {}))
+
+		self.entries = collections.OrderedDict()
+		self.lock    = threading.Lock()
+
+		self.hits          = 0
+		self.misses        = 0
+		self.revalidations = 0
+		self.evictions     = 0
+
+	def key(self, path, auth, params):
+		"""
+		Get the cache key for a request, or None if the path isn't cached.
+		"""
+
+		if self.ttls.get(path, 0) <= 0:
+			return None
+
+		params = tuple(sorted((params or {}).items()))
+
+		return (path, params, auth)
+
+	def lookup(self, key, request_kwargs):
+		"""
+		Get the cached response for a request if it is still fresh. When the
+		entry has expired but can be revalidated the conditional headers are
+		added to request_kwargs and None is returned.
+		"""
+
+		with self.lock:
+			entry = self.entries.get(key)
+			if entry is None:
+				self.misses += 1
+				return None
+
+			self.entries.move_to_end(key)
+
+			if entry.is_fresh():
+				self.hits += 1
+				return entry.response()
+
+			self.misses += 1
+
+		headers = dict(request_kwargs.get('headers') or {})
+		if entry.etag:
+			headers['If-None-Match'] = entry.etag
+		if entry.last_modified:
+			headers['If-Modified-Since'] = entry.last_modified
+
+		if headers:
+			request_kwargs['headers'] = headers
+
+		return None
+
+	def store(self, key, resp):
+		"""
+		Cache the response to a request and return the response the caller
+		should use. A 304 refreshes the existing entry and returns it. If the
+		entry was evicted while it was being revalidated there is nothing to
+		return and None is returned, the request has to be sent again without
+		its conditional headers (see unconditional).
+		"""
+
+		path    = key[0]
+		expires = time.time() + self.ttls[path]
+
+		with self.lock:
+			if resp.status_code == 304:
+				entry = self.entries.get(key)
+				if entry is None:
+					return None
+
+				entry.expires = expires
+
+				self.revalidations += 1
+
+				return entry.response()
+
+			if resp.status_code != 200:
+				return resp
+
+			self.entries[key] = CacheEntry(path, resp.content, resp.headers, expires)
+			self.entries.move_to_end(key)
+
+			while len(self.entries) > self.max_size:
+				self.entries.popitem(last = False)
+				self.evictions += 1
+
+		return resp
+
+	@staticmethod
+	def unconditional(request_kwargs):
+		"""
+		Remove the conditional headers lookup added to request_kwargs.
+		"""
+
+		headers = dict(request_kwargs.get('headers') or {})
+
+		for name in ResponseCache.CONDITIONAL_HEADERS:
+			headers.pop(name, None)
+
+		request_kwargs['headers'] = headers
+
+	def invalidate(self, path):
+		"""
+		Drop every entry for the collection that path belongs to, ex:
+		/v2/devices/abc invalidates /v2/devices.
+		"""
+
+		root = '/'.join(path.split('/')[:3])
+
+		with self.lock:
+			for key in [key for key in self.entries if key[0].startswith(root)]:
+				del self.entries[key]
+
+	def clear(self):
+		with self.lock:
+			self.entries.clear()
+
+	def stats(self):
+		with self.lock:
+			return {
+				'size':          len(self.entries),
+				'hits':          self.hits,
+				'misses':        self.misses,
+				'revalidations': self.revalidations,
+				'evictions':     self.evictions,
+			}
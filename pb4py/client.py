@@ -1,8 +1,20 @@
 from pb4py import auth, exceptions, helpers, utils
+from pb4py.transport import Transport
+from pb4py.codec import get_codec
+from pb4py.coalesce import Coalescer
+from pb4py.cache import ResponseCache
 from pb4py.logger import Logs
-
+from pb4py.metrics import Metrics
+from pb4py.outbox import Outbox
+from pb4py.scheduler import RequestScheduler
+from pb4py.store import PushStore
+from pb4py.stream import Stream
+from pb4py.sync import SyncEngine
+
+import copy
 import json
 import os.path
+import threading
 
 class Client(
 		helpers.ChannelHelper,
@@ -13,41 +25,137 @@ class Client(
 		helpers.SubscriptionHelper):
 	"""
 	PushBullet client for Python.
+
+	A client can be shared between threads. Its settings and authentication
+	are only read after it has been created, each thread sends its requests
+	through its own requests Session over the shared connection pool, and
+	the cache, scheduler, metrics, replicas and stores are locked.
 	"""
 
 	GLOBAL_SETTINGS_FILE = os.path.expanduser('~/.pb4pyrc')
 
-	def __init__(self, settings = None):
+	# (modification time, settings) of the last read of GLOBAL_SETTINGS_FILE
+	_global_settings = None
+
+	def __init__(self, settings = None, transport = None, scheduler = None):
 		"""
 		Creates a client based off of the given settings. The settings parameter
 		can be a string that points to a JSON file or it can be dictionary of
 		setting values. These settings override the "Global settings" that are
 		set per user via the GLOBAL_SETTINGS_FILE.
+
+		A transport can be given to share a connection pool between several
+		clients. Otherwise one is created from the "transport" settings and is
+		closed along with the client. Likewise a scheduler can be shared, or
+		one is created from the "scheduler" settings.
 		"""
 
-		self.logger = Logs.getLogger('PB4Py')
+		self.logger   = Logs.getLogger('client')
+		self.settings = Client._merge_settings(settings, self.logger)
 
-		if not os.path.exists(Client.GLOBAL_SETTINGS_FILE) and not settings:
-			utils.log_and_raise(
-				self.logger,
-				'No settings given',
-				exceptions.PB4PyConfigurationException,
-			)
+		Logs.configure_from_settings(self.settings.get('logging', {}))
 
-		if os.path.exists(Client.GLOBAL_SETTINGS_FILE):
-			self.settings = Client._load_config()
-			self.logger.debug('Config file loaded')
-		else:
-			self.settings = {}
+		self.auth     = self._get_auth_module(self.settings.get('auth', None))
+		self.api_root = self.settings.get('api_root', helpers.Helper.API_ROOT)
+		self.models   = bool(self.settings.get('models', False))
+		self.codec    = get_codec(self.settings.get('codec', None))
 
-		if settings:
-			if isinstance(settings, str):
-				settings = Client._load_config(settings)
-				self.logger.info('Parameter config loaded')
+		self._owns_transport = transport is None
+		self.transport       = transport or self._create_transport(self.settings.get('transport', None))
+		self.scheduler       = scheduler or RequestScheduler(self.settings.get('scheduler', None))
+
+		metrics_settings = self.settings.get('metrics', None)
+		self.metrics     = Metrics(metrics_settings) if metrics_settings is not None else None
+
+		cache_settings = self.settings.get('cache', None)
+		self.cache     = ResponseCache(cache_settings) if cache_settings is not None else None
+
+		self.coalescer = self._create_coalescer() if self.settings.get('coalesce', True) else None
 
-			self.settings.update(settings)
+		sync_settings = self.settings.get('sync', None)
+		self.sync     = self._create_sync_engine(sync_settings) if sync_settings is not None else None
 
-		self.auth = self._get_auth_module(self.settings.get('auth', None))
+		self._push_store = None
+		self._outbox     = None
+		self._lock       = threading.Lock()
+
+	@property
+	def push_store(self):
+		"""
+		The local SQLite push store. It is opened on first use at the path set
+		by the "store" settings, or in the user's cache directory.
+		"""
+
+		with self._lock:
+			if self._push_store is None:
+				path = self.settings.get('store', {}).get('path', None)
+				if not path:
+					path = PushStore.default_path(self.auth.get_request_auth()[0])
+
+				self._push_store = PushStore(os.path.expanduser(path))
+
+			return self._push_store
+
+	@property
+	def outbox(self):
+		"""
+		The durable outgoing push queue, see pb4py.outbox.Outbox. It is opened
+		on first use at the path set by the "outbox" settings, or in the user's
+		cache directory, and any pushes left over from an earlier run are sent.
+		"""
+
+		with self._lock:
+			if self._outbox is None:
+				settings = self.settings.get('outbox', {})
+
+				path = settings.get('path', None)
+				if not path:
+					path = Outbox.default_path(self.auth.get_request_auth()[0])
+
+				self._outbox = Outbox(self, os.path.expanduser(path), settings)
+
+			return self._outbox
+
+	def _create_transport(self, transport_settings):
+		return Transport(transport_settings)
+
+	def _create_coalescer(self):
+		return Coalescer()
+
+	def _create_sync_engine(self, sync_settings):
+		return SyncEngine(self, sync_settings)
+
+	def stream(self, include_nops = False):
+		"""
+		Get an iterator over the realtime event stream. See pb4py.stream.Stream.
+		"""
+
+		return Stream(self, include_nops)
+
+	def close(self):
+		"""
+		Release the client's pooled connections. A transport that was passed in
+		to the client is left open for its owner to close.
+		"""
+
+		with self._lock:
+			outbox,     self._outbox     = self._outbox,     None
+			push_store, self._push_store = self._push_store, None
+
+		if outbox is not None:
+			outbox.close()
+
+		if self._owns_transport:
+			self.transport.close()
+
+		if push_store is not None:
+			push_store.close()
+
+	def __enter__(self):
+		return self
+
+	def __exit__(self, exc_type, exc_value, traceback):
+		self.close()
 
 	def _get_auth_module(self, auth_settings):
 		if not auth_settings:
@@ -72,14 +180,51 @@ class Client(
 				exceptions.PB4PyConfigurationException,
 			)
 
+	@staticmethod
+	def _merge_settings(settings, logger):
+		"""
+		Get the global settings overridden by the given settings, which can be
+		a dictionary or the path of a JSON file.
+		"""
+
+		if not os.path.exists(Client.GLOBAL_SETTINGS_FILE) and not settings:
+			utils.log_and_raise(
+				logger,
+				'No settings given',
+				exceptions.PB4PyConfigurationException,
+			)
+
+		if os.path.exists(Client.GLOBAL_SETTINGS_FILE):
+			merged = Client._load_config()
+			logger.debug('Config file loaded')
+		else:
+			merged = {}
+
+		if settings:
+			if isinstance(settings, str):
+				settings = Client._load_config(settings)
+				logger.info('Parameter config loaded')
+
+			merged.update(settings)
+
+		return merged
+
 	@staticmethod
 	def _load_config(settings = None):
 		"""
-		Load the configuration file.
+		Load the configuration file. The global settings file is only read again
+		when it changes, so creating many clients doesn't parse it every time.
 		"""
 
-		settings = settings or Client.GLOBAL_SETTINGS_FILE
+		if settings:
+			with open(settings, 'r') as fh:
+				return json.load(fh)
+
+		mtime = os.path.getmtime(Client.GLOBAL_SETTINGS_FILE)
+
+		if Client._global_settings is None or Client._global_settings[0] != mtime:
+			with open(Client.GLOBAL_SETTINGS_FILE, 'r') as fh:
+				Client._global_settings = (mtime, json.load(fh))
 
-		with open(settings, 'r') as fh:
-			return json.load(fh)
+		return copy.deepcopy(Client._global_settings[1])
 
@@ -0,0 +1,128 @@
+import asyncio
+import threading
+
+class _Call(object):
+	__slots__ = ('done', 'result', 'error')
+
+	def __init__(self):
+		self.done   = threading.Event()
+		self.result = None
+		self.error  = None
+
+class Coalescer(object):
+	"""
+	Single-flight execution: while a call for a key is running, other threads
+	asking for the same key wait for it and share its result instead of
+	making the call again. Once the call has finished the next one for the
+	key runs afresh, nothing is cached.
+	"""
+
+	def __init__(self):
+		self.lock      = threading.Lock()
+		self.calls     = {}
+		self.coalesced = 0
+
+	def do(self, key, func):
+		"""
+		Run func, or wait for the call that is already running for key.
+		Returns (result, whether it was shared). An exception raised by the
+		call is raised in every caller.
+		"""
+
+		with self.lock:
+			call = self.calls.get(key)
+
+			if call is None:
+				call = self.calls[key] = _Call()
+				leader = True
+			else:
+				self.coalesced += 1
+				leader = False
+
+		if not leader:
+			call.done.wait()
+
+			if call.error is not None:
+				raise call.error
+
+			return call.result, True
+
+		try:
+			call.result = func()
+		except BaseException as ex:
+			call.error = ex
+			raise
+		finally:
+			with self.lock:
+				if self.calls.get(key) is call:
+					del self.calls[key]
+
+			call.done.set()
+
+		return call.result, False
+
+	def forget(self, match):
+		"""
+		Stop handing the running calls whose keys match returns True for to
+		new callers, so they make a call of their own. Callers that are
+		already waiting still get the result.
+		"""
+
+		with self.lock:
+			for key in [key for key in self.calls if match(key)]:
+				del self.calls[key]
+
+class AsyncCoalescer(object):
+	"""
+	asyncio version of Coalescer, for coroutines running on one event loop.
+	"""
+
+	def __init__(self):
+		self.calls     = {}
+		self.coalesced = 0
+
+	async def do(self, key, func):
+		"""
+		Await func(), or the call that is already running for key. Returns
+		(result, whether it was shared).
+		"""
+
+		while key in self.calls:
+			future = self.calls[key]
+
+			self.coalesced += 1
+
+			try:
+				return await asyncio.shield(future), True
+			except asyncio.CancelledError:
+				# Only the call that was being waited for was cancelled, make
+				# the call here instead
+				if not future.cancelled():
+					raise
+
+				self.coalesced -= 1
+
+		future = self.calls[key] = asyncio.get_event_loop().create_future()
+
+		try:
+			result = await func()
+		except asyncio.CancelledError:
+			future.cancel()
+			raise
+		except BaseException as ex:
+			future.set_exception(ex)
+
+			# Nobody may have been waiting, which asyncio would warn about
+			future.exception()
+			raise
+		else:
+			future.set_result(result)
+		finally:
+			if self.calls.get(key) is future:
+				del self.calls[key]
+
+		return result, False
+
+	def forget(self, match):
+		for key in [key for key in self.calls if match(key)]:
+			del self.calls[key]
@@ -0,0 +1,263 @@
+import codecs
+import collections
+import json
+import re
+
+from pb4py import exceptions
+
+# orjson and ujson are optional, the fastest one that is installed is used
+try:
+	import orjson
+except ImportError:
+	orjson = None
+
+try:
+	import ujson
+except ImportError:
+	ujson = None
+
+class Codec(object):
+	"""
+	A JSON implementation. loads takes bytes or str, dumps returns bytes or
+	str, both of which can be sent as a request body.
+	"""
+
+	def __init__(self, name, loads, dumps):
+		self.name  = name
+		self.loads = loads
+		self.dumps = dumps
+
+	def __repr__(self):
+		return 'Codec({!r})'.format(self.name)
+
+CODECS = collections.OrderedDict()
+
+if orjson is not None:
+	CODECS['orjson'] = Codec('orjson', orjson.loads, orjson.dumps)
+
+if ujson is not None:
+	CODECS['ujson'] = Codec('ujson', ujson.loads, ujson.dumps)
+
+CODECS['json'] = Codec('json', json.loads, json.dumps)
+
+def get_codec(name = None):
+	"""
+	Get the named codec (orjson, ujson or json), or the fastest one that is
+	installed when no name is given.
+	"""
+
+	if name is None:
+		return next(iter(CODECS.values()))
+
+	if name not in CODECS:
+		raise exceptions.PB4PyConfigurationException(
+			'JSON codec {} is not available, installed codecs are {}'.format(name, ', '.join(CODECS)),
+		)
+
+	return CODECS[name]
+
+class ListDecoder(object):
+	"""
+	Incrementally decodes a JSON object holding a list under key, like a page
+	from a list endpoint. feed() yields the list's elements as soon as all of
+	their text has arrived, so the whole document is never held in memory.
+	The object's other members are available from rest once the document has
+	been fed and close() called.
+
+	Values are decoded with the standard library's C scanner
+	(JSONDecoder.raw_decode), which can start part way into a string. A value
+	is only accepted once the character after it has arrived, and a number
+	followed by nothing but more of a number (like "1." or "2e") at the end
+	of the buffer waits for the next chunk, so a number split over two
+	chunks isn't cut short.
+	"""
+
+	WHITESPACE  = re.compile(r'[ \t\n\r]*')
+	ELEMENT_END = re.compile(r'[ \t\n\r]*([,\]])[ \t\n\r]*')
+	NUMBER_TAIL = re.compile(r'[0-9.eE+-]*')
+
+	def __init__(self, key):
+		self.key     = key
+		self.rest    = {}
+		self.scan    = json.JSONDecoder().scan_once
+		self.text    = codecs.getincrementaldecoder('utf-8')()
+		self.buffer  = ''
+		self.pos     = 0
+		self.state   = 'start'
+
+	def feed(self, data):
+		"""
+		Add the next chunk of the document and yield the elements it completes.
+		"""
+
+		self.buffer = self.buffer[self.pos:] + self.text.decode(data)
+		self.pos    = 0
+
+		while True:
+			self.pos = ListDecoder.WHITESPACE.match(self.buffer, self.pos).end()
+			if self.pos >= len(self.buffer):
+				return
+
+			char = self.buffer[self.pos]
+
+			if self.state == 'start':
+				self._expect(char, '{')
+				self.state = 'member'
+			elif self.state == 'member':
+				if char == '}':
+					self.pos  += 1
+					self.state = 'done'
+					continue
+
+				# The member is read again from its name if its value hasn't fully
+				# arrived yet
+				start  = self.pos
+				member = self._member()
+
+				if member is None:
+					self.pos = start
+					return
+
+				key, is_list = member
+				if is_list:
+					self.state = 'element'
+				elif not self._value(key):
+					self.pos = start
+					return
+			elif self.state == 'after_member':
+				self._expect(char, ',}')
+				self.state = 'member' if char == ',' else 'done'
+			elif self.state == 'element':
+				if char == ']':
+					self.pos  += 1
+					self.state = 'after_member'
+					continue
+
+				# Elements are decoded in a tight loop as they make up nearly all
+				# of the document
+				for element in self._elements():
+					yield element
+
+				if self.state == 'element':
+					return
+			else:
+				raise ValueError('Extra data after the JSON document')
+
+	def close(self):
+		"""
+		Finish decoding, raising ValueError if the document was incomplete.
+		"""
+
+		self.text.decode(b'', final = True)
+
+		if self.state != 'done':
+			raise ValueError('The JSON document ended early')
+
+	def _expect(self, char, expected):
+		if char not in expected:
+			raise ValueError('Expecting one of {!r} at {!r}'.format(expected, self.buffer[self.pos:self.pos + 20]))
+
+		self.pos += 1
+
+	def _member(self):
+		"""
+		Read a member name and its colon. Returns (name, whether it holds the
+		list being decoded), or None if more data is needed.
+		"""
+
+		key = self._decode(follow = False)
+		if key is None:
+			return None
+
+		self.pos = ListDecoder.WHITESPACE.match(self.buffer, self.pos).end()
+		if self.pos >= len(self.buffer):
+			return None
+
+		self._expect(self.buffer[self.pos], ':')
+
+		self.pos = ListDecoder.WHITESPACE.match(self.buffer, self.pos).end()
+		if self.pos >= len(self.buffer):
+			return None
+
+		if key[0] == self.key and self.buffer[self.pos] == '[':
+			self.pos += 1
+			return key[0], True
+
+		return key[0], False
+
+	def _value(self, key):
+		value = self._decode()
+		if value is None:
+			return False
+
+		self.rest[key] = value[0]
+		self.state     = 'after_member'
+
+		return True
+
+	def _elements(self):
+		"""
+		Yield the list's elements from pos until the end of the list or of
+		the buffered text.
+		"""
+
+		buffer = self.buffer
+		pos    = self.pos
+
+		while True:
+			try:
+				element, end = self.scan(buffer, pos)
+			except (StopIteration, ValueError):
+				break
+
+			separator = ListDecoder.ELEMENT_END.match(buffer, end)
+			if separator is None:
+				# Wait for the separator, or the rest of a number, unless
+				# something else is there instead
+				if self._incomplete(element, end):
+					break
+
+				end = ListDecoder.WHITESPACE.match(buffer, end).end()
+				if end < len(buffer):
+					raise ValueError('Expecting , or ] at {!r}'.format(buffer[end:end + 20]))
+
+				break
+
+			pos = self.pos = separator.end()
+
+			yield element
+
+			if separator.group(1) == ']':
+				self.state = 'after_member'
+				break
+
+	def _decode(self, follow = True):
+		"""
+		Decode the value at pos, returning (value,) or None if it hasn't fully
+		arrived yet.
+		"""
+
+		try:
+			value, end = self.scan(self.buffer, self.pos)
+		except (StopIteration, ValueError):
+			return None
+
+		if follow and ListDecoder.WHITESPACE.match(self.buffer, end).end() >= len(self.buffer):
+			return None
+
+		if self._incomplete(value, end):
+			return None
+
+		self.pos = end
+
+		return (value,)
+
+	def _incomplete(self, value, end):
+		"""
+		Whether a number ending at end may continue in the next chunk.
+		"""
+
+		if isinstance(value, bool) or not isinstance(value, (int, float)):
+			return False
+
+		return ListDecoder.NUMBER_TAIL.match(self.buffer, end).end() >= len(self.buffer)
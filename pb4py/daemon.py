@@ -0,0 +1,175 @@
+import errno
+import json
+import os
+import socket
+import socketserver
+import stat
+import tempfile
+import threading
+import time
+
+from pb4py import exceptions
+
+def default_socket_path():
+	"""
+	Where the daemon listens: $PB4PY_DAEMON_SOCKET, or a per-user directory
+	under $XDG_RUNTIME_DIR (or the temp directory).
+	"""
+
+	path = os.environ.get('PB4PY_DAEMON_SOCKET')
+	if path:
+		return path
+
+	runtime_dir = os.environ.get('XDG_RUNTIME_DIR') or tempfile.gettempdir()
+
+	return os.path.join(runtime_dir, 'pb4py-{}'.format(os.getuid()), 'daemon.sock')
+
+def check_private(directory):
+	"""
+	Raise PB4PyDaemonException unless the socket's directory belongs to the
+	current user and nobody else can use it, so no other user can listen on
+	the socket or talk to the daemon.
+	"""
+
+	info = os.stat(directory or '.')
+
+	if info.st_uid != os.getuid():
+		raise exceptions.PB4PyDaemonException('{} belongs to another user'.format(directory))
+
+	if stat.S_IMODE(info.st_mode) & 0o077:
+		raise exceptions.PB4PyDaemonException(
+			'{} can be used by other users (mode {:o}), it must be 700'.format(directory, stat.S_IMODE(info.st_mode)),
+		)
+
+def send_request(path, request, timeout = None):
+	"""
+	Send a request to the daemon at path and return its reply. Raises
+	socket.error (OSError) if no daemon is listening and PB4PyDaemonException
+	if the socket's directory isn't private or the connection is lost after
+	the request may have been received.
+	"""
+
+	check_private(os.path.dirname(path))
+
+	sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+	sock.settimeout(timeout)
+
+	try:
+		sock.connect(path)
+
+		try:
+			sock.sendall(json.dumps(request).encode('utf-8') + b'\n')
+
+			with sock.makefile('rb') as fh:
+				line = fh.readline()
+		except (OSError, socket.error) as ex:
+			raise exceptions.PB4PyDaemonException('Lost the connection to the daemon: {}'.format(ex))
+	finally:
+		sock.close()
+
+	if not line:
+		raise exceptions.PB4PyDaemonException('The daemon closed the connection without replying')
+
+	return json.loads(line.decode('utf-8'))
+
+def is_running(path):
+	try:
+		send_request(path, {'command': 'status'}, timeout = 5)
+	except (OSError, socket.error, exceptions.PB4PyDaemonException):
+		return False
+
+	return True
+
+class _RequestHandler(socketserver.StreamRequestHandler):
+	def handle(self):
+		line = self.rfile.readline()
+		if not line:
+			return
+
+		try:
+			request = json.loads(line.decode('utf-8'))
+			reply   = self.server.daemon.handle(request)
+		except Exception as ex: # pylint: disable=broad-except
+			reply = {'error': '{}: {}'.format(type(ex).__name__, ex)}
+
+		self.wfile.write(json.dumps(reply).encode('utf-8') + b'\n')
+
+class _UnixServer(socketserver.UnixStreamServer):
+	def __init__(self, path, daemon):
+		self.daemon = daemon
+
+		socketserver.UnixStreamServer.__init__(self, path, _RequestHandler)
+
+class Daemon(object):
+	"""
+	Long running process that serves requests from pb4.py over a Unix socket,
+	so commands can reuse a warm client instead of building one each time.
+
+	Each connection carries one request and one reply, both a line of JSON.
+	The "status" and "stop" commands are handled here, anything else is
+	passed to the run function given to the daemon. Requests are handled one
+	at a time.
+	"""
+
+	def __init__(self, run, path = None):
+		self.run      = run
+		self.path     = path or default_socket_path()
+		self.started  = None
+		self.requests = 0
+		self.server   = None
+
+	def handle(self, request):
+		command = request.get('command')
+
+		if command == 'status':
+			return {
+				'pid':      os.getpid(),
+				'started':  self.started,
+				'requests': self.requests,
+			}
+
+		if command == 'stop':
+			# shutdown() waits for serve_forever() to return, which can't
+			# happen while this request is being handled
+			threading.Thread(target = self.server.shutdown).start()
+
+			return {'stopped': True}
+
+		self.requests += 1
+
+		return self.run(request)
+
+	def _bind(self):
+		directory = os.path.dirname(self.path)
+		if directory and not os.path.isdir(directory):
+			os.makedirs(directory, 0o700)
+
+		check_private(directory)
+
+		if os.path.exists(self.path):
+			if is_running(self.path):
+				raise exceptions.PB4PyDaemonException('A daemon is already listening on {}'.format(self.path))
+
+			# Left behind by a daemon that didn't shut down cleanly
+			os.unlink(self.path)
+
+		old_umask = os.umask(0o177)
+		try:
+			return _UnixServer(self.path, self)
+		finally:
+			os.umask(old_umask)
+
+	def serve_forever(self):
+		self.server  = self._bind()
+		self.started = time.time()
+
+		try:
+			self.server.serve_forever()
+		finally:
+			self.server.server_close()
+
+			try:
+				os.unlink(self.path)
+			except OSError as ex:
+				if ex.errno != errno.ENOENT:
+					raise
@@ -0,0 +1,109 @@
+import string
+import threading
+import urllib.parse
+
+from pb4py import exceptions
+
+class Endpoint(object):
+	"""
+	An API path template like /v2/pushes/{push}, parsed once. Placeholders
+	must be plain names, so a mistyped template fails when it is compiled
+	rather than on the request that uses it.
+	"""
+
+	__slots__ = ('template', 'fields', 'static')
+
+	def __init__(self, template):
+		fields = set()
+
+		for _, name, spec, conversion in string.Formatter().parse(template):
+			if name is None:
+				continue
+
+			if not name.isidentifier() or spec or conversion:
+				raise exceptions.PB4PyException(
+					'Invalid placeholder {{{}}} in URL template {}, only plain names are allowed'.format(name, template),
+				)
+
+			fields.add(name)
+
+		self.template = template
+		self.fields   = frozenset(fields)
+		self.static   = not fields
+
+	def path(self, url_kwargs):
+		"""
+		Fill the template's placeholders in from url_kwargs.
+		"""
+
+		if self.static:
+			return self.template
+
+		try:
+			return self.template.format(**url_kwargs)
+		except KeyError:
+			raise exceptions.PB4PyException(
+				'URL template {} is missing {}'.format(self.template, ', '.join(sorted(self.fields - set(url_kwargs)))),
+			)
+
+	def __repr__(self):
+		return 'Endpoint({!r})'.format(self.template)
+
+ENDPOINTS = {}
+
+_lock = threading.Lock()
+
+def compile_endpoint(template):
+	"""
+	Get the Endpoint for a template, compiling it the first time it is seen.
+	"""
+
+	endpoint = ENDPOINTS.get(template)
+
+	if endpoint is None:
+		with _lock:
+			endpoint = ENDPOINTS.get(template)
+
+			if endpoint is None:
+				endpoint = ENDPOINTS[template] = Endpoint(template)
+
+	return endpoint
+
+class URLBuilder(object):
+	"""
+	Builds full request URLs on one API root. The root may include a path,
+	like that of a proxy, which is put in front of every endpoint's path. The
+	URLs of endpoints without placeholders are only built once.
+	"""
+
+	def __init__(self, api_root):
+		parts = urllib.parse.urlparse(api_root)
+
+		if parts.scheme not in ('http', 'https') or not parts.netloc:
+			raise exceptions.PB4PyConfigurationException(
+				'The API root must be an http or https URL, not {!r}'.format(api_root),
+			)
+
+		self.api_root = api_root
+		self.root     = urllib.parse.urlunparse((parts.scheme, parts.netloc, parts.path.rstrip('/'), '', '', ''))
+		self.static   = {}
+
+	def build(self, template, url_kwargs):
+		"""
+		Returns the full URL for an endpoint and its API path, which is what
+		cached responses and in-flight requests are keyed by.
+		"""
+
+		urls = self.static.get(template)
+		if urls is not None:
+			return urls
+
+		endpoint = compile_endpoint(template)
+
+		if endpoint.static:
+			urls = self.static[template] = (self.root + template, template)
+			return urls
+
+		path = endpoint.path(url_kwargs)
+
+		return self.root + path, path
@@ -9,8 +9,67 @@ class PB4PyConfigurationException(PB4PyException):
 	There was something wrong with the PB4Py configuration/settings.
 	"""
 
+class PB4PyDaemonException(PB4PyException):
+	"""
+	The CLI daemon could not be started or reached.
+	"""
+
 class PB4PyAPIException(PB4PyException):
 	"""
 	There was something wrong when trying to talk to the PushBullet API.
 	"""
 
+	def __init__(self, message, status_code = None, headers = None, body = None):
+		super(PB4PyAPIException, self).__init__(message)
+
+		self.status_code = status_code
+		self.headers     = headers or {}
+		self.body        = body
+
+class PB4PyConnectionException(PB4PyAPIException):
+	"""
+	The PushBullet API could not be reached.
+	"""
+
+class PB4PyClientException(PB4PyAPIException):
+	"""
+	The PushBullet API rejected the request (4xx status code).
+	"""
+
+class PB4PyAuthenticationException(PB4PyClientException):
+	"""
+	The credentials were missing, invalid or lacked permission (401/403).
+	"""
+
+class PB4PyNotFoundException(PB4PyClientException):
+	"""
+	The requested object doesn't exist (404).
+	"""
+
+class PB4PyRateLimitException(PB4PyClientException):
+	"""
+	The account's rate limit has been used up (429).
+	"""
+
+class PB4PyServerException(PB4PyAPIException):
+	"""
+	The PushBullet API failed to handle the request (5xx status code).
+	"""
+
+def api_exception_type(status_code):
+	"""
+	Get the exception type for an unsuccessful status code.
+	"""
+
+	if status_code in (401, 403):
+		return PB4PyAuthenticationException
+	if status_code == 404:
+		return PB4PyNotFoundException
+	if status_code == 429:
+		return PB4PyRateLimitException
+	if 400 <= status_code < 500:
+		return PB4PyClientException
+	if status_code >= 500:
+		return PB4PyServerException
+
+	return PB4PyAPIException
@@ -0,0 +1,114 @@
+import concurrent.futures
+
+class FanoutResult(object):
+	"""
+	The outcome of running a fanout call for a single item.
+	"""
+
+	__slots__ = ('item', 'response', 'error')
+
+	def __init__(self, item, response = None, error = None):
+		self.item     = item
+		self.response = response
+		self.error    = error
+
+	@property
+	def ok(self):
+		return self.error is None
+
+	def __repr__(self):
+		if self.ok:
+			return 'FanoutResult({!r}, response = {!r})'.format(self.item, self.response)
+
+		return 'FanoutResult({!r}, error = {!r})'.format(self.item, self.error)
+
+def fanout(func, items, max_workers):
+	"""
+	Call func for each item on a pool of max_workers threads and yield a
+	FanoutResult for each item as it completes. At most max_workers calls are
+	queued at any one time so items may be a lazy iterable of any length.
+	Closing the generator early cancels the calls that have not started yet.
+	"""
+
+	items = iter(items)
+
+	with concurrent.futures.ThreadPoolExecutor(max_workers = max_workers) as executor:
+		pending = {}
+
+		def submit(count):
+			for item in items:
+				pending[executor.submit(func, item)] = item
+
+				count -= 1
+				if count == 0:
+					break
+
+		try:
+			submit(max_workers * 2)
+
+			while pending:
+				done, _ = concurrent.futures.wait(
+					pending,
+					return_when = concurrent.futures.FIRST_COMPLETED,
+				)
+
+				for future in done:
+					item = pending.pop(future)
+
+					try:
+						yield FanoutResult(item, response = future.result())
+					except Exception as ex: # pylint: disable=broad-except
+						yield FanoutResult(item, error = ex)
+
+				submit(len(done))
+		finally:
+			for future in pending:
+				future.cancel()
+
+class BatchReport(object):
+	"""
+	The outcome of a batch call, with a FanoutResult for each item in the
+	order the calls completed.
+	"""
+
+	def __init__(self, results = None):
+		self.results = list(results or [])
+
+	@property
+	def succeeded(self):
+		"""
+		The items whose calls succeeded.
+		"""
+
+		return [result.item for result in self.results if result.ok]
+
+	@property
+	def failed(self):
+		"""
+		(item, exception raised) pairs for the calls that failed.
+		"""
+
+		return [(result.item, result.error) for result in self.results if not result.ok]
+
+	@property
+	def ok(self):
+		return all(result.ok for result in self.results)
+
+	def __iter__(self):
+		return iter(self.results)
+
+	def __len__(self):
+		return len(self.results)
+
+	def __repr__(self):
+		failed = len(self.failed)
+
+		return 'BatchReport({} succeeded, {} failed)'.format(len(self.results) - failed, failed)
+
+def batch(func, items, max_workers):
+	"""
+	Call func for each item with fanout() and gather the results into a
+	BatchReport.
+	"""
+
+	return BatchReport(fanout(func, items, max_workers))
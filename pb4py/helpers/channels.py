@@ -1,3 +1,4 @@
+from pb4py import models
 from pb4py.helpers import Helper
 
 class ChannelHelper(Helper):
@@ -11,6 +12,7 @@ class ChannelHelper(Helper):
 		return self._send_request(
 			ChannelHelper.URL_CHANNEL_INFO,
 			'GET',
-			params = {'tag': channel_tag},
+			params    = {'tag': channel_tag},
+			transform = self._model(models.Channel),
 		)
 
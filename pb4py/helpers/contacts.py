@@ -1,3 +1,4 @@
+from pb4py import models
 from pb4py.helpers import Helper
 
 class ContactHelper(Helper):
@@ -6,17 +7,22 @@ class ContactHelper(Helper):
 	URL_CONTACTS_UPDATE = URL_CONTACTS_LIST + '/{contact}'
 	URL_CONTACTS_DELETE = URL_CONTACTS_UPDATE
 
-	def contacts(self, exclude_inactive = True):
+	def contacts(self, exclude_inactive = True, modified_after = None, limit = None, fields = None):
 		"""
-		Get contacts
+		Get contacts. Only the ones modified after the modified_after UNIX
+		timestamp are returned, at most limit of them, with just the keys in
+		fields when it is given.
 		"""
 
-		contacts = self._send_request(
+		return self._list(
 			ContactHelper.URL_CONTACTS_LIST,
-			'GET',
-		)['contacts']
-
-		return contacts if not exclude_inactive else Helper._filter_inactive(contacts)
+			'contacts',
+			models.Contact,
+			exclude_inactive,
+			modified_after,
+			limit,
+			fields,
+		)
 
 	def create_contact(self, name, email):
 		"""
@@ -26,7 +32,8 @@ class ContactHelper(Helper):
 		return self._send_request(
 			ContactHelper.URL_CONTACTS_CREATE,
 			'POST',
-			data = {'name': name, 'email': email},
+			data      = {'name': name, 'email': email},
+			transform = self._model(models.Contact),
 		)
 
 	def update_contact(self, contact_iden, **kwargs):
@@ -39,6 +46,7 @@ class ContactHelper(Helper):
 			'POST',
 			url_kwargs = {'contact': contact_iden},
 			data       = kwargs,
+			transform  = self._model(models.Contact),
 		)
 
 	def delete_contact(self, contact_iden):
@@ -46,9 +54,17 @@ class ContactHelper(Helper):
 		Delete contact
 		"""
 
-		self._send_request(
+		return self._send_request(
 			ContactHelper.URL_CONTACTS_DELETE,
 			'DELETE',
 			url_kwargs = {'contact': contact_iden}
 		)
 
+	def delete_contacts(self, contact_idens, max_workers = None):
+		"""
+		Delete several contacts concurrently on a pool of max_workers threads.
+		Returns a BatchReport whose items are the contact idens.
+		"""
+
+		return self._batch(self.delete_contact, contact_idens, max_workers)
+
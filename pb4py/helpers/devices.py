@@ -1,3 +1,4 @@
+from pb4py import models
 from pb4py.helpers import Helper
 
 class DeviceHelper(Helper):
@@ -6,33 +7,38 @@ class DeviceHelper(Helper):
 	URL_DEVICE_UPDATE = URL_DEVICE_LIST + '/{device}'
 	URL_DEVICE_DELETE = URL_DEVICE_UPDATE
 
-	def devices(self, exclude_inactive = True):
+	def devices(self, exclude_inactive = True, modified_after = None, limit = None, fields = None):
 		"""
-		List devices.
+		List devices. Only the ones modified after the modified_after UNIX
+		timestamp are returned, at most limit of them, with just the keys in
+		fields when it is given.
 		"""
 
-		resp = self._send_request(DeviceHelper.URL_DEVICE_LIST, 'GET')
-
-		devices = resp['devices']
-
-		return devices if not exclude_inactive else Helper._filter_inactive(devices)
+		return self._list(
+			DeviceHelper.URL_DEVICE_LIST,
+			'devices',
+			models.Device,
+			exclude_inactive,
+			modified_after,
+			limit,
+			fields,
+		)
 
 	def create_device(self, name, device_type):
 		"""
 		Create a device.
 		"""
 
-		resp = self.auth.send_request(
+		return self._send_request(
 			DeviceHelper.URL_DEVICE_CREATE,
 			'POST',
-			data = {
+			data      = {
 				'type': device_type,
 				'nickname': name,
 			},
+			transform = self._model(models.Device),
 		)
 
-		return resp
-
 	def update_device(self, device_iden, **kwargs):
 		"""
 		Update an existing device. kwargs gives the values that will be updated.
@@ -43,6 +49,7 @@ class DeviceHelper(Helper):
 			'POST',
 			url_kwargs = {'device': device_iden},
 			data       = kwargs,
+			transform  = self._model(models.Device),
 		)
 
 	def delete_device(self, device_iden):
@@ -50,9 +57,26 @@ class DeviceHelper(Helper):
 		Delete the given device.
 		"""
 
-		self._send_request(
+		return self._send_request(
 			DeviceHelper.URL_DEVICE_DELETE,
 			'DELETE',
 			url_kwargs = {'device': device_iden},
 		)
 
+	def update_devices(self, updates, max_workers = None):
+		"""
+		Update several devices concurrently on a pool of max_workers threads.
+		updates maps each device iden to a dictionary of the values to update.
+		Returns a BatchReport whose items are the device idens.
+		"""
+
+		return self._batch(lambda iden: self.update_device(iden, **updates[iden]), list(updates), max_workers)
+
+	def delete_devices(self, device_idens, max_workers = None):
+		"""
+		Delete several devices concurrently on a pool of max_workers threads.
+		Returns a BatchReport whose items are the device idens.
+		"""
+
+		return self._batch(self.delete_device, device_idens, max_workers)
+
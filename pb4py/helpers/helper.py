@@ -1,53 +1,519 @@
 import abc
-import requests
+import logging
+import time
+import urllib.parse
 
-from pb4py import exceptions, utils
+from pb4py import exceptions, fanout, utils
+from pb4py.codec import ListDecoder, get_codec
+from pb4py.endpoints import URLBuilder, compile_endpoint
+from pb4py.logger import REQUEST_LOGGER
+from pb4py.metrics import RequestInfo
 
-# Try and import urlparse. This may fail based on the version of Python that is
-# on the system. We do provide a fallback option, however.
-try:
-	import urlparse
-except ImportError:
-	# pylint: disable=import-error, no-name-in-module
-	import urllib.parse
-	urlparse = urllib.parse
-	# pylint: enable=import-error, no-name-in-module
-
-class Helper(object):
-	__metaclass__ = abc.ABCMeta
+request_log = logging.getLogger(REQUEST_LOGGER)
 
+class Helper(metaclass = abc.ABCMeta):
 	API_ROOT    = 'https://api.pushbullet.com'
 	API_VERSION = '/v2'
 
-	def _send_request(self, url, method, url_kwargs = {}, skip_auth = False, **kwargs):
-		url_parts = urlparse.urlparse(Helper.API_ROOT)
-
-		url = urlparse.urlunparse(
-			(
-				url_parts.scheme,
-				url_parts.netloc,
-				url.format(**url_kwargs),
-				'',
-				'',
-				'',
+	# Size of the chunks that streamed list pages are read in
+	STREAM_CHUNK_SIZE = 64 * 1024
+
+	cache     = None
+	coalescer = None
+	codec     = get_codec()
+	metrics   = None
+	models    = False
+	sync      = None
+	urls      = URLBuilder(API_ROOT)
+
+	def __init_subclass__(cls, **kwargs):
+		super().__init_subclass__(**kwargs)
+
+		# Compile the URL templates up front so a bad one fails on import
+		for name, value in vars(cls).items():
+			if name.startswith('URL_') and isinstance(value, str):
+				compile_endpoint(value)
+
+	@property
+	def api_root(self):
+		return self.urls.api_root
+
+	@api_root.setter
+	def api_root(self, api_root):
+		self.urls = URLBuilder(api_root)
+
+	def _send_request(self, url, method, url_kwargs = {}, skip_auth = False, transform = None, stream_key = None, **kwargs):
+		"""
+		Send a request to the API and return the decoded response. If a
+		transform is given it is applied to the decoded response before it is
+		returned.
+
+		If stream_key is given the response is a StreamedPage that decodes the
+		list under that key as the body is read instead.
+		"""
+
+		info      = RequestInfo(method, url)
+		url, path, auth = self._prepare_request(url, url_kwargs, skip_auth)
+		info.url        = url
+
+		self._before_request(info, kwargs)
+
+		try:
+			cache_key = self._cache_key(method, path, auth, kwargs)
+			resp      = self.cache.lookup(cache_key, kwargs) if cache_key else None
+
+			# Cached responses have to be read whole so they are not streamed
+			if stream_key is not None and not cache_key:
+				kwargs['stream'] = True
+
+			if resp is None and self._coalesces(method, kwargs):
+				resp, info.coalesced = self.coalescer.do(
+					Helper._request_key(path, auth, kwargs),
+					lambda: self._send_shared(info, auth, kwargs, cache_key),
+				)
+
+				info.status_code = resp.status_code
+			elif resp is None:
+				resp = self._send_and_store(info, auth, kwargs, cache_key)
+			else:
+				info.cached      = True
+				info.status_code = resp.status_code
+
+			if method != 'GET':
+				self._invalidate(path)
+
+			if stream_key is not None:
+				return self._stream_response(resp, stream_key, info)
+
+			return self._handle_response(resp, transform, info)
+		except Exception as ex:
+			info.error = ex
+			raise
+		finally:
+			self._after_request(info)
+
+	def _send_and_store(self, info, auth, kwargs, cache_key):
+		resp = self._send_scheduled(info, auth, kwargs)
+
+		if cache_key:
+			stored = self.cache.store(cache_key, resp)
+
+			if stored is None:
+				# A 304 for an entry that has been evicted since, fetch it whole
+				self.cache.unconditional(kwargs)
+
+				resp   = self._send_scheduled(info, auth, kwargs)
+				stored = self.cache.store(cache_key, resp) or resp
+
+			resp = stored
+
+		return resp
+
+	def _send_shared(self, info, auth, kwargs, cache_key):
+		resp = self._send_and_store(info, auth, kwargs, cache_key)
+
+		# Read the body now, the threads sharing the response decode it at once
+		resp.content # pylint: disable=pointless-statement
+
+		return resp
+
+	def _coalesces(self, method, request_kwargs):
+		"""
+		Whether concurrent identical requests share one call. Only reads that
+		aren't streamed are shared.
+		"""
+
+		return self.coalescer is not None and method == 'GET' and not request_kwargs.get('stream')
+
+	@staticmethod
+	def _request_key(path, auth, request_kwargs):
+		params = tuple(sorted((request_kwargs.get('params') or {}).items()))
+
+		return (path, params, auth)
+
+	def _send_scheduled(self, info, auth, kwargs):
+		"""
+		Send a request once the account's rate limit allows it, retrying it
+		with backoff when the scheduler says it is safe to.
+		"""
+
+		key = auth[0] if auth else None
+
+		while True:
+			delay = self.scheduler.throttle_delay(key)
+			if delay:
+				time.sleep(delay)
+
+			info.attempts += 1
+
+			try:
+				resp = self.transport.request(info.method, info.url, auth = auth, **kwargs)
+			except self.transport.CONNECTION_ERRORS as ex:
+				delay = self.scheduler.retry_delay(info.method, info.attempts - 1, error = ex)
+				if delay is None:
+					self._raise_connection_error(info.url, ex)
+			except self.transport.REQUEST_ERRORS as ex:
+				self._raise_connection_error(info.url, ex)
+			else:
+				self.scheduler.record(key, resp)
+
+				info.status_code = resp.status_code
+
+				delay = self.scheduler.retry_delay(info.method, info.attempts - 1, resp = resp)
+				if delay is None:
+					if hasattr(resp, 'elapsed'):
+						info.server_time = resp.elapsed.total_seconds()
+
+					return resp
+
+				# Give a streamed response's connection back before retrying
+				resp.close()
+
+			self.logger.warning('Retrying %s %s in %.2fs (attempt %d)', info.method, info.url, delay, info.attempts)
+			time.sleep(delay)
+
+	def _before_request(self, info, request_kwargs):
+		if self.metrics is None:
+			return
+
+		info.bytes_out = Helper._body_size(request_kwargs.get('data'))
+
+		self.metrics.before(info)
+
+	def _after_request(self, info):
+		if self.metrics is not None:
+			self.metrics.after(info)
+
+		if request_log.isEnabledFor(logging.DEBUG):
+			elapsed = (time.time() - info.started) * 1000
+
+			request_log.debug(
+				'%s %s %s %.1fms',
+				info.method,
+				info.url,
+				info.status_code,
+				elapsed,
+				extra = {
+					'method':      info.method,
+					'url':         info.url,
+					'status_code': info.status_code,
+					'attempts':    info.attempts,
+					'cached':      info.cached,
+					'elapsed_ms':  round(elapsed, 3),
+				},
 			)
+
+	@staticmethod
+	def _body_size(data):
+		if data is None:
+			return 0
+
+		if isinstance(data, dict):
+			return len(urllib.parse.urlencode(data))
+
+		try:
+			return len(data)
+		except TypeError:
+			return 0
+
+	def _raise_connection_error(self, url, error):
+		utils.log_and_raise(
+			self.logger,
+			'Unable to reach {}: {}'.format(url, error),
+			exceptions.PB4PyConnectionException,
 		)
 
-		auth = self.auth.get_request_auth() if not skip_auth else None
+	def _prepare_request(self, url, url_kwargs, skip_auth):
+		"""
+		Returns the full URL of the endpoint, its API path and the request's
+		auth.
+		"""
 
-		resp = requests.request(method, url, auth = auth, **kwargs)
-		if resp.status_code < 200 and resp.status_code >= 300:
-			utils.log_and_raise(
-				self.logger,
-				'Bad status code of {} returned'.format(resp.status_code),
-				exceptions.PB4PyAPIException,
-			)
+		url, path = self.urls.build(url, url_kwargs)
+		auth      = self.auth.get_request_auth() if not skip_auth else None
+
+		return url, path, auth
+
+	def _cache_key(self, method, path, auth, request_kwargs):
+		if method != 'GET' or self.cache is None:
+			return None
+
+		return self.cache.key(path, auth, request_kwargs.get('params'))
+
+	def _invalidate(self, path):
+		"""
+		Forget any cached or replicated data for the collection that a
+		modifying request to the API path changes.
+		"""
+
+		if self.cache is not None:
+			self.cache.invalidate(path)
+
+		if self.coalescer is not None:
+			# Reads that started before the change mustn't be handed to callers
+			# that come after it
+			root = '/'.join(path.split('/')[:3])
+
+			self.coalescer.forget(lambda key: key[0].startswith(root))
+
+		if self.sync is not None:
+			self.sync.mark_stale(path)
+
+	def _handle_response(self, resp, transform = None, info = None):
+		if resp.status_code < 200 or resp.status_code >= 300:
+			self._raise_api_error(resp)
+
+		if info is None or self.metrics is None:
+			ret = self.codec.loads(resp.content) if resp.status_code != 204 else None
+		else:
+			started = time.time()
+			ret     = self.codec.loads(resp.content) if resp.status_code != 204 else None
+
+			info.decode_time = time.time() - started
+			info.bytes_in    = len(resp.content)
 
-		ret = resp.json() if resp.status_code != 204 else None
+		return transform(ret) if transform else ret
 
-		return ret
+	def _stream_response(self, resp, key, info = None):
+		if resp.status_code < 200 or resp.status_code >= 300:
+			try:
+				self._raise_api_error(resp)
+			finally:
+				resp.close()
+
+		if info is not None and self.metrics is not None:
+			# The body hasn't been read yet so only its advertised size is known
+			info.bytes_in = int(resp.headers.get('Content-Length', 0))
+
+		return StreamedPage(resp, key, Helper.STREAM_CHUNK_SIZE, self.transport.REQUEST_ERRORS)
+
+	def _raise_api_error(self, resp):
+		try:
+			body = self.codec.loads(resp.content)
+		except ValueError:
+			body = resp.content
+
+		try:
+			message = body['error']['message']
+		except (KeyError, TypeError):
+			message = 'Bad status code of {} returned'.format(resp.status_code)
+
+		utils.log_and_raise(
+			self.logger,
+			'{} ({})'.format(message, resp.status_code),
+			exceptions.api_exception_type(resp.status_code),
+			status_code = resp.status_code,
+			headers     = dict(resp.headers),
+			body        = body,
+		)
+
+	def _iter_collection(self, url, key, params = None, page_size = None, limit = None, model = None, fields = None, match = None):
+		"""
+		Lazily iterate over every element of a list endpoint, following the
+		cursor that the API returns until there are no more pages or limit
+		elements have been yielded. Pages are decoded as they are read so
+		elements are yielded before the rest of their page has arrived and
+		only one is held at a time.
+
+		Elements that match returns False for are skipped and only the keys in
+		fields are kept of the rest, see _extract.
+		"""
+
+		params = dict(params or {})
+		count  = 0
+
+		while limit is None or count < limit:
+			# Skipped elements don't count so pages aren't cut down to the
+			# number still wanted when filtering
+			page_limit = Helper._page_limit(page_size, None if match else limit, count)
+			if page_limit:
+				params['limit'] = page_limit
+
+			with self._send_request(url, 'GET', params = params, stream_key = key) as page:
+				for element in page:
+					if match is not None and not match(element):
+						continue
+
+					if fields is not None:
+						element = Helper._project(element, fields)
+
+					yield model(element) if model else element
+
+					count += 1
+					if limit is not None and count >= limit:
+						return
+
+			cursor = page.rest.get('cursor')
+			if not cursor:
+				return
+
+			params['cursor'] = cursor
+
+	def _list(self, url, key, model_type, exclude_inactive = True, modified_after = None, limit = None, fields = None, match = None):
+		"""
+		Get the elements of a list endpoint, from the local replica when it
+		handles the collection. The active, modified_after and limit filters
+		are sent to the API so it doesn't return elements that would be thrown
+		away, the others are applied to the decoded response. Inactive
+		elements are dropped here too, in case the API returns them anyway.
+		"""
+
+		model = self._model(model_type)
+
+		if exclude_inactive and self._synced(key):
+			elements = self.sync.get(key, modified_after or 0)
+
+			if match is not None:
+				elements = [elem for elem in elements if match(elem)]
+
+			elements = elements[:limit] if limit else elements
+
+			return Helper._extract(key, model = model, fields = fields)({key: elements})
+
+		return self._send_request(
+			url,
+			'GET',
+			params    = Helper._list_params(exclude_inactive, modified_after, limit),
+			transform = Helper._extract(key, exclude_inactive, model, fields, match),
+		)
+
+	@staticmethod
+	def _list_params(exclude_inactive, modified_after = None, limit = None):
+		"""
+		The query parameters that filter a list endpoint on the API's side.
+		"""
+
+		params = {'active': 'true' if exclude_inactive else 'false'}
+
+		if modified_after is not None:
+			params['modified_after'] = modified_after
+
+		if limit:
+			params['limit'] = limit
+
+		return params
+
+	def _batch(self, func, items, max_workers = None):
+		"""
+		Call func for each item on a pool of max_workers threads, which
+		defaults to the transport's per-host pool size, and return a
+		BatchReport of the results.
+		"""
+
+		return fanout.batch(func, items, max_workers or self.transport.pool_maxsize)
+
+	def _synced(self, name):
+		"""
+		Whether the named collection can be answered from the local replica.
+		"""
+
+		return self.sync is not None and self.sync.handles(name)
+
+	@staticmethod
+	def _page_limit(page_size, limit, count):
+		"""
+		The number of elements to ask for in the next page.
+		"""
+
+		if limit is None:
+			return page_size
+
+		return min(page_size or limit, limit - count)
+
+	def _model(self, model_type):
+		"""
+		The model type to return API objects as, or None when the client
+		returns plain dictionaries. It also works as a response transform.
+		"""
+
+		return model_type if self.models else None
+
+	def _wrap_all(self, model_type, elements):
+		return model_type.from_list(elements) if self.models else elements
+
+	@staticmethod
+	def _extract(key, exclude_inactive = False, model = None, fields = None, match = None):
+		"""
+		Build a response transform that pulls the list stored under key out of
+		the response, optionally dropping inactive elements and the ones that
+		match returns False for, keeping only the keys in fields and turning
+		the rest into models.
+		"""
+
+		def transform(resp):
+			elements = resp[key]
+
+			if exclude_inactive:
+				elements = Helper._filter_inactive(elements)
+
+			if match is not None:
+				elements = [elem for elem in elements if match(elem)]
+
+			if fields is not None:
+				elements = [Helper._project(elem, fields) for elem in elements]
+
+			return model.from_list(elements) if model else elements
+
+		return transform
 
 	@staticmethod
 	def _filter_inactive(elements):
 		return [elem for elem in elements if elem['active']]
 
+	@staticmethod
+	def _project(element, fields):
+		"""
+		Copy of element with only the given keys.
+		"""
+
+		return {field: element[field] for field in fields if field in element}
+
+
+class StreamedPage(object):
+	"""
+	A page from a list endpoint whose body is decoded while it is read.
+	Iterating over it yields the elements of the list under key; the page's
+	other fields, like the cursor, are in rest once it has been iterated
+	over. Close it, or use it as a context manager, to give the connection
+	back if it isn't read to the end. The transport's errors while reading
+	the body are raised as PB4PyConnectionException.
+	"""
+
+	def __init__(self, resp, key, chunk_size, errors = ()):
+		self.resp       = resp
+		self.chunk_size = chunk_size
+		self.errors     = errors
+		self.decoder    = ListDecoder(key)
+
+	@property
+	def rest(self):
+		return self.decoder.rest
+
+	def _chunks(self):
+		# Cached responses have already been read
+		if not hasattr(self.resp, 'iter_content'):
+			return [self.resp.content]
+
+		return self.resp.iter_content(self.chunk_size)
+
+	def __iter__(self):
+		try:
+			for chunk in self._chunks():
+				for element in self.decoder.feed(chunk):
+					yield element
+		except self.errors as ex:
+			raise exceptions.PB4PyConnectionException(
+				'The connection broke while reading {}: {}'.format(self.resp.url, ex),
+			)
+
+		self.decoder.close()
+
+	def close(self):
+		if hasattr(self.resp, 'close'):
+			self.resp.close()
+
+	def __enter__(self):
+		return self
+
+	def __exit__(self, exc_type, exc_value, traceback):
+		self.close()
@@ -1,7 +1,6 @@
+from pb4py import models
 from pb4py.helpers import Helper
 
-import json
-
 class MeHelper(Helper):
 	URL_ME = Helper.API_VERSION + '/users/me'
 
@@ -10,7 +9,7 @@ class MeHelper(Helper):
 		Get information about the current user
 		"""
 
-		return self._send_request(MeHelper.URL_ME, 'GET')
+		return self._send_request(MeHelper.URL_ME, 'GET', transform = self._model(models.User))
 
 	def update_me(self, **kwargs):
 		"""
@@ -20,7 +19,8 @@ class MeHelper(Helper):
 		return self._send_request(
 			MeHelper.URL_ME,
 			'POST',
-			headers = {'content-type': 'application/json'},
-			data    = json.dumps(kwargs),
+			headers   = {'content-type': 'application/json'},
+			data      = self.codec.dumps(kwargs),
+			transform = self._model(models.User),
 		)
 
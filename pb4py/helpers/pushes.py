@@ -1,11 +1,16 @@
-from pb4py import exceptions, utils
+from pb4py import exceptions, fanout, models, utils
 from pb4py.helpers import Helper
+from pb4py.upload import FileSource, MultipartStream
+
+import functools
+import os
 
 class PushHelper(Helper):
-	URL_PUSH_SEND    = Helper.API_VERSION + '/pushes'
-	URL_PUSH_HISTORY = URL_PUSH_SEND
-	URL_PUSH_DISMISS = URL_PUSH_SEND + '/{push}'
-	URL_PUSH_DELETE  = URL_PUSH_DISMISS
+	URL_PUSH_SEND       = Helper.API_VERSION + '/pushes'
+	URL_PUSH_HISTORY    = URL_PUSH_SEND
+	URL_PUSH_DELETE_ALL = URL_PUSH_SEND
+	URL_PUSH_DISMISS    = URL_PUSH_SEND + '/{push}'
+	URL_PUSH_DELETE     = URL_PUSH_DISMISS
 	URL_FILE_UPLOAD  = Helper.API_VERSION + '/upload-request'
 
 	MAX_FILE_SIZE = 25000000
@@ -17,6 +22,13 @@ class PushHelper(Helper):
 		'note',
 	]
 
+	TARGET_TYPES = [
+		'device_iden',
+		'email',
+		'channel_tag',
+		'client_iden',
+	]
+
 	def push(self, push_type, **kwargs):
 		"""
 		Push to a specific device, all devices, or a user. Pushes come in several type
@@ -46,6 +58,191 @@ class PushHelper(Helper):
 		To push a file you must first upload it using the upload_file method.
 		"""
 
+		self._check_push_type(push_type)
+
+		kwargs['type'] = push_type
+
+		return self._send_request(PushHelper.URL_PUSH_SEND, 'POST', data = kwargs, transform = self._model(models.Push))
+
+	def push_many(self, push_type, targets, target_type = 'email', max_workers = None, **kwargs):
+		"""
+		Send the same push to many targets in parallel. Each target is either a
+		dictionary of target parameters (device_iden, email, channel_tag or
+		client_iden) or a plain string that is used as the target_type
+		parameter.
+
+		Pushes are sent on a pool of max_workers threads, which defaults to the
+		transport's per-host pool size. This is a generator that yields a
+		FanoutResult for each target as its push completes; the result's item
+		is the target, response is the created push and error is the exception
+		raised when the push failed.
+		"""
+
+		self._check_push_type(push_type)
+		self._check_target_type(target_type)
+
+		def send(target):
+			data = dict(kwargs)
+			data.update(self._target_params(target, target_type))
+
+			return self.push(push_type, **data)
+
+		return fanout.fanout(send, targets, max_workers or self.transport.pool_maxsize)
+
+	def push_many_processes(self, push_type, targets, target_type = 'email', processes = None, max_workers = None, **kwargs):
+		"""
+		Send the same push to many targets from several processes, for when
+		one process can't keep up. The targets are split between processes
+		worker processes (one per CPU by default) that each send their share
+		like push_many with a client built from this client's settings.
+
+		Returns a pb4py.process_fanout.ProcessFanoutReport once every push
+		has been sent. Its results are in the order of the targets, with the
+		iden of the created push as the response, and its workers give the
+		throughput of each process. See pb4py.process_fanout.process_fanout.
+		"""
+
+		self._check_push_type(push_type)
+		self._check_target_type(target_type)
+
+		# multiprocessing is only imported when it's used
+		from pb4py.process_fanout import process_fanout
+
+		return process_fanout(
+			self.settings,
+			push_type,
+			targets,
+			target_type,
+			processes or os.cpu_count() or 1,
+			max_workers,
+			kwargs,
+		)
+
+	def upload_file(self, file, filename = None, file_type = None, file_size = None, progress = None):
+		"""
+		Upload a file so it can be pushed. The file can be a path, a file-like
+		object or an iterable of bytes; it is streamed to the server rather than
+		read into memory. The size is checked against MAX_FILE_SIZE before any
+		request is made. It is worked out for paths and seekable files but has
+		to be given as file_size for anything else. The name and MIME type are
+		guessed when not given.
+
+		progress, if given, is called with the number of bytes sent so far and
+		the total size as the upload proceeds.
+
+		Returns the upload information, including the file_name, file_type and
+		file_url to push.
+		"""
+
+		return self._upload_source(self._file_source(file, filename, file_type, file_size), progress)
+
+	def push_file(self, file, body = None, filename = None, file_type = None, file_size = None, progress = None, **kwargs):
+		"""
+		Upload a file and push it. The file arguments are the same as for
+		upload_file and the rest are passed on to push, ex: device_iden.
+		"""
+
+		source = self._file_source(file, filename, file_type, file_size)
+		upload = self._upload_source(source, progress)
+
+		return self.push('file', **PushHelper._file_push_data(upload, body, kwargs))
+
+	def push_files(self, files, body = None, max_workers = None, progress = None, **kwargs):
+		"""
+		Upload and push several files in parallel. Every file is checked before
+		anything is uploaded. This is a generator that yields a FanoutResult
+		for each file as its push completes, see push_many.
+
+		progress, if given, is called with the file, the number of bytes of it
+		sent so far and its total size.
+		"""
+
+		sources = [(file, self._file_source(file)) for file in files]
+
+		def send(item):
+			file, source = item
+
+			upload = self._upload_source(source, functools.partial(progress, file) if progress else None)
+
+			return self.push('file', **PushHelper._file_push_data(upload, body, kwargs))
+
+		return PushHelper._file_results(
+			fanout.fanout(send, sources, max_workers or self.transport.pool_maxsize),
+		)
+
+	@staticmethod
+	def _file_results(results):
+		# Report results against the file that was given, not its source
+		for result in results:
+			result.item = result.item[0]
+
+			yield result
+
+	def _file_source(self, file, file_name = None, file_type = None, file_size = None):
+		source = FileSource(file, file_name, file_type, file_size)
+
+		if source.file_size is None:
+			utils.log_and_raise(
+				self.logger,
+				'Unable to determine the size of {}, give its file_size'.format(source.file_name or 'the file'),
+				exceptions.PB4PyException,
+			)
+
+		if source.file_size > PushHelper.MAX_FILE_SIZE:
+			utils.log_and_raise(
+				self.logger,
+				'{} is {:.2f}MB, the largest file that can be pushed is {:.2f}MB'.format(
+					source.file_name or 'The file',
+					source.file_size / PushHelper.MB_DIVIDE,
+					PushHelper.MAX_FILE_SIZE / PushHelper.MB_DIVIDE,
+				),
+				exceptions.PB4PyException,
+			)
+
+		return source
+
+	def _upload_source(self, source, progress = None):
+		upload = self._send_request(
+			PushHelper.URL_FILE_UPLOAD,
+			'POST',
+			data = {'file_name': source.file_name, 'file_type': source.file_type},
+		)
+
+		body = MultipartStream(source, upload.get('data'), progress)
+
+		try:
+			resp = self.transport.request(
+				'POST',
+				upload['upload_url'],
+				data    = body,
+				headers = {'Content-Type': body.content_type},
+			)
+		except self.transport.REQUEST_ERRORS as ex:
+			self._raise_connection_error(upload['upload_url'], ex)
+
+		self._check_upload(resp)
+
+		return upload
+
+	def _check_upload(self, resp):
+		if resp.status_code < 200 or resp.status_code >= 300:
+			self._raise_api_error(resp)
+
+	@staticmethod
+	def _file_push_data(upload, body, kwargs):
+		data = dict(kwargs)
+		data.update({
+			'file_name': upload['file_name'],
+			'file_type': upload['file_type'],
+			'file_url':  upload['file_url'],
+		})
+
+		if body is not None:
+			data['body'] = body
+
+		return data
+
+	def _check_push_type(self, push_type):
 		if push_type not in PushHelper.PUSH_TYPES:
 			utils.log_and_raise(
 				self.logger,
@@ -53,24 +250,96 @@ class PushHelper(Helper):
 				exceptions.PB4PyException
 			)
 
-		kwargs['type'] = push_type
+	def _check_target_type(self, target_type):
+		if target_type not in PushHelper.TARGET_TYPES:
+			utils.log_and_raise(
+				self.logger,
+				'Invalid target type {}'.format(target_type),
+				exceptions.PB4PyException
+			)
 
-		return self._send_request(PushHelper.URL_PUSH_SEND, 'POST', data = kwargs)
+	@staticmethod
+	def _target_params(target, target_type):
+		if isinstance(target, dict):
+			return target
 
-	def push_history(self, modified_timestamp = 0, exclude_inactive = True):
+		return {target_type: target}
+
+	def push_history(self, modified_timestamp = 0, exclude_inactive = True, push_type = None, target_device_iden = None, fields = None):
 		"""
 		Get all the pushes that were created/modified after the given
-		UNIX timestamp.
+		UNIX timestamp. push_type and target_device_iden only keep the pushes
+		of that type or sent to that device, and fields lists the keys to keep
+		of each push.
 		"""
 
-		return self._send_request(
+		return self._list(
 			PushHelper.URL_PUSH_HISTORY,
-			'GET',
-			params = {
-				'active':        'true' if exclude_inactive else 'false',
-				'modified_after': modified_timestamp,
-			},
-		)['pushes']
+			'pushes',
+			models.Push,
+			exclude_inactive,
+			modified_timestamp,
+			fields = fields,
+			match  = self._push_filter(push_type, target_device_iden),
+		)
+
+	def iter_push_history(self, modified_after = 0, page_size = None, limit = None, exclude_inactive = True, push_type = None, target_device_iden = None, fields = None):
+		"""
+		Iterate over all the pushes that were created/modified after the given
+		UNIX timestamp, newest first. Pages are fetched lazily as the iterator
+		is consumed so memory use stays constant and stopping early skips the
+		remaining requests. page_size sets how many pushes are requested at a
+		time and limit caps the total number of pushes yielded. push_type,
+		target_device_iden and fields work like they do for push_history.
+		"""
+
+		return self._iter_collection(
+			PushHelper.URL_PUSH_HISTORY,
+			'pushes',
+			params    = Helper._list_params(exclude_inactive, modified_after),
+			page_size = page_size,
+			limit     = limit,
+			model     = self._model(models.Push),
+			fields    = fields,
+			match     = self._push_filter(push_type, target_device_iden),
+		)
+
+	def _push_filter(self, push_type, target_device_iden):
+		"""
+		A function matching the pushes with the given type and target device,
+		or None if neither is set. The API can't filter on these.
+		"""
+
+		if push_type is None and target_device_iden is None:
+			return None
+
+		if push_type is not None:
+			self._check_push_type(push_type)
+
+		def match(push):
+			if push_type is not None and push.get('type') != push_type:
+				return False
+
+			return target_device_iden is None or push.get('target_device_iden') == target_device_iden
+
+		return match
+
+	def search_pushes(self, refresh = True, limit = None, **filters):
+		"""
+		Search the local push store, newest first. The store is synced with
+		the push history first unless refresh is False. The filters are:
+
+			* push_type          - the type of push
+			* sender_email       - the email of the user that sent the push
+			* target_device_iden - the device the push was sent to
+			* modified_after     - UNIX timestamp the push was modified after
+			* modified_before    - UNIX timestamp the push was modified before
+		"""
+
+		if refresh:
+			self.push_store.sync(self)
+
+		return self._wrap_all(models.Push, self.push_store.query(limit = limit, **filters))
 
 	def dismiss_push(self, push_iden):
 		"""
@@ -82,6 +351,7 @@ class PushHelper(Helper):
 			'POST',
 			url_kwargs = {'push': push_iden},
 			data       = {'dismissed': 'true'},
+			transform  = self._model(models.Push),
 		)
 
 	def delete_push(self, push_iden):
@@ -89,9 +359,32 @@ class PushHelper(Helper):
 		Delete a push
 		"""
 
-		self._send_request(
+		return self._send_request(
 			PushHelper.URL_PUSH_DELETE,
 			'DELETE',
 			url_kwargs = {'push': push_iden},
 		)
 
+	def dismiss_pushes(self, push_idens, max_workers = None):
+		"""
+		Dismiss several pushes concurrently on a pool of max_workers threads.
+		Returns a BatchReport whose items are the push idens.
+		"""
+
+		return self._batch(self.dismiss_push, push_idens, max_workers)
+
+	def delete_pushes(self, push_idens, max_workers = None):
+		"""
+		Delete several pushes concurrently on a pool of max_workers threads.
+		Returns a BatchReport whose items are the push idens.
+		"""
+
+		return self._batch(self.delete_push, push_idens, max_workers)
+
+	def delete_all_pushes(self):
+		"""
+		Delete every push with a single request.
+		"""
+
+		return self._send_request(PushHelper.URL_PUSH_DELETE_ALL, 'DELETE')
+
@@ -1,3 +1,4 @@
+from pb4py import models
 from pb4py.helpers import Helper
 
 class SubscriptionHelper(Helper):
@@ -5,17 +6,22 @@ class SubscriptionHelper(Helper):
 	URL_SUBSCRIPTION_CREATE = URL_SUBSCRIPTION_LIST
 	URL_SUBSCRIPTION_DELETE = URL_SUBSCRIPTION_LIST + '/{channel}'
 
-	def subscriptions(self, exclude_inactive = True):
+	def subscriptions(self, exclude_inactive = True, modified_after = None, limit = None, fields = None):
 		"""
-		List Subscriptions
+		List Subscriptions. Only the ones modified after the modified_after UNIX
+		timestamp are returned, at most limit of them, with just the keys in
+		fields when it is given.
 		"""
 
-		subscriptions = self._send_request(
+		return self._list(
 			SubscriptionHelper.URL_SUBSCRIPTION_LIST,
-			'GET',
-		)['subscriptions']
-
-		return subscriptions if not exclude_inactive else Helper._filter_inactive(subscriptions)
+			'subscriptions',
+			models.Subscription,
+			exclude_inactive,
+			modified_after,
+			limit,
+			fields,
+		)
 
 	def subscribe_to_channel(self, channel_tag):
 		"""
@@ -25,7 +31,8 @@ class SubscriptionHelper(Helper):
 		return self._send_request(
 			SubscriptionHelper.URL_SUBSCRIPTION_CREATE,
 			'POST',
-			data = {'channel_tag': channel_tag},
+			data      = {'channel_tag': channel_tag},
+			transform = self._model(models.Subscription),
 		)
 
 	def unsubscribe_to_channel(self, channel_id):
@@ -1,19 +1,126 @@
+import json
 import logging
 import logging.config
+import threading
+
+ROOT_LOGGER    = 'pb4py'
+REQUEST_LOGGER = ROOT_LOGGER + '.requests'
+
+DEFAULT_FORMAT = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+
+# Libraries shouldn't decide where logs go. Unless the application configures
+# logging (or calls Logs.configure) pb4py's records are dropped.
+logging.getLogger(ROOT_LOGGER).addHandler(logging.NullHandler())
+
+class JSONFormatter(logging.Formatter):
+	"""
+	Formats records as a single line JSON object. Fields passed to the logger
+	through "extra" are included.
+	"""
+
+	RESERVED = frozenset(vars(logging.LogRecord('', 0, '', 0, '', (), None)).keys()) | frozenset(['message', 'asctime'])
+
+	def format(self, record):
+		data = {
+			'time':    record.created,
+			'logger':  record.name,
+			'level':   record.levelname,
+			'message': record.getMessage(),
+		}
+
+		data.update({
+			key: value
+			for key, value in vars(record).items()
+			if key not in JSONFormatter.RESERVED
+		})
+
+		if record.exc_info:
+			data['exc_info'] = self.formatException(record.exc_info)
+
+		return json.dumps(data, default = str)
 
 class Logs(object):
+	_handlers = {}
+	_lock     = threading.Lock()
+
 	@staticmethod
 	def getLogger(name):
-		log_formatter = logging.Formatter(fmt='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+		"""
+		Get a logger in the pb4py namespace. No handlers are added to it, so it
+		follows the application's logging configuration.
+		"""
+
+		if name != ROOT_LOGGER and not name.startswith(ROOT_LOGGER + '.'):
+			name = ROOT_LOGGER + '.' + name
+
+		return logging.getLogger(name)
+
+	@staticmethod
+	def configure(level = logging.INFO, fmt = DEFAULT_FORMAT, json_format = False, stream = None):
+		"""
+		Send pb4py's logs to stderr (or stream). Only one handler is ever
+		installed; calling this again with different options replaces it and
+		with the same options does nothing.
+		"""
+
+		def create_handler():
+			handler = logging.StreamHandler(stream)
+			handler.setFormatter(JSONFormatter() if json_format else logging.Formatter(fmt = fmt))
+
+			return handler
 
-		handler = logging.StreamHandler()
-		handler.setLevel(logging.DEBUG)
-		handler.setFormatter(log_formatter)
+		Logs._install(ROOT_LOGGER, (fmt, json_format, id(stream)), create_handler, level)
 
+	@staticmethod
+	def configure_request_log(path = None, stream = None):
+		"""
+		Write a JSON line with the method, URL, status code, attempts and
+		timing of every request to the file at path (or to stream). The
+		request log doesn't propagate to the rest of pb4py's logs.
+		"""
+
+		def create_handler():
+			handler = logging.FileHandler(path) if path else logging.StreamHandler(stream)
+			handler.setFormatter(JSONFormatter())
+
+			return handler
+
+		logger = Logs._install(REQUEST_LOGGER, (path, id(stream)), create_handler, logging.DEBUG)
+		logger.propagate = False
+
+	@staticmethod
+	def configure_from_settings(settings):
+		"""
+		Apply the "logging" section of the client settings:
+
+			* level       - send pb4py's logs to stderr at this level
+			* json        - format those logs as JSON
+			* request_log - file to write the JSON request log to
+		"""
+
+		if 'level' in settings:
+			Logs.configure(level = settings['level'], json_format = settings.get('json', False))
+
+		if 'request_log' in settings:
+			Logs.configure_request_log(settings['request_log'])
+
+	@staticmethod
+	def _install(name, key, create_handler, level):
 		logger = logging.getLogger(name)
-		logger.setLevel(logging.DEBUG)
 
-		logger.addHandler(handler)
+		with Logs._lock:
+			previous_key, previous = Logs._handlers.get(name, (None, None))
 
-		return logger
+			if previous is None or previous_key != key:
+				if previous is not None:
+					logger.removeHandler(previous)
+					previous.close()
 
+				handler = create_handler()
+				logger.addHandler(handler)
+
+				Logs._handlers[name] = (key, handler)
+
+			logger.setLevel(level)
+
+		return logger
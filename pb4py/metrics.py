@@ -0,0 +1,317 @@
+import collections
+import socket
+import threading
+import time
+
+class RequestInfo(object):
+	"""
+	What is known about a single API call. It is handed to the request hooks
+	and filled in as the call progresses.
+	"""
+
+	__slots__ = (
+		'method',
+		'endpoint',
+		'url',
+		'started',
+		'attempts',
+		'status_code',
+		'cached',
+		'coalesced',
+		'server_time',
+		'decode_time',
+		'elapsed',
+		'bytes_out',
+		'bytes_in',
+		'error',
+	)
+
+	def __init__(self, method, endpoint):
+		self.method      = method
+		self.endpoint    = endpoint
+		self.url         = None
+		self.started     = time.time()
+		self.attempts    = 0
+		self.status_code = None
+		self.cached      = False
+		self.coalesced   = False
+		self.server_time = None
+		self.decode_time = None
+		self.elapsed     = None
+		self.bytes_out   = 0
+		self.bytes_in    = 0
+		self.error       = None
+
+class Histogram(object):
+	"""
+	Cumulative histogram with fixed bucket bounds, Prometheus style.
+	"""
+
+	DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+	def __init__(self, buckets = DEFAULT_BUCKETS):
+		self.buckets = tuple(buckets)
+		self.counts  = [0] * (len(self.buckets) + 1)
+		self.sum     = 0.0
+		self.count   = 0
+
+	def observe(self, value):
+		for i, bound in enumerate(self.buckets):
+			if value <= bound:
+				self.counts[i] += 1
+				break
+		else:
+			self.counts[-1] += 1
+
+		self.sum   += value
+		self.count += 1
+
+	def cumulative(self):
+		"""
+		(upper bound, count of observations <= bound) pairs ending with +Inf.
+		"""
+
+		total = 0
+		for bound, count in zip(self.buckets + (float('inf'),), self.counts):
+			total += count
+
+			yield bound, total
+
+	def quantile(self, q):
+		"""
+		Estimate a quantile as the upper bound of the bucket it falls in.
+		"""
+
+		if not self.count:
+			return None
+
+		for bound, total in self.cumulative():
+			if total >= q * self.count:
+				return bound
+
+	def snapshot(self):
+		return {
+			'count': self.count,
+			'sum':   self.sum,
+			'p50':   self.quantile(0.5),
+			'p99':   self.quantile(0.99),
+		}
+
+class Metrics(object):
+	"""
+	Request statistics and hooks for a client. Latency is tracked per
+	endpoint (the URL template, ex: /v2/pushes/{push}) and method.
+
+	Hooks are called with the RequestInfo for the call: "pre_request" hooks
+	before it is sent and "post_request" hooks once it has completed or
+	failed.
+	"""
+
+	HOOKS = ('pre_request', 'post_request')
+
+	def __init__(self, settings = None):
+		"""
+		Create the metrics from the "metrics" section of the settings:
+
+			* statsd - {"host", "port", "prefix"} to also emit to StatsD
+		"""
+
+		settings = settings or {}
+
+		self.lock  = threading.Lock()
+		self.hooks = {name: [] for name in Metrics.HOOKS}
+
+		self.reset()
+
+		if 'statsd' in settings:
+			self.add_hook('post_request', StatsDEmitter(**settings['statsd']))
+
+	def reset(self):
+		with self.lock:
+			self.latency     = collections.defaultdict(Histogram)
+			self.server_time = collections.defaultdict(Histogram)
+			self.decode_time = collections.defaultdict(Histogram)
+			self.requests    = collections.Counter()
+			self.statuses    = collections.Counter()
+			self.retries     = collections.Counter()
+			self.errors      = collections.Counter()
+			self.cache_hits  = collections.Counter()
+			self.coalesced   = collections.Counter()
+			self.bytes_out   = collections.Counter()
+			self.bytes_in    = collections.Counter()
+
+	def add_hook(self, name, hook):
+		if name not in self.hooks:
+			raise ValueError('Unknown hook {}, must be one of {}'.format(name, ', '.join(Metrics.HOOKS)))
+
+		self.hooks[name].append(hook)
+
+	def remove_hook(self, name, hook):
+		self.hooks[name].remove(hook)
+
+	def before(self, info):
+		for hook in self.hooks['pre_request']:
+			hook(info)
+
+	def after(self, info):
+		info.elapsed = time.time() - info.started
+		key          = (info.endpoint, info.method)
+
+		with self.lock:
+			self.requests[key] += 1
+
+			if info.cached:
+				self.cache_hits[key] += 1
+			else:
+				self.latency[key].observe(info.elapsed)
+
+			if info.coalesced:
+				self.coalesced[key] += 1
+			elif not info.cached:
+				self.bytes_out[key] += info.bytes_out
+
+			if info.attempts > 1:
+				self.retries[key] += info.attempts - 1
+
+			if info.status_code is not None:
+				self.statuses[key + (info.status_code,)] += 1
+
+			if info.error is not None:
+				self.errors[key + (type(info.error).__name__,)] += 1
+
+			if info.server_time is not None:
+				self.server_time[key].observe(info.server_time)
+
+			if info.decode_time is not None:
+				self.decode_time[key].observe(info.decode_time)
+
+			self.bytes_in[key] += info.bytes_in
+
+		for hook in self.hooks['post_request']:
+			hook(info)
+
+	def snapshot(self):
+		"""
+		The statistics as plain dictionaries keyed by "METHOD endpoint".
+		"""
+
+		def label(key):
+			return '{} {}'.format(key[1], key[0])
+
+		with self.lock:
+			endpoints = {}
+
+			for key, count in self.requests.items():
+				endpoints[label(key)] = {
+					'requests':    count,
+					'cache_hits':  self.cache_hits[key],
+					'coalesced':   self.coalesced[key],
+					'retries':     self.retries[key],
+					'bytes_out':   self.bytes_out[key],
+					'bytes_in':    self.bytes_in[key],
+					'latency':     self.latency[key].snapshot(),
+					'server_time': self.server_time[key].snapshot(),
+					'decode_time': self.decode_time[key].snapshot(),
+					'statuses':    {
+						status: total
+						for (endpoint, method, status), total in self.statuses.items()
+						if (endpoint, method) == key
+					},
+					'errors':      {
+						error: total
+						for (endpoint, method, error), total in self.errors.items()
+						if (endpoint, method) == key
+					},
+				}
+
+			return endpoints
+
+	def to_prometheus(self, prefix = 'pb4py'):
+		"""
+		Render the statistics in the Prometheus text exposition format.
+		"""
+
+		def labels(key, **extra):
+			pairs = [('endpoint', key[0]), ('method', key[1])] + sorted(extra.items())
+
+			return '{' + ','.join('{}="{}"'.format(name, value) for name, value in pairs) + '}'
+
+		lines = []
+
+		def counter(name, help_text, values, extra_label = None):
+			lines.append('# HELP {}_{} {}'.format(prefix, name, help_text))
+			lines.append('# TYPE {}_{} counter'.format(prefix, name))
+
+			for key, value in sorted(values.items()):
+				extra = {extra_label: key[2]} if extra_label else {}
+				lines.append('{}_{}{} {}'.format(prefix, name, labels(key[:2], **extra), value))
+
+		def histogram(name, help_text, values):
+			lines.append('# HELP {}_{} {}'.format(prefix, name, help_text))
+			lines.append('# TYPE {}_{} histogram'.format(prefix, name))
+
+			for key, hist in sorted(values.items()):
+				for bound, total in hist.cumulative():
+					le = '+Inf' if bound == float('inf') else repr(bound)
+					lines.append('{}_{}_bucket{} {}'.format(prefix, name, labels(key, le = le), total))
+
+				lines.append('{}_{}_sum{} {}'.format(prefix, name, labels(key), hist.sum))
+				lines.append('{}_{}_count{} {}'.format(prefix, name, labels(key), hist.count))
+
+		with self.lock:
+			counter('requests_total',        'API calls made',                          self.requests)
+			counter('responses_total',       'Responses by status code',                self.statuses, 'status')
+			counter('errors_total',          'Calls that raised an exception',          self.errors,   'error')
+			counter('retries_total',         'Requests that were retried',              self.retries)
+			counter('cache_hits_total',      'Calls answered from the response cache',  self.cache_hits)
+			counter('coalesced_total',       'Calls that shared an identical request',  self.coalesced)
+			counter('request_bytes_total',   'Request body bytes sent',                 self.bytes_out)
+			counter('response_bytes_total',  'Response body bytes received',            self.bytes_in)
+			histogram('request_duration_seconds', 'Time taken by API calls, including retries', self.latency)
+			histogram('server_time_seconds',      'Time until the response headers arrived',    self.server_time)
+			histogram('decode_duration_seconds',  'Time spent decoding response bodies',        self.decode_time)
+
+		return '\n'.join(lines) + '\n'
+
+class StatsDEmitter(object):
+	"""
+	A post_request hook that sends timings and counters to StatsD over UDP.
+	"""
+
+	def __init__(self, host = 'localhost', port = 8125, prefix = 'pb4py'):
+		self.address = (host, port)
+		self.prefix  = prefix
+		self.sock    = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+
+	@staticmethod
+	def _metric_name(info):
+		endpoint = info.endpoint.strip('/').replace('/', '.').replace('{', '').replace('}', '')
+
+		return '{}.{}'.format(endpoint, info.method.lower())
+
+	def __call__(self, info):
+		name  = '{}.{}'.format(self.prefix, StatsDEmitter._metric_name(info))
+		lines = [
+			'{}.requests:1|c'.format(name),
+			'{}.bytes_in:{}|c'.format(name, info.bytes_in),
+		]
+
+		if info.cached:
+			lines.append('{}.cache_hits:1|c'.format(name))
+		else:
+			lines.append('{}.duration:{:.3f}|ms'.format(name, info.elapsed * 1000))
+			lines.append('{}.bytes_out:{}|c'.format(name, info.bytes_out))
+
+		if info.status_code is not None:
+			lines.append('{}.status.{}:1|c'.format(name, info.status_code))
+
+		if info.attempts > 1:
+			lines.append('{}.retries:{}|c'.format(name, info.attempts - 1))
+
+		if info.error is not None:
+			lines.append('{}.errors:1|c'.format(name))
+
+		try:
+			self.sock.sendto('\n'.join(lines).encode('utf-8'), self.address)
+		except (socket.error, OSError):
+			pass
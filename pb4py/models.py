@@ -0,0 +1,263 @@
+import json
+import sys
+
+# Marks a field the API didn't send, as opposed to one it sent as null
+_MISSING = object()
+
+class Model(object):
+	"""
+	Compact read-only view of an API object. The commonly used fields are
+	kept in slots and the rest are kept as a compact JSON string that is only
+	decoded when one of them is read, which takes a fraction of the memory of
+	the decoded dictionary.
+
+	Models can be used like the dictionaries they were built from: model['iden'],
+	model.get('title'), 'url' in model and dict(model) all work. Fields the API
+	didn't send are None as attributes and missing as keys, fields it sent as
+	null are None either way.
+	"""
+
+	__slots__ = ('_extra',)
+
+	FIELDS     = ()
+	_field_set = frozenset()
+
+	# Fields whose values come from a small set and are interned so they are
+	# shared between objects
+	INTERNED = ()
+
+	# Fields holding a nested object and the model used for it
+	NESTED = {}
+
+	def __init__(self, data):
+		extra = None
+
+		for key, value in data.items():
+			if key in self._field_set:
+				if key in self.NESTED and isinstance(value, dict):
+					value = self.NESTED[key](value)
+				elif key in self.INTERNED and isinstance(value, str):
+					value = sys.intern(value)
+
+				setattr(self, key, value)
+			else:
+				if extra is None:
+					extra = {}
+
+				extra[key] = value
+
+		# The slots of fields that weren't sent are left unset
+
+		self._extra = json.dumps(extra, separators = (',', ':')) if extra else None
+
+	@classmethod
+	def from_list(cls, elements):
+		return [cls(element) for element in elements]
+
+	def __getattr__(self, name):
+		# Only called for unset slots and unknown attributes
+		if name in self._field_set:
+			return None
+
+		raise AttributeError(name)
+
+	def _slot(self, field):
+		try:
+			return object.__getattribute__(self, field)
+		except AttributeError:
+			return _MISSING
+
+	@property
+	def extra(self):
+		"""
+		The fields that aren't kept in slots, decoded.
+		"""
+
+		return json.loads(self._extra) if self._extra else {}
+
+	def keys(self):
+		keys = [field for field in self.FIELDS if self._slot(field) is not _MISSING]
+		if self._extra:
+			keys.extend(self.extra.keys())
+
+		return keys
+
+	def __getitem__(self, key):
+		if key in self._field_set:
+			value = self._slot(key)
+			if value is not _MISSING:
+				return value
+		elif self._extra:
+			extra = self.extra
+			if key in extra:
+				return extra[key]
+
+		raise KeyError(key)
+
+	def get(self, key, default = None):
+		try:
+			return self[key]
+		except KeyError:
+			return default
+
+	def __contains__(self, key):
+		if key in self._field_set:
+			return self._slot(key) is not _MISSING
+
+		return bool(self._extra) and key in self.extra
+
+	def __iter__(self):
+		return iter(self.keys())
+
+	def __len__(self):
+		return len(self.keys())
+
+	def to_dict(self):
+		"""
+		The object as the plain dictionary the API returned.
+		"""
+
+		data = self.extra
+		for field in self.FIELDS:
+			value = self._slot(field)
+			if value is not _MISSING:
+				data[field] = value.to_dict() if isinstance(value, Model) else value
+
+		return data
+
+	def __eq__(self, other):
+		return type(self) is type(other) and self.to_dict() == other.to_dict()
+
+	def __ne__(self, other):
+		return not self == other
+
+	__hash__ = None
+
+	def __getstate__(self):
+		return self.to_dict()
+
+	def __setstate__(self, state):
+		self.__init__(state)
+
+	def __repr__(self):
+		return '{}(iden={!r})'.format(type(self).__name__, getattr(self, 'iden', None))
+
+def _model(cls):
+	cls._field_set = frozenset(cls.FIELDS)
+
+	return cls
+
+@_model
+class Channel(Model):
+	__slots__ = FIELDS = (
+		'iden',
+		'tag',
+		'name',
+		'description',
+		'image_url',
+		'website_url',
+	)
+
+@_model
+class Push(Model):
+	__slots__ = FIELDS = (
+		'iden',
+		'active',
+		'created',
+		'modified',
+		'type',
+		'dismissed',
+		'guid',
+		'direction',
+		'sender_iden',
+		'sender_email',
+		'sender_email_normalized',
+		'sender_name',
+		'receiver_iden',
+		'receiver_email',
+		'receiver_email_normalized',
+		'target_device_iden',
+		'source_device_iden',
+		'channel_iden',
+		'title',
+		'body',
+		'url',
+		'file_name',
+		'file_type',
+		'file_url',
+		'image_url',
+	)
+
+	INTERNED = frozenset([
+		'type',
+		'direction',
+		'sender_iden',
+		'sender_email',
+		'sender_email_normalized',
+		'sender_name',
+		'receiver_iden',
+		'receiver_email',
+		'receiver_email_normalized',
+		'target_device_iden',
+		'source_device_iden',
+	])
+
+@_model
+class Device(Model):
+	__slots__ = FIELDS = (
+		'iden',
+		'active',
+		'created',
+		'modified',
+		'nickname',
+		'type',
+		'kind',
+		'manufacturer',
+		'model',
+		'icon',
+		'app_version',
+		'pushable',
+	)
+
+	INTERNED = frozenset(['type', 'kind', 'manufacturer', 'icon'])
+
+@_model
+class Contact(Model):
+	__slots__ = FIELDS = (
+		'iden',
+		'active',
+		'created',
+		'modified',
+		'name',
+		'email',
+		'email_normalized',
+		'status',
+	)
+
+	INTERNED = frozenset(['status'])
+
+@_model
+class Subscription(Model):
+	__slots__ = FIELDS = (
+		'iden',
+		'active',
+		'created',
+		'modified',
+		'muted',
+		'channel',
+	)
+
+	NESTED = {'channel': Channel}
+
+@_model
+class User(Model):
+	__slots__ = FIELDS = (
+		'iden',
+		'created',
+		'modified',
+		'email',
+		'email_normalized',
+		'name',
+		'image_url',
+		'max_upload_size',
+	)
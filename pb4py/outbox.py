@@ -0,0 +1,450 @@
+import heapq
+import itertools
+import json
+import os
+import queue
+import random
+import sqlite3
+import threading
+import time
+import uuid
+
+from pb4py import exceptions, utils
+from pb4py.logger import Logs
+
+class OutboxEntry(object):
+	"""
+	A push waiting to be sent. maybe_sent is set when an earlier attempt may
+	have reached the API, in which case the push history is checked for the
+	entry's guid before it is sent again.
+	"""
+
+	__slots__ = ('guid', 'created', 'push_type', 'data', 'attempts', 'maybe_sent')
+
+	def __init__(self, guid, created, push_type, data, attempts = 0, maybe_sent = False):
+		self.guid       = guid
+		self.created    = created
+		self.push_type  = push_type
+		self.data       = data
+		self.attempts   = attempts
+		self.maybe_sent = maybe_sent
+
+class Outbox(object):
+	"""
+	Durable queue of outgoing pushes. enqueue() only hands the push to a
+	background thread that journals it to SQLite in batches, and a pool of
+	worker threads sends journaled pushes through the client. Failures that
+	are worth retrying (connection errors, rate limits and server errors)
+	are retried with a jittered exponential backoff.
+
+	Every push is sent with a guid. Pushes that were still pending when the
+	process stopped are sent again when the outbox is next opened, but first
+	the push history is searched for their guids so a push that did reach the
+	API before the crash is not sent twice.
+
+	Pushes are only durable once journaled, which happens within
+	milliseconds; flush() waits for it.
+	"""
+
+	SCHEMA = [
+		'''
+		CREATE TABLE IF NOT EXISTS outbox (
+			guid      TEXT PRIMARY KEY,
+			created   REAL NOT NULL,
+			push_type TEXT NOT NULL,
+			data      TEXT NOT NULL,
+			state     TEXT NOT NULL,
+			attempts  INTEGER NOT NULL DEFAULT 0,
+			iden      TEXT,
+			error     TEXT
+		)
+		''',
+		'CREATE INDEX IF NOT EXISTS outbox_state ON outbox (state, created)',
+	]
+
+	PENDING = 'pending'
+	SENT    = 'sent'
+	FAILED  = 'failed'
+
+	# Errors after which the push may still have been created
+	AMBIGUOUS_ERRORS = (exceptions.PB4PyConnectionException, exceptions.PB4PyServerException)
+	RETRY_ERRORS     = AMBIGUOUS_ERRORS + (exceptions.PB4PyRateLimitException,)
+
+	# Slack allowed between the local clock and the API's when searching the
+	# push history for entries that may have been sent
+	CLOCK_SKEW = 300
+
+	DEFAULT_WORKERS      = 4
+	DEFAULT_MAX_ATTEMPTS = 10
+	DEFAULT_BACKOFF      = 1
+	DEFAULT_MAX_BACKOFF  = 300
+
+	def __init__(self, client, path, settings = None):
+		"""
+		Open the outbox journal at path and start sending. The "outbox"
+		section of the settings understands:
+
+			* workers      - number of pushes sent at once
+			* max_attempts - attempts before a push is marked as failed
+			* backoff      - seconds to wait before the first retry, this
+			                 doubles (with jitter) on every retry
+			* max_backoff  - the longest wait before a retry
+		"""
+
+		settings = settings or {}
+
+		self.client       = client
+		self.path         = path
+		self.logger       = Logs.getLogger('outbox')
+		self.workers      = settings.get('workers',      Outbox.DEFAULT_WORKERS)
+		self.max_attempts = settings.get('max_attempts', Outbox.DEFAULT_MAX_ATTEMPTS)
+		self.backoff      = settings.get('backoff',      Outbox.DEFAULT_BACKOFF)
+		self.max_backoff  = settings.get('max_backoff',  Outbox.DEFAULT_MAX_BACKOFF)
+
+		directory = os.path.dirname(path)
+		if directory and not os.path.isdir(directory):
+			os.makedirs(directory)
+
+		self.lock = threading.Lock()
+		self.conn = sqlite3.connect(path, check_same_thread = False)
+		self.conn.execute('PRAGMA journal_mode = WAL')
+		self.conn.execute('PRAGMA synchronous = NORMAL')
+
+		with self.conn:
+			for statement in Outbox.SCHEMA:
+				self.conn.execute(statement)
+
+		# Pushes left pending by an earlier run count as unfinished from the
+		# start so drain() waits for them
+		recovered = self._pending()
+
+		# Everything below is guarded by cond
+		self.cond       = threading.Condition()
+		self.incoming   = []
+		self.completed  = []
+		self.retries    = []
+		self.sequence   = itertools.count()
+		self.enqueued   = 0
+		self.journaled  = 0
+		self.unfinished = len(recovered)
+		self.stopping   = False
+		self.closed     = False
+
+		self.queue   = queue.Queue()
+		self.threads = [threading.Thread(target = self._run_journal, args = (recovered,), name = 'pb4py-outbox-journal')]
+		self.threads.extend(
+			threading.Thread(target = self._run_worker, name = 'pb4py-outbox-worker-{}'.format(i))
+			for i in range(self.workers)
+		)
+
+		for thread in self.threads:
+			thread.daemon = True
+			thread.start()
+
+	@staticmethod
+	def default_path(access_token):
+		return utils.account_cache_path(access_token, 'outbox')
+
+	def enqueue(self, push_type, **kwargs):
+		"""
+		Queue a push with the same parameters as Client.push and return its
+		guid straight away. The push is sent in the background.
+		"""
+
+		self.client._check_push_type(push_type)
+
+		entry = OutboxEntry(kwargs.pop('guid', None) or uuid.uuid4().hex, time.time(), push_type, kwargs)
+
+		with self.cond:
+			if self.stopping:
+				raise exceptions.PB4PyException('The outbox is closed')
+
+			self.incoming.append(entry)
+			self.enqueued   += 1
+			self.unfinished += 1
+			self.cond.notify_all()
+
+		return entry.guid
+
+	def flush(self, timeout = None):
+		"""
+		Wait until every push enqueued so far has been journaled. Returns False
+		if the timeout ran out first.
+		"""
+
+		with self.cond:
+			target = self.enqueued
+
+			return self._wait(lambda: self.journaled >= target, timeout)
+
+	def drain(self, timeout = None):
+		"""
+		Wait until every queued push has been sent or has failed. Returns False
+		if the timeout ran out first.
+		"""
+
+		with self.cond:
+			return self._wait(lambda: self.unfinished == 0, timeout)
+
+	def _wait(self, predicate, timeout):
+		deadline = time.time() + timeout if timeout is not None else None
+
+		while not predicate():
+			remaining = deadline - time.time() if deadline is not None else None
+			if remaining is not None and remaining <= 0:
+				return False
+
+			self.cond.wait(remaining)
+
+		return True
+
+	def status(self, guid):
+		"""
+		The journal row for a push as a dictionary, or None if it isn't known
+		(or hasn't been journaled yet).
+		"""
+
+		with self.lock:
+			cursor = self.conn.execute('SELECT * FROM outbox WHERE guid = ?', (guid,))
+			row    = cursor.fetchone()
+
+			if row is None:
+				return None
+
+			entry = dict(zip([column[0] for column in cursor.description], row))
+
+		entry['data'] = json.loads(entry['data'])
+
+		return entry
+
+	def counts(self):
+		"""
+		The number of journaled pushes in each state.
+		"""
+
+		with self.lock:
+			return dict(self.conn.execute('SELECT state, COUNT(*) FROM outbox GROUP BY state').fetchall())
+
+	def purge(self, before):
+		"""
+		Delete the sent pushes that were enqueued before the given UNIX
+		timestamp from the journal.
+		"""
+
+		with self.lock, self.conn:
+			self.conn.execute('DELETE FROM outbox WHERE state = ? AND created < ?', (Outbox.SENT, before))
+
+	def close(self):
+		"""
+		Stop sending. Pushes that are being sent are finished, the rest stay in
+		the journal and are sent when the outbox is next opened.
+		"""
+
+		with self.cond:
+			if self.stopping:
+				return
+
+			self.stopping = True
+			self.cond.notify_all()
+
+		workers = self.threads[1:]
+		for _ in workers:
+			self.queue.put(None)
+
+		for thread in workers:
+			thread.join()
+
+		with self.cond:
+			self.closed = True
+			self.cond.notify_all()
+
+		self.threads[0].join()
+
+		with self.lock:
+			self.conn.close()
+
+	def __enter__(self):
+		return self
+
+	def __exit__(self, exc_type, exc_value, traceback):
+		self.close()
+
+	# Journal thread
+
+	def _run_journal(self, recovered):
+		self._recover(recovered)
+
+		while True:
+			with self.cond:
+				while not (self.incoming or self.completed or self.closed or self._retry_due()):
+					self.cond.wait(self._retry_wait())
+
+				incoming,  self.incoming  = self.incoming,  []
+				completed, self.completed = self.completed, []
+
+				due = []
+				while self._retry_due():
+					due.append(heapq.heappop(self.retries)[2])
+
+				closed = self.closed
+
+			self._write(incoming, completed)
+
+			with self.cond:
+				self.journaled  += len(incoming)
+				self.unfinished -= sum(1 for entry, state, _, _ in completed if state != Outbox.PENDING)
+				self.cond.notify_all()
+
+			if closed:
+				return
+
+			for entry in incoming + due:
+				self.queue.put(entry)
+
+	def _retry_due(self):
+		return bool(self.retries) and self.retries[0][0] <= time.time() and not self.stopping
+
+	def _retry_wait(self):
+		if not self.retries or self.stopping:
+			return None
+
+		return max(0, self.retries[0][0] - time.time())
+
+	def _write(self, incoming, completed):
+		if not incoming and not completed:
+			return
+
+		with self.lock, self.conn:
+			self.conn.executemany(
+				'INSERT OR IGNORE INTO outbox (guid, created, push_type, data, state) VALUES (?, ?, ?, ?, ?)',
+				[
+					(entry.guid, entry.created, entry.push_type, json.dumps(entry.data), Outbox.PENDING)
+					for entry in incoming
+				],
+			)
+
+			self.conn.executemany(
+				'UPDATE outbox SET state = ?, attempts = ?, iden = ?, error = ? WHERE guid = ?',
+				[
+					(state, entry.attempts, iden, error, entry.guid)
+					for entry, state, iden, error in completed
+				],
+			)
+
+	def _pending(self):
+		"""
+		The pushes left pending by an earlier run.
+		"""
+
+		with self.lock:
+			rows = self.conn.execute(
+				'SELECT guid, created, push_type, data, attempts FROM outbox WHERE state = ? ORDER BY created',
+				(Outbox.PENDING,),
+			).fetchall()
+
+		return [
+			OutboxEntry(guid, created, push_type, json.loads(data), attempts, maybe_sent = True)
+			for guid, created, push_type, data, attempts in rows
+		]
+
+	def _recover(self, entries):
+		"""
+		Queue the recovered pushes, skipping the ones the push history shows
+		were sent.
+		"""
+
+		if not entries:
+			return
+
+		self.logger.info('Recovering %d pending pushes', len(entries))
+
+		try:
+			sent = self._find_sent(entries)
+		except Exception as ex: # pylint: disable=broad-except
+			# The entries keep maybe_sent so each one is checked before it is sent
+			self.logger.warning('Unable to check the push history for pending pushes: %s', ex)
+			sent = None
+
+		for entry in entries:
+			if sent is not None and entry.guid in sent:
+				self._complete(entry, Outbox.SENT, sent[entry.guid])
+				continue
+
+			if sent is not None:
+				entry.maybe_sent = False
+
+			self.queue.put(entry)
+
+	def _find_sent(self, entries):
+		"""
+		Search the push history for pushes created from the entries. Returns a
+		map of guid to push iden.
+		"""
+
+		guids = set(entry.guid for entry in entries)
+		since = min(entry.created for entry in entries) - Outbox.CLOCK_SKEW
+		found = {}
+
+		for push in self.client.iter_push_history(modified_after = since):
+			if push.get('guid') in guids:
+				found[push['guid']] = push['iden']
+
+		return found
+
+	# Worker threads
+
+	def _run_worker(self):
+		while True:
+			entry = self.queue.get()
+			if entry is None:
+				return
+
+			if self.stopping:
+				continue
+
+			try:
+				self._send(entry)
+			except Exception as ex: # pylint: disable=broad-except
+				# Anything else is a bug. The push is failed so the worker keeps
+				# going and drain() doesn't wait on it forever.
+				self.logger.exception('Unexpected error sending push %s', entry.guid)
+				self._complete(entry, Outbox.FAILED, error = '{}: {}'.format(type(ex).__name__, ex))
+
+	def _send(self, entry):
+		entry.attempts += 1
+
+		try:
+			if entry.maybe_sent:
+				iden = self._find_sent([entry]).get(entry.guid)
+				if iden is not None:
+					self._complete(entry, Outbox.SENT, iden)
+					return
+
+			push = self.client.push(entry.push_type, guid = entry.guid, **entry.data)
+		except Outbox.RETRY_ERRORS as ex:
+			entry.maybe_sent = entry.maybe_sent or isinstance(ex, Outbox.AMBIGUOUS_ERRORS)
+
+			if entry.attempts >= self.max_attempts:
+				self._complete(entry, Outbox.FAILED, error = str(ex))
+			else:
+				self._retry(entry, ex)
+		except exceptions.PB4PyException as ex:
+			self._complete(entry, Outbox.FAILED, error = str(ex))
+		else:
+			self._complete(entry, Outbox.SENT, push.get('iden'))
+
+	def _retry(self, entry, error):
+		delay = min(self.max_backoff, self.backoff * (2 ** (entry.attempts - 1)))
+		delay = random.uniform(delay / 2.0, delay)
+
+		self.logger.info('Retrying push %s in %.1f seconds: %s', entry.guid, delay, error)
+
+		with self.cond:
+			heapq.heappush(self.retries, (time.time() + delay, next(self.sequence), entry))
+			self.completed.append((entry, Outbox.PENDING, None, str(error)))
+			self.cond.notify_all()
+
+	def _complete(self, entry, state, iden = None, error = None):
+		with self.cond:
+			self.completed.append((entry, state, iden, error))
+			self.cond.notify_all()
@@ -0,0 +1,230 @@
+import collections
+import concurrent.futures
+import threading
+import time
+
+from pb4py.cache import ResponseCache
+from pb4py.client import Client
+from pb4py.logger import Logs
+from pb4py.metrics import Metrics
+from pb4py.scheduler import RequestScheduler
+from pb4py.transport import Transport
+
+class _Tenant(object):
+	__slots__ = ('client', 'last_used', 'active')
+
+	def __init__(self, client):
+		self.client    = client
+		self.last_used = time.time()
+		self.active    = 0
+
+class ClientPool(object):
+	"""
+	Clients for many accounts that share one connection pool, scheduler,
+	response cache and metrics. Rate limits are still tracked separately for
+	every access token. An account's client is created when the account is
+	first used and closed again once it has been idle for idle_timeout
+	seconds, or when more than max_clients are open, least recently used
+	first.
+
+	An account is its access token unless credentials were registered for it
+	with add_account(). Accounts without credentials use the base "auth"
+	settings (OAuth by default) with the access token swapped in.
+	"""
+
+	DEFAULT_MAX_CLIENTS  = 1000
+	DEFAULT_IDLE_TIMEOUT = 600
+
+	def __init__(self, settings = None, transport = None, scheduler = None):
+		"""
+		Create the pool. The settings are loaded the same way as a Client's and
+		are used for every account's client. The "pool" section understands:
+
+			* max_clients  - the most clients kept open at once
+			* idle_timeout - seconds after which an unused client is closed
+			* max_workers  - threads used by submit(), defaults to the
+			                 transport's per-host pool size
+		"""
+
+		self.logger   = Logs.getLogger('pool')
+		self.settings = Client._merge_settings(settings, self.logger)
+
+		pool_settings = self.settings.get('pool', {})
+
+		self.max_clients  = pool_settings.get('max_clients',  ClientPool.DEFAULT_MAX_CLIENTS)
+		self.idle_timeout = pool_settings.get('idle_timeout', ClientPool.DEFAULT_IDLE_TIMEOUT)
+
+		self._owns_transport = transport is None
+		self.transport       = transport or Transport(self.settings.get('transport', None))
+		self.scheduler       = scheduler or RequestScheduler(self.settings.get('scheduler', None))
+
+		metrics_settings = self.settings.get('metrics', None)
+		self.metrics     = Metrics(metrics_settings) if metrics_settings is not None else None
+
+		cache_settings = self.settings.get('cache', None)
+		self.cache     = ResponseCache(cache_settings) if cache_settings is not None else None
+
+		# The shared parts are handed to each client rather than created by it
+		self.client_settings = {
+			key: value
+			for key, value in self.settings.items()
+			if key not in ('pool', 'metrics', 'cache')
+		}
+
+		self.executor = concurrent.futures.ThreadPoolExecutor(
+			max_workers = pool_settings.get('max_workers', None) or self.transport.pool_maxsize,
+		)
+
+		self.accounts = {}
+		self.tenants  = collections.OrderedDict()
+		self.lock     = threading.Lock()
+
+	def add_account(self, account, auth_settings):
+		"""
+		Register the "auth" settings to use for an account.
+		"""
+
+		with self.lock:
+			self.accounts[account] = auth_settings
+
+	def remove_account(self, account):
+		"""
+		Forget an account's credentials and close its client.
+		"""
+
+		with self.lock:
+			self.accounts.pop(account, None)
+			tenant = self.tenants.pop(account, None)
+
+		if tenant is not None:
+			self._close(tenant)
+
+	def client(self, account):
+		"""
+		Get the client for an account, creating it if needed.
+		"""
+
+		return self._acquire(account, False).client
+
+	def submit(self, account, fn, *args, **kwargs):
+		"""
+		Run fn(client, *args, **kwargs) with the account's client on the
+		pool's executor and return a Future for the result. The client isn't
+		closed while the work is running.
+		"""
+
+		tenant = self._acquire(account, True)
+
+		def run():
+			try:
+				return fn(tenant.client, *args, **kwargs)
+			finally:
+				with self.lock:
+					tenant.active   -= 1
+					tenant.last_used = time.time()
+
+					if self.tenants.get(account) is tenant:
+						self.tenants.move_to_end(account)
+
+		try:
+			return self.executor.submit(run)
+		except Exception:
+			with self.lock:
+				tenant.active -= 1
+
+			raise
+
+	def _acquire(self, account, active):
+		now = time.time()
+
+		with self.lock:
+			tenant = self.tenants.pop(account, None)
+			if tenant is None:
+				tenant = _Tenant(self._create_client(account))
+
+			self.tenants[account] = tenant
+			tenant.last_used      = now
+
+			if active:
+				tenant.active += 1
+
+			evicted = self._evict(now)
+
+		for idle in evicted:
+			self._close(idle)
+
+		if evicted:
+			# An evicted account's rate limit is kept until its quota resets,
+			# it still applies if the account is used again before then
+			self.scheduler.expire()
+
+		return tenant
+
+	def _create_client(self, account):
+		settings = dict(self.client_settings)
+
+		if account in self.accounts:
+			settings['auth'] = self.accounts[account]
+		else:
+			settings['auth'] = dict(settings.get('auth', None) or {'type': 'oauth'}, access_token = account)
+
+		client = Client(settings, self.transport, self.scheduler)
+		client.metrics = self.metrics
+		client.cache   = self.cache
+
+		return client
+
+	def _evict(self, now):
+		"""
+		Remove the idle and least recently used tenants over max_clients, oldest
+		first, and return them so they can be closed outside of the lock.
+		Tenants with work running are kept.
+		"""
+
+		evicted = []
+
+		for account, tenant in list(self.tenants.items()):
+			over_limit = len(self.tenants) > self.max_clients
+			idle       = self.idle_timeout is not None and now - tenant.last_used >= self.idle_timeout
+
+			if not over_limit and not idle:
+				break
+
+			if tenant.active:
+				continue
+
+			del self.tenants[account]
+			evicted.append(tenant)
+
+		return evicted
+
+	def _close(self, tenant):
+		tenant.client.close()
+
+	def __len__(self):
+		with self.lock:
+			return len(self.tenants)
+
+	def close(self):
+		"""
+		Wait for submitted work to finish and close every client. A transport
+		that was passed in to the pool is left open for its owner to close.
+		"""
+
+		self.executor.shutdown(wait = True)
+
+		with self.lock:
+			tenants = list(self.tenants.values())
+			self.tenants.clear()
+
+		for tenant in tenants:
+			self._close(tenant)
+
+		if self._owns_transport:
+			self.transport.close()
+
+	def __enter__(self):
+		return self
+
+	def __exit__(self, exc_type, exc_value, traceback):
+		self.close()
@@ -0,0 +1,178 @@
+import multiprocessing
+import os
+import queue
+import time
+
+from pb4py import exceptions
+from pb4py.fanout import BatchReport, FanoutResult, fanout
+
+# Results are sent back to the parent in batches of this many
+RESULT_BATCH_SIZE = 256
+
+class WorkerStats(object):
+	"""
+	How much one worker process sent and how long it took.
+	"""
+
+	__slots__ = ('pid', 'sent', 'failed', 'seconds')
+
+	def __init__(self, pid, sent = 0, failed = 0, seconds = 0.0):
+		self.pid     = pid
+		self.sent    = sent
+		self.failed  = failed
+		self.seconds = seconds
+
+	@property
+	def per_sec(self):
+		return (self.sent + self.failed) / self.seconds if self.seconds else 0.0
+
+	def __repr__(self):
+		return 'WorkerStats(pid = {}, sent = {}, failed = {}, {:.1f}/s)'.format(self.pid, self.sent, self.failed, self.per_sec)
+
+class ProcessFanoutReport(BatchReport):
+	"""
+	A BatchReport for a push sent from several processes, in the order of the
+	targets. Each result's response is the iden of the created push. workers
+	has the WorkerStats of each process.
+	"""
+
+	def __init__(self, results, workers, seconds):
+		super(ProcessFanoutReport, self).__init__(results)
+
+		self.workers = workers
+		self.seconds = seconds
+
+	@property
+	def per_sec(self):
+		return len(self.results) / self.seconds if self.seconds else 0.0
+
+def _encode_error(error):
+	return (type(error).__name__, str(error), getattr(error, 'status_code', None))
+
+def _decode_error(type_name, message, status_code):
+	"""
+	Rebuild an exception raised in a worker. Exceptions don't always survive
+	pickling so only their type, message and status code are sent.
+	"""
+
+	exception_type = getattr(exceptions, type_name, None)
+
+	if isinstance(exception_type, type) and issubclass(exception_type, exceptions.PB4PyAPIException):
+		return exception_type(message, status_code = status_code)
+
+	if status_code is not None:
+		return exceptions.api_exception_type(status_code)(message, status_code = status_code)
+
+	return exceptions.PB4PyException('{}: {}'.format(type_name, message))
+
+def _worker(number, settings, push_type, target_type, push_data, shard, max_workers, results):
+	"""
+	Send the push to a shard of (index, target) pairs with a client of the
+	worker's own, putting batches of compact results on the results queue:
+	(index, iden) for a push that was sent and (index, None, error) for one
+	that failed.
+	"""
+
+	# Imported here so the parent doesn't import the client twice over
+	from pb4py.client import Client
+
+	started = time.time()
+	stats   = WorkerStats(os.getpid())
+	batch   = []
+
+	with Client(settings) as client:
+		def send(item):
+			data = dict(push_data)
+			data.update(client._target_params(item[1], target_type))
+
+			return client.push(push_type, **data)
+
+		for result in fanout(send, shard, max_workers or client.transport.pool_maxsize):
+			index = result.item[0]
+
+			if result.ok:
+				stats.sent += 1
+				batch.append((index, result.response['iden']))
+			else:
+				stats.failed += 1
+				batch.append((index, None, _encode_error(result.error)))
+
+			if len(batch) >= RESULT_BATCH_SIZE:
+				results.put((number, batch))
+				batch = []
+
+	stats.seconds = time.time() - started
+
+	results.put((number, batch))
+	results.put((number, (stats.pid, stats.sent, stats.failed, stats.seconds)))
+
+def process_fanout(settings, push_type, targets, target_type, processes, max_workers = None, push_data = None, start_method = 'spawn'):
+	"""
+	Send the same push to every target from several processes. The targets
+	are split between the processes, each of which sends its share with a
+	Client built from settings on a pool of max_workers threads. Returns a
+	ProcessFanoutReport.
+
+	Processes are started with the spawn method by default, so the calling
+	script's main module must be safe to import (guarded by
+	if __name__ == '__main__').
+	"""
+
+	targets   = list(targets)
+	processes = max(1, min(processes, len(targets)))
+	context   = multiprocessing.get_context(start_method)
+	results   = context.Queue()
+	started   = time.time()
+
+	workers = []
+	for number in range(processes):
+		shard   = [(index, targets[index]) for index in range(number, len(targets), processes)]
+		process = context.Process(
+			target = _worker,
+			args   = (number, settings, push_type, target_type, push_data or {}, shard, max_workers, results),
+			daemon = True,
+		)
+		process.start()
+
+		workers.append(process)
+
+	outcomes = {}
+	stats    = {}
+
+	try:
+		while len(stats) < processes:
+			try:
+				number, payload = results.get(timeout = 0.5)
+			except queue.Empty:
+				for number, process in enumerate(workers):
+					if number not in stats and not process.is_alive() and results.empty():
+						stats[number] = WorkerStats(process.pid)
+
+				continue
+
+			if isinstance(payload, tuple):
+				stats[number] = WorkerStats(*payload)
+				continue
+
+			for outcome in payload:
+				outcomes[outcome[0]] = outcome
+	finally:
+		for process in workers:
+			process.join(timeout = 5)
+
+			if process.is_alive():
+				process.terminate()
+
+	report = []
+	for index, target in enumerate(targets):
+		outcome = outcomes.get(index)
+
+		if outcome is None:
+			error = exceptions.PB4PyException('The worker process sending this push exited early')
+			report.append(FanoutResult(target, error = error))
+		elif outcome[1] is not None:
+			report.append(FanoutResult(target, response = outcome[1]))
+		else:
+			report.append(FanoutResult(target, error = _decode_error(*outcome[2])))
+
+	return ProcessFanoutReport(report, [stats[number] for number in range(processes)], time.time() - started)
@@ -0,0 +1,185 @@
+import random
+import threading
+import time
+
+class RateLimit(object):
+	"""
+	Tracks an account's rate limit from the X-Ratelimit-* response headers and
+	works out how long to wait before the next request so the quota lasts
+	until it resets.
+	"""
+
+	def __init__(self):
+		self.limit     = None
+		self.remaining = None
+		self.reset     = None
+		self.lock      = threading.Lock()
+
+	def update(self, headers):
+		try:
+			limit     = int(headers['X-Ratelimit-Limit'])
+			remaining = int(headers['X-Ratelimit-Remaining'])
+		except (KeyError, TypeError, ValueError):
+			return
+
+		try:
+			reset = float(headers['X-Ratelimit-Reset'])
+		except (KeyError, TypeError, ValueError):
+			reset = None
+
+		with self.lock:
+			self.limit     = limit
+			self.remaining = remaining
+			self.reset     = reset
+
+	def acquire(self, threshold, now = None):
+		"""
+		Take a request from the quota and return the seconds to wait before
+		sending it. Requests go out immediately until the remaining quota drops
+		below threshold (a fraction of the limit), after which they are spaced
+		out evenly over the time left until the reset.
+		"""
+
+		now = now if now is not None else time.time()
+
+		with self.lock:
+			if self.remaining is None or self.limit is None:
+				return 0
+
+			if self.reset is not None and now >= self.reset:
+				self.remaining = self.limit
+				self.reset     = None
+
+			remaining       = self.remaining
+			self.remaining -= 1
+
+			if remaining > self.limit * threshold or self.reset is None:
+				return 0
+
+			if remaining <= 0:
+				return self.reset - now
+
+			return (self.reset - now) / remaining
+
+	def expired(self, now = None):
+		"""
+		Whether the limit no longer holds back any requests, either because
+		the quota has been reset since or because its reset time is unknown.
+		"""
+
+		now = now if now is not None else time.time()
+
+		with self.lock:
+			return self.reset is None or now >= self.reset
+
+class RequestScheduler(object):
+	"""
+	Decides when requests are sent and whether failed requests are retried.
+	Rate limits are tracked per access token so one scheduler can be shared by
+	several clients.
+	"""
+
+	# Methods that can be repeated without changing the result. Any method is
+	# retried after a 429 since the API refused to process it.
+	IDEMPOTENT_METHODS = frozenset(['GET', 'HEAD', 'OPTIONS', 'PUT', 'DELETE'])
+
+	DEFAULT_MAX_RETRIES        = 3
+	DEFAULT_BACKOFF            = 0.5
+	DEFAULT_MAX_BACKOFF        = 30
+	DEFAULT_THROTTLE_THRESHOLD = 0.1
+
+	def __init__(self, settings = None):
+		"""
+		Create the scheduler from the "scheduler" section of the settings:
+
+			* max_retries        - times a request is retried
+			* backoff            - seconds to wait before the first retry, this
+			                       doubles (with jitter) on every retry
+			* max_backoff        - the longest wait before a retry
+			* throttle_threshold - fraction of the rate limit left at which
+			                       requests start being spaced out
+		"""
+
+		settings = settings or {}
+
+		self.max_retries        = settings.get('max_retries',        RequestScheduler.DEFAULT_MAX_RETRIES)
+		self.backoff            = settings.get('backoff',            RequestScheduler.DEFAULT_BACKOFF)
+		self.max_backoff        = settings.get('max_backoff',        RequestScheduler.DEFAULT_MAX_BACKOFF)
+		self.throttle_threshold = settings.get('throttle_threshold', RequestScheduler.DEFAULT_THROTTLE_THRESHOLD)
+
+		self.rate_limits = {}
+		self.lock        = threading.Lock()
+
+	def rate_limit(self, key):
+		with self.lock:
+			if key not in self.rate_limits:
+				self.rate_limits[key] = RateLimit()
+
+			return self.rate_limits[key]
+
+	def expire(self, now = None):
+		"""
+		Drop the rate limits that have expired (see RateLimit.expired) and
+		return how many were dropped. Tracking starts over on the account's
+		next response.
+		"""
+
+		now = now if now is not None else time.time()
+
+		with self.lock:
+			expired = [key for key, limit in self.rate_limits.items() if limit.expired(now)]
+
+			for key in expired:
+				del self.rate_limits[key]
+
+		return len(expired)
+
+	def throttle_delay(self, key):
+		"""
+		Seconds to wait before sending a request for the account.
+		"""
+
+		return max(0, self.rate_limit(key).acquire(self.throttle_threshold))
+
+	def record(self, key, resp):
+		self.rate_limit(key).update(resp.headers)
+
+	def retry_delay(self, method, attempt, resp = None, error = None):
+		"""
+		Seconds to wait before retrying a request, or None if it should not be
+		retried. Either the response or the connection error is given.
+		"""
+
+		if attempt >= self.max_retries:
+			return None
+
+		if error is not None:
+			if method not in RequestScheduler.IDEMPOTENT_METHODS:
+				return None
+		elif resp.status_code == 429:
+			wait = RequestScheduler._server_delay(resp.headers)
+			if wait is not None:
+				return min(self.max_backoff, wait)
+		elif resp.status_code < 500 or method not in RequestScheduler.IDEMPOTENT_METHODS:
+			return None
+
+		delay = min(self.max_backoff, self.backoff * (2 ** attempt))
+
+		return random.uniform(delay / 2.0, delay)
+
+	@staticmethod
+	def _server_delay(headers):
+		"""
+		How long the server asked us to wait, from Retry-After or the rate
+		limit reset time.
+		"""
+
+		try:
+			return max(0, float(headers['Retry-After']))
+		except (KeyError, TypeError, ValueError):
+			pass
+
+		try:
+			return max(0, float(headers['X-Ratelimit-Reset']) - time.time())
+		except (KeyError, TypeError, ValueError):
+			return None
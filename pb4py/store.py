@@ -0,0 +1,208 @@
+import json
+import os
+import sqlite3
+import threading
+
+from pb4py import utils
+
+class PushStore(object):
+	"""
+	Persistent SQLite copy of the push history that can be queried locally.
+	The store is brought up to date with sync(), which only fetches the pushes
+	modified since the last sync.
+	"""
+
+	SCHEMA = [
+		'''
+		CREATE TABLE IF NOT EXISTS pushes (
+			iden               TEXT PRIMARY KEY,
+			modified           REAL NOT NULL,
+			type               TEXT,
+			sender_email       TEXT,
+			target_device_iden TEXT,
+			data               TEXT NOT NULL
+		)
+		''',
+		'CREATE INDEX IF NOT EXISTS pushes_modified           ON pushes (modified)',
+		'CREATE INDEX IF NOT EXISTS pushes_type               ON pushes (type, modified)',
+		'CREATE INDEX IF NOT EXISTS pushes_sender_email       ON pushes (sender_email, modified)',
+		'CREATE INDEX IF NOT EXISTS pushes_target_device_iden ON pushes (target_device_iden, modified)',
+		'CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)',
+	]
+
+	# Map of query filter to the SQL condition it adds
+	FILTERS = {
+		'push_type':          'type = ?',
+		'sender_email':       'sender_email = ?',
+		'target_device_iden': 'target_device_iden = ?',
+		'modified_after':     'modified > ?',
+		'modified_before':    'modified < ?',
+	}
+
+	BATCH_SIZE = 500
+
+	def __init__(self, path):
+		self.path = path
+		self.lock = threading.Lock()
+
+		directory = os.path.dirname(path)
+		if directory and not os.path.isdir(directory):
+			os.makedirs(directory)
+
+		self.conn = sqlite3.connect(path, check_same_thread = False)
+		self.conn.execute('PRAGMA journal_mode = WAL')
+
+		with self.conn:
+			for statement in PushStore.SCHEMA:
+				self.conn.execute(statement)
+
+	@staticmethod
+	def default_path(access_token):
+		"""
+		The store used for an account when no path is configured. It lives in
+		the user's cache directory and is named after a hash of the access
+		token so accounts never share a store.
+		"""
+
+		return utils.account_cache_path(access_token, 'pushes')
+
+	@property
+	def last_modified(self):
+		"""
+		The newest modified timestamp that has been synced.
+		"""
+
+		with self.lock:
+			row = self.conn.execute('SELECT value FROM meta WHERE key = ?', ('last_modified',)).fetchone()
+
+		return float(row[0]) if row else 0
+
+	def sync(self, client):
+		"""
+		Fetch the pushes modified since the last sync and apply them to the
+		store. Returns the number of pushes that were fetched.
+		"""
+
+		batch = _SyncBatch(self)
+
+		for push in self._changes(client, batch.last_modified):
+			batch.add(push)
+
+		return batch.finish()
+
+	async def sync_async(self, client):
+		"""
+		sync() for an AsyncClient, whose push history is an async iterator.
+		"""
+
+		batch = _SyncBatch(self)
+
+		async for push in self._changes(client, batch.last_modified):
+			batch.add(push)
+
+		return batch.finish()
+
+	@staticmethod
+	def _changes(client, last_modified):
+		# On the first sync there is nothing to delete so don't ask for the
+		# deleted pushes.
+		return client.iter_push_history(
+			modified_after   = last_modified,
+			exclude_inactive = last_modified == 0,
+		)
+
+	def _apply(self, pushes, last_modified = None):
+		active   = [push for push in pushes if push.get('active', True)]
+		inactive = [(push['iden'],) for push in pushes if not push.get('active', True)]
+
+		with self.lock, self.conn:
+			self.conn.executemany(
+				'INSERT OR REPLACE INTO pushes VALUES (?, ?, ?, ?, ?, ?)',
+				[
+					(
+						push['iden'],
+						push.get('modified', 0),
+						push.get('type'),
+						push.get('sender_email'),
+						push.get('target_device_iden'),
+						json.dumps(push if isinstance(push, dict) else push.to_dict()),
+					)
+					for push in active
+				],
+			)
+
+			self.conn.executemany('DELETE FROM pushes WHERE iden = ?', inactive)
+
+			if last_modified is not None:
+				self.conn.execute(
+					'INSERT OR REPLACE INTO meta VALUES (?, ?)',
+					('last_modified', repr(last_modified)),
+				)
+
+	def query(self, limit = None, **filters):
+		"""
+		Find stored pushes, newest first. The filters are push_type,
+		sender_email, target_device_iden, modified_after and modified_before.
+		"""
+
+		conditions = []
+		params     = []
+
+		for name, value in filters.items():
+			if name not in PushStore.FILTERS:
+				raise TypeError('Unknown push filter {}'.format(name))
+
+			if value is not None:
+				conditions.append(PushStore.FILTERS[name])
+				params.append(value)
+
+		sql = 'SELECT data FROM pushes'
+		if conditions:
+			sql += ' WHERE ' + ' AND '.join(conditions)
+		sql += ' ORDER BY modified DESC'
+
+		if limit is not None:
+			sql += ' LIMIT ?'
+			params.append(limit)
+
+		with self.lock:
+			rows = self.conn.execute(sql, params).fetchall()
+
+		return [json.loads(row[0]) for row in rows]
+
+	def close(self):
+		with self.lock:
+			self.conn.close()
+
+	def __enter__(self):
+		return self
+
+	def __exit__(self, exc_type, exc_value, traceback):
+		self.close()
+
+class _SyncBatch(object):
+	"""
+	Applies the pushes fetched by a sync to the store in batches.
+	"""
+
+	def __init__(self, store):
+		self.store         = store
+		self.last_modified = store.last_modified
+		self.count         = 0
+		self.pushes        = []
+
+	def add(self, push):
+		self.pushes.append(push)
+		self.count        += 1
+		self.last_modified = max(self.last_modified, push.get('modified', 0))
+
+		if len(self.pushes) >= PushStore.BATCH_SIZE:
+			self.store._apply(self.pushes)
+			self.pushes = []
+
+	def finish(self):
+		# Pushes come back newest first so the sync point is only moved once
+		# everything older has been stored too.
+		self.store._apply(self.pushes, self.last_modified)
+
+		return self.count
@@ -0,0 +1,495 @@
+import asyncio
+import base64
+import hashlib
+import json
+import os
+import random
+import socket
+import ssl
+import struct
+import time
+import urllib.parse
+
+from pb4py import exceptions
+
+WEBSOCKET_GUID = '258EAFA5-E914-47DA-95CA-C5AB0DC85B11'
+
+OPCODE_CONTINUATION = 0x0
+OPCODE_TEXT         = 0x1
+OPCODE_BINARY       = 0x2
+OPCODE_CLOSE        = 0x8
+OPCODE_PING         = 0x9
+OPCODE_PONG         = 0xA
+
+class WebSocketError(exceptions.PB4PyException):
+	"""
+	The connection to the event stream failed or was closed.
+	"""
+
+def _handshake_request(url):
+	"""
+	Build the opening handshake for a websocket URL. Returns the host, port,
+	whether TLS is used, the request bytes and the expected accept key.
+	"""
+
+	parts  = urllib.parse.urlparse(url)
+	secure = parts.scheme == 'wss'
+	port   = parts.port or (443 if secure else 80)
+	path   = parts.path or '/'
+	if parts.query:
+		path += '?' + parts.query
+
+	key    = base64.b64encode(os.urandom(16)).decode('ascii')
+	accept = base64.b64encode(hashlib.sha1((key + WEBSOCKET_GUID).encode('ascii')).digest()).decode('ascii')
+
+	request = '\r\n'.join([
+		'GET {} HTTP/1.1'.format(path),
+		'Host: {}:{}'.format(parts.hostname, port),
+		'Upgrade: websocket',
+		'Connection: Upgrade',
+		'Sec-WebSocket-Key: {}'.format(key),
+		'Sec-WebSocket-Version: 13',
+		'',
+		'',
+	])
+
+	return parts.hostname, port, secure, request.encode('ascii'), accept
+
+def _check_handshake_response(response, accept):
+	lines = response.decode('latin-1').split('\r\n')
+
+	status = lines[0].split(' ')
+	if len(status) < 2 or status[1] != '101':
+		raise WebSocketError('Event stream refused the connection: {}'.format(lines[0]))
+
+	headers = {}
+	for line in lines[1:]:
+		name, _, value = line.partition(':')
+		headers[name.strip().lower()] = value.strip()
+
+	if headers.get('sec-websocket-accept') != accept:
+		raise WebSocketError('Event stream sent a bad handshake accept key')
+
+def _encode_frame(opcode, payload = b''):
+	"""
+	Encode a single, masked client frame.
+	"""
+
+	header = bytearray([0x80 | opcode])
+	length = len(payload)
+
+	if length < 126:
+		header.append(0x80 | length)
+	elif length < (1 << 16):
+		header.append(0x80 | 126)
+		header.extend(struct.pack('!H', length))
+	else:
+		header.append(0x80 | 127)
+		header.extend(struct.pack('!Q', length))
+
+	mask   = os.urandom(4)
+	masked = bytearray(payload)
+	for i in range(length):
+		masked[i] ^= mask[i % 4]
+
+	return bytes(header) + mask + bytes(masked)
+
+def _parse_frame_header(header):
+	"""
+	Returns (fin, opcode, masked, length) for the first two bytes of a frame.
+	The length is 126 or 127 when an extended length follows.
+	"""
+
+	first, second = bytearray(header)
+
+	return bool(first & 0x80), first & 0x0F, bool(second & 0x80), second & 0x7F
+
+def _unmask(payload, mask):
+	payload = bytearray(payload)
+	for i in range(len(payload)):
+		payload[i] ^= mask[i % 4]
+
+	return bytes(payload)
+
+class WebSocket(object):
+	"""
+	Minimal blocking websocket client, enough to read the text messages the
+	event stream sends.
+	"""
+
+	def __init__(self, url, timeout = None):
+		host, port, secure, request, accept = _handshake_request(url)
+
+		sock = socket.create_connection((host, port), timeout = timeout)
+		if secure:
+			sock = ssl.create_default_context().wrap_socket(sock, server_hostname = host)
+
+		self.sock   = sock
+		self.buffer = b''
+
+		self.sock.sendall(request)
+
+		response = b''
+		while b'\r\n\r\n' not in response:
+			chunk = self.sock.recv(4096)
+			if not chunk:
+				raise WebSocketError('Event stream closed during the handshake')
+
+			response += chunk
+
+		response, _, self.buffer = response.partition(b'\r\n\r\n')
+
+		_check_handshake_response(response, accept)
+
+	def _read(self, size):
+		while len(self.buffer) < size:
+			chunk = self.sock.recv(max(4096, size - len(self.buffer)))
+			if not chunk:
+				raise WebSocketError('Event stream connection closed')
+
+			self.buffer += chunk
+
+		data, self.buffer = self.buffer[:size], self.buffer[size:]
+
+		return data
+
+	def _read_frame(self):
+		fin, opcode, masked, length = _parse_frame_header(self._read(2))
+
+		if length == 126:
+			length = struct.unpack('!H', self._read(2))[0]
+		elif length == 127:
+			length = struct.unpack('!Q', self._read(8))[0]
+
+		mask    = self._read(4) if masked else None
+		payload = self._read(length)
+
+		return fin, opcode, _unmask(payload, mask) if mask else payload
+
+	def recv(self):
+		"""
+		Read the next text message, answering pings along the way.
+		"""
+
+		message = b''
+
+		while True:
+			fin, opcode, payload = self._read_frame()
+
+			if opcode == OPCODE_PING:
+				self.sock.sendall(_encode_frame(OPCODE_PONG, payload))
+			elif opcode == OPCODE_CLOSE:
+				raise WebSocketError('Event stream closed the connection')
+			elif opcode in (OPCODE_TEXT, OPCODE_BINARY, OPCODE_CONTINUATION):
+				message += payload
+
+				if fin:
+					return message.decode('utf-8')
+
+	def close(self):
+		try:
+			self.sock.sendall(_encode_frame(OPCODE_CLOSE))
+		except (socket.error, OSError):
+			pass
+
+		self.sock.close()
+
+class AsyncWebSocket(object):
+	"""
+	asyncio version of WebSocket.
+	"""
+
+	def __init__(self, reader, writer):
+		self.reader = reader
+		self.writer = writer
+
+	@classmethod
+	async def connect(cls, url):
+		host, port, secure, request, accept = _handshake_request(url)
+
+		reader, writer = await asyncio.open_connection(
+			host,
+			port,
+			ssl             = ssl.create_default_context() if secure else None,
+			server_hostname = host if secure else None,
+		)
+
+		writer.write(request)
+		await writer.drain()
+
+		response = await reader.readuntil(b'\r\n\r\n')
+		_check_handshake_response(response[:-4], accept)
+
+		return cls(reader, writer)
+
+	async def _read_frame(self):
+		fin, opcode, masked, length = _parse_frame_header(await self.reader.readexactly(2))
+
+		if length == 126:
+			length = struct.unpack('!H', await self.reader.readexactly(2))[0]
+		elif length == 127:
+			length = struct.unpack('!Q', await self.reader.readexactly(8))[0]
+
+		mask    = await self.reader.readexactly(4) if masked else None
+		payload = await self.reader.readexactly(length)
+
+		return fin, opcode, _unmask(payload, mask) if mask else payload
+
+	async def recv(self):
+		message = b''
+
+		while True:
+			try:
+				fin, opcode, payload = await self._read_frame()
+			except asyncio.IncompleteReadError:
+				raise WebSocketError('Event stream connection closed')
+
+			if opcode == OPCODE_PING:
+				self.writer.write(_encode_frame(OPCODE_PONG, payload))
+				await self.writer.drain()
+			elif opcode == OPCODE_CLOSE:
+				raise WebSocketError('Event stream closed the connection')
+			elif opcode in (OPCODE_TEXT, OPCODE_BINARY, OPCODE_CONTINUATION):
+				message += payload
+
+				if fin:
+					return message.decode('utf-8')
+
+	async def close(self):
+		try:
+			self.writer.write(_encode_frame(OPCODE_CLOSE))
+			await self.writer.drain()
+		except (ConnectionError, OSError):
+			pass
+
+		self.writer.close()
+
+class BaseStream(object):
+	"""
+	Shared settings and bookkeeping for the realtime event streams.
+	"""
+
+	STREAM_URL = 'wss://stream.pushbullet.com/websocket/'
+
+	# The stream sends a nop every 30 seconds so a connection that has been
+	# quiet for longer than this is dead.
+	DEFAULT_NOP_TIMEOUT  = 90
+	DEFAULT_BACKOFF      = 1
+	DEFAULT_MAX_BACKOFF  = 60
+
+	def __init__(self, client, include_nops = False):
+		"""
+		Create the stream from the "stream" section of the client settings:
+
+			* url         - the event stream URL, the access token is appended
+			* nop_timeout - seconds without a message before reconnecting
+			* backoff     - seconds to wait before the first reconnect
+			* max_backoff - the longest wait between reconnects
+		"""
+
+		settings = client.settings.get('stream', {})
+
+		self.client       = client
+		self.include_nops = include_nops
+		self.url          = settings.get('url',         BaseStream.STREAM_URL) + client.auth.get_request_auth()[0]
+		self.nop_timeout  = settings.get('nop_timeout', BaseStream.DEFAULT_NOP_TIMEOUT)
+		self.backoff      = settings.get('backoff',     BaseStream.DEFAULT_BACKOFF)
+		self.max_backoff  = settings.get('max_backoff', BaseStream.DEFAULT_MAX_BACKOFF)
+
+		self.last_modified = None
+		self.attempts      = 0
+
+	def _delay(self):
+		"""
+		Jittered exponential backoff for the next reconnect.
+		"""
+
+		delay = min(self.max_backoff, self.backoff * (2 ** self.attempts))
+		self.attempts += 1
+
+		return random.uniform(delay / 2.0, delay)
+
+	@staticmethod
+	def _retryable(error):
+		"""
+		Whether the stream reconnects after an API error while fetching
+		pushes. Only bad credentials end the stream.
+		"""
+
+		return not isinstance(error, exceptions.PB4PyAuthenticationException)
+
+	def _track(self, pushes):
+		for push in pushes:
+			self.last_modified = max(self.last_modified, push.get('modified', 0))
+
+		return pushes
+
+	def _event(self, message):
+		"""
+		Decode a message. Returns the event and whether the push history has
+		to be fetched for it.
+		"""
+
+		event = json.loads(message)
+
+		if event.get('type') == 'tickle':
+			if event.get('subtype') == 'push':
+				self.client._invalidate(self.client.URL_PUSH_HISTORY)
+
+				return event, True
+
+			if event.get('subtype') == 'device':
+				self.client._invalidate(self.client.URL_DEVICE_LIST)
+
+		return event, False
+
+class Stream(BaseStream):
+	"""
+	Blocking iterator over the realtime event stream. Every message is
+	yielded as a dictionary except for nops (unless include_nops is set).
+	Push tickles have the pushes that changed since the last one attached
+	under "pushes". Dropped connections are reconnected with backoff and the
+	pushes missed while disconnected are attached to a synthetic tickle.
+	"""
+
+	def __init__(self, client, include_nops = False):
+		super(Stream, self).__init__(client, include_nops)
+
+		self.websocket = None
+
+	def _fetch(self):
+		return self._track(list(self.client.iter_push_history(modified_after = self.last_modified)))
+
+	def _connect(self):
+		while True:
+			try:
+				self.websocket = WebSocket(self.url, timeout = self.nop_timeout)
+
+				return
+			except (socket.error, OSError, WebSocketError) as ex:
+				delay = self._delay()
+				self.client.logger.warning('Event stream connect failed (%s), retrying in %.1fs', ex, delay)
+				time.sleep(delay)
+
+	def __iter__(self):
+		while True:
+			try:
+				if self.last_modified is None:
+					newest = list(self.client.iter_push_history(limit = 1))
+					self.last_modified = newest[0]['modified'] if newest else 0
+
+				reconnected = self.websocket is not None
+				self._connect()
+
+				if reconnected:
+					pushes = self._fetch()
+					if pushes:
+						yield {'type': 'tickle', 'subtype': 'push', 'pushes': pushes}
+
+				while True:
+					event, fetch = self._event(self.websocket.recv())
+
+					# Backoff only starts over once the connection delivers
+					# messages, one that is dropped straight away keeps backing off
+					self.attempts = 0
+
+					if fetch:
+						event['pushes'] = self._fetch()
+
+					if event.get('type') != 'nop' or self.include_nops:
+						yield event
+			except (socket.error, OSError, WebSocketError) as ex:
+				delay = self._delay()
+				self.client.logger.warning('Event stream disconnected (%s), reconnecting in %.1fs', ex, delay)
+				self.websocket.sock.close()
+
+				time.sleep(delay)
+			except exceptions.PB4PyAPIException as ex:
+				if not self._retryable(ex):
+					raise
+
+				delay = self._delay()
+				self.client.logger.warning('Event stream fetch failed (%s), reconnecting in %.1fs', ex, delay)
+
+				if self.websocket is not None:
+					self.websocket.sock.close()
+
+				time.sleep(delay)
+
+	def close(self):
+		if self.websocket is not None:
+			self.websocket.close()
+
+class AsyncStream(BaseStream):
+	"""
+	asyncio version of Stream for use with an AsyncClient.
+	"""
+
+	def __init__(self, client, include_nops = False):
+		super(AsyncStream, self).__init__(client, include_nops)
+
+		self.websocket = None
+
+	async def _fetch(self):
+		pushes = [push async for push in self.client.iter_push_history(modified_after = self.last_modified)]
+
+		return self._track(pushes)
+
+	async def _connect(self):
+		while True:
+			try:
+				self.websocket = await asyncio.wait_for(AsyncWebSocket.connect(self.url), self.nop_timeout)
+
+				return
+			except (OSError, asyncio.TimeoutError, WebSocketError) as ex:
+				delay = self._delay()
+				self.client.logger.warning('Event stream connect failed (%s), retrying in %.1fs', ex, delay)
+				await asyncio.sleep(delay)
+
+	async def __aiter__(self):
+		while True:
+			try:
+				if self.last_modified is None:
+					newest = [push async for push in self.client.iter_push_history(limit = 1)]
+					self.last_modified = newest[0]['modified'] if newest else 0
+
+				reconnected = self.websocket is not None
+				await self._connect()
+
+				if reconnected:
+					pushes = await self._fetch()
+					if pushes:
+						yield {'type': 'tickle', 'subtype': 'push', 'pushes': pushes}
+
+				while True:
+					message      = await asyncio.wait_for(self.websocket.recv(), self.nop_timeout)
+					event, fetch = self._event(message)
+
+					self.attempts = 0
+
+					if fetch:
+						event['pushes'] = await self._fetch()
+
+					if event.get('type') != 'nop' or self.include_nops:
+						yield event
+			except (OSError, asyncio.TimeoutError, WebSocketError) as ex:
+				delay = self._delay()
+				self.client.logger.warning('Event stream disconnected (%s), reconnecting in %.1fs', ex, delay)
+				self.websocket.writer.close()
+
+				await asyncio.sleep(delay)
+			except exceptions.PB4PyAPIException as ex:
+				if not self._retryable(ex):
+					raise
+
+				delay = self._delay()
+				self.client.logger.warning('Event stream fetch failed (%s), reconnecting in %.1fs', ex, delay)
+
+				if self.websocket is not None:
+					self.websocket.writer.close()
+
+				await asyncio.sleep(delay)
+
+	async def close(self):
+		if self.websocket is not None:
+			await self.websocket.close()
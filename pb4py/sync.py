@@ -0,0 +1,137 @@
+import threading
+import time
+
+from pb4py.helpers import ContactHelper, DeviceHelper, PushHelper, SubscriptionHelper
+
+class Replica(object):
+	"""
+	Local copy of a single API collection.
+	"""
+
+	def __init__(self, name, url):
+		self.name          = name
+		self.url           = url
+		self.elements      = {}
+		self.last_modified = 0
+		self.last_sync     = None
+		self.lock          = threading.Lock()
+
+	def apply(self, element):
+		"""
+		Merge an element from the API into the replica. Inactive elements are
+		deletion tombstones and remove the element.
+		"""
+
+		self.last_modified = max(self.last_modified, element.get('modified', 0))
+
+		if element.get('active', True):
+			self.elements[element['iden']] = element
+		else:
+			self.elements.pop(element['iden'], None)
+
+	def is_fresh(self, max_age):
+		return self.last_sync is not None and time.time() - self.last_sync < max_age
+
+	def values(self, modified_after = 0):
+		"""
+		The active elements modified after the given timestamp, newest first
+		like the API returns them.
+		"""
+
+		return sorted(
+			(elem for elem in self.elements.values() if elem.get('modified', 0) > modified_after),
+			key     = lambda elem: elem.get('modified', 0),
+			reverse = True,
+		)
+
+class SyncEngine(object):
+	"""
+	Keeps local replicas of the list collections and refreshes them with
+	modified_after deltas instead of downloading them in full every time.
+	"""
+
+	COLLECTIONS = {
+		'pushes':        PushHelper.URL_PUSH_HISTORY,
+		'devices':       DeviceHelper.URL_DEVICE_LIST,
+		'contacts':      ContactHelper.URL_CONTACTS_LIST,
+		'subscriptions': SubscriptionHelper.URL_SUBSCRIPTION_LIST,
+	}
+
+	DEFAULT_MAX_AGE = 60
+
+	def __init__(self, client, settings = None):
+		"""
+		Create the sync engine from the "sync" section of the settings:
+
+			* collections - the collections to replicate (default: all of them)
+			* max_age     - seconds a replica is considered fresh after a refresh
+		"""
+
+		settings = settings or {}
+
+		self.client  = client
+		self.max_age = settings.get('max_age', SyncEngine.DEFAULT_MAX_AGE)
+
+		self.replicas = {
+			name: Replica(name, SyncEngine.COLLECTIONS[name])
+			for name in settings.get('collections', SyncEngine.COLLECTIONS.keys())
+		}
+
+	def handles(self, name):
+		return name in self.replicas
+
+	def refresh(self, name = None, if_stale = False):
+		"""
+		Fetch the changes to a collection (or to every collection) since it was
+		last synced and apply them to the local replica. With if_stale only
+		replicas that are still stale once their lock is held are refreshed,
+		so threads that find a replica stale at the same time fetch it once.
+		"""
+
+		names = [name] if name else list(self.replicas.keys())
+
+		for name in names:
+			replica = self.replicas[name]
+
+			with replica.lock:
+				if if_stale and replica.is_fresh(self.max_age):
+					continue
+
+				# There is nothing to delete on the first sync so skip the
+				# tombstones the API would otherwise send back.
+				params = {'modified_after': replica.last_modified}
+				if replica.last_sync is None:
+					params['active'] = 'true'
+
+				sync_started = time.time()
+
+				for element in self.client._iter_collection(replica.url, name, params = params):
+					replica.apply(element)
+
+				replica.last_sync = sync_started
+
+			self.client.logger.debug('Synced %s, %d elements', name, len(replica.elements))
+
+	def get(self, name, modified_after = 0):
+		"""
+		Get the active elements of a collection from the replica, refreshing it
+		first if it is not fresh.
+		"""
+
+		replica = self.replicas[name]
+
+		if not replica.is_fresh(self.max_age):
+			self.refresh(name, if_stale = True)
+
+		with replica.lock:
+			return replica.values(modified_after)
+
+	def mark_stale(self, url):
+		"""
+		Mark the replica that owns the given URL template as stale so the next
+		read picks up changes made through the client.
+		"""
+
+		for replica in self.replicas.values():
+			if url.startswith(replica.url) and replica.last_sync is not None:
+				replica.last_sync = 0
@@ -0,0 +1,127 @@
+from pb4py.codec import get_codec
+
+import threading
+
+import requests
+import requests.adapters
+
+class BufferedResponse(object):
+	"""
+	A fully read response that was not produced by requests, either from
+	the asyncio transport or from the response cache. It mimics the parts of
+	a requests Response that the helpers use.
+	"""
+
+	def __init__(self, status_code, headers, content):
+		self.status_code = status_code
+		self.headers     = headers
+		self.content     = content
+
+	def json(self):
+		return get_codec().loads(self.content)
+
+class Transport(object):
+	"""
+	Pooled HTTP transport used by all of the helpers on a client. Connections
+	to the API are kept in a single pool for the lifetime of the transport so
+	they are reused (keep-alive) instead of being renegotiated for every
+	request.
+
+	requests Sessions aren't safe to share between threads so every thread
+	gets a Session of its own. They all send through one adapter, whose
+	connection pool is thread-safe, so the connections are still shared.
+	"""
+
+	DEFAULT_POOL_CONNECTIONS = 10
+	DEFAULT_POOL_MAXSIZE     = 10
+	DEFAULT_POOL_BLOCK       = False
+	DEFAULT_KEEP_ALIVE       = True
+	DEFAULT_TIMEOUT          = (3.05, 30)
+
+	# Errors raised when the API could not be reached, requests failing with
+	# one of these may be retried
+	CONNECTION_ERRORS = (requests.ConnectionError, requests.Timeout, requests.exceptions.ChunkedEncodingError)
+
+	# Every error requests raises, all of them are raised as
+	# PB4PyConnectionException
+	REQUEST_ERRORS = (requests.RequestException,)
+
+	def __init__(self, settings = None):
+		"""
+		Create the transport from the "transport" section of the settings. The
+		following options are understood:
+
+			* pool_connections - number of per-host connection pools to cache
+			* pool_maxsize     - maximum number of connections kept per host
+			* pool_block       - block when a host's pool is exhausted instead
+			                     of opening a throw away connection
+			* keep_alive       - reuse connections between requests
+			* timeout          - seconds, or a [connect, read] pair
+		"""
+
+		settings = settings or {}
+
+		self.pool_connections = settings.get('pool_connections', Transport.DEFAULT_POOL_CONNECTIONS)
+		self.pool_maxsize     = settings.get('pool_maxsize',     Transport.DEFAULT_POOL_MAXSIZE)
+		self.pool_block       = settings.get('pool_block',       Transport.DEFAULT_POOL_BLOCK)
+		self.keep_alive       = settings.get('keep_alive',       Transport.DEFAULT_KEEP_ALIVE)
+		self.timeout          = Transport._parse_timeout(settings.get('timeout', Transport.DEFAULT_TIMEOUT))
+
+		self.adapter = requests.adapters.HTTPAdapter(
+			pool_connections = self.pool_connections,
+			pool_maxsize     = self.pool_maxsize,
+			pool_block       = self.pool_block,
+		)
+
+		self._local = threading.local()
+
+	@property
+	def session(self):
+		"""
+		The calling thread's Session, created on first use.
+		"""
+
+		session = getattr(self._local, 'session', None)
+		if session is None:
+			session = self._local.session = self._create_session()
+
+		return session
+
+	def _create_session(self):
+		session = requests.Session()
+		session.mount('https://', self.adapter)
+		session.mount('http://',  self.adapter)
+
+		if not self.keep_alive:
+			session.headers['Connection'] = 'close'
+
+		return session
+
+	@staticmethod
+	def _parse_timeout(timeout):
+		if isinstance(timeout, (list, tuple)):
+			return tuple(timeout)
+
+		return timeout
+
+	def request(self, method, url, **kwargs):
+		"""
+		Send a request over the pooled session.
+		"""
+
+		kwargs.setdefault('timeout', self.timeout)
+
+		return self.session.request(method, url, **kwargs)
+
+	def close(self):
+		"""
+		Close all of the pooled connections.
+		"""
+
+		self.adapter.close()
+
+	def __enter__(self):
+		return self
+
+	def __exit__(self, exc_type, exc_value, traceback):
+		self.close()
@@ -0,0 +1,146 @@
+import mmap
+import mimetypes
+import os
+import uuid
+
+class FileSource(object):
+	"""
+	Where the contents of an upload come from: a path, a file-like object or an
+	iterable of bytes. The size has to be known up front so it can be checked
+	before anything is sent and so the upload can set a Content-Length.
+	"""
+
+	CHUNK_SIZE     = 64 * 1024
+	MMAP_THRESHOLD = 4 * 1024 * 1024
+
+	def __init__(self, source, file_name = None, file_type = None, file_size = None):
+		self.source    = source
+		self.file_name = file_name or FileSource._guess_name(source)
+		self.file_type = file_type or mimetypes.guess_type(self.file_name or '')[0] or 'application/octet-stream'
+		self.file_size = file_size if file_size is not None else FileSource._measure(source)
+
+	@staticmethod
+	def _guess_name(source):
+		if isinstance(source, str):
+			return os.path.basename(source)
+
+		name = getattr(source, 'name', None)
+		if isinstance(name, str):
+			return os.path.basename(name)
+
+		return None
+
+	@staticmethod
+	def _measure(source):
+		if isinstance(source, str):
+			return os.path.getsize(source)
+
+		if hasattr(source, 'fileno'):
+			try:
+				return os.fstat(source.fileno()).st_size - source.tell()
+			except (OSError, IOError, AttributeError):
+				pass
+
+		if hasattr(source, 'seek') and hasattr(source, 'tell'):
+			start = source.tell()
+			source.seek(0, os.SEEK_END)
+			end = source.tell()
+			source.seek(start)
+
+			return end - start
+
+		return None
+
+	def chunks(self):
+		"""
+		Yield the contents of the source a chunk at a time. Large files on disk
+		are read through a memory map instead of buffered reads.
+		"""
+
+		if isinstance(self.source, str):
+			with open(self.source, 'rb') as fh:
+				for chunk in FileSource._read_file(fh, self.file_size):
+					yield chunk
+		elif hasattr(self.source, 'read'):
+			for chunk in FileSource._read_file(self.source, self.file_size):
+				yield chunk
+		else:
+			for chunk in self.source:
+				yield chunk
+
+	@staticmethod
+	def _read_file(fh, size):
+		if size >= FileSource.MMAP_THRESHOLD and hasattr(fh, 'fileno'):
+			try:
+				offset = fh.tell()
+				mapped = mmap.mmap(fh.fileno(), 0, access = mmap.ACCESS_READ)
+			except (OSError, IOError, ValueError, AttributeError):
+				mapped = None
+
+			if mapped is not None:
+				try:
+					for start in range(offset, offset + size, FileSource.CHUNK_SIZE):
+						yield mapped[start:min(start + FileSource.CHUNK_SIZE, offset + size)]
+				finally:
+					mapped.close()
+
+				return
+
+		while True:
+			chunk = fh.read(FileSource.CHUNK_SIZE)
+			if not chunk:
+				return
+
+			yield chunk
+
+class MultipartStream(object):
+	"""
+	A multipart/form-data body that is generated as it is sent. It has a
+	length so the upload is sent with a Content-Length instead of chunked.
+	"""
+
+	def __init__(self, source, fields = None, progress = None):
+		self.source   = source
+		self.progress = progress
+		self.boundary = uuid.uuid4().hex
+
+		head = b''
+		for name, value in (fields or {}).items():
+			head += self._part_header(name) + b'\r\n' + str(value).encode('utf-8') + b'\r\n'
+
+		head += self._part_header(
+			'file',
+			'; filename="{}"'.format(source.file_name or 'file'),
+			'Content-Type: {}\r\n'.format(source.file_type),
+		)
+
+		self.head = head + b'\r\n'
+		self.tail = '\r\n--{}--\r\n'.format(self.boundary).encode('ascii')
+
+	def _part_header(self, name, extra = '', headers = ''):
+		return '--{}\r\nContent-Disposition: form-data; name="{}"{}\r\n{}'.format(
+			self.boundary,
+			name,
+			extra,
+			headers,
+		).encode('utf-8')
+
+	@property
+	def content_type(self):
+		return 'multipart/form-data; boundary={}'.format(self.boundary)
+
+	def __len__(self):
+		return len(self.head) + self.source.file_size + len(self.tail)
+
+	def __iter__(self):
+		yield self.head
+
+		sent = 0
+		for chunk in self.source.chunks():
+			yield chunk
+
+			sent += len(chunk)
+			if self.progress:
+				self.progress(sent, self.source.file_size)
+
+		yield self.tail
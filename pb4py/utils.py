@@ -1,7 +1,20 @@
+import hashlib
+import os
+
 import pb4py.exceptions
 
-def log_and_raise(logger, message, exception_type = pb4py.exceptions.PB4PyException):
+def log_and_raise(logger, message, exception_type = pb4py.exceptions.PB4PyException, **kwargs):
 	logger.error(message)
 
-	raise exception_type(message)
+	raise exception_type(message, **kwargs)
+
+def account_cache_path(access_token, name):
+	"""
+	Path of a per-account file in the user's cache directory. Files are named
+	after a hash of the access token so accounts never share them.
+	"""
+
+	cache_dir = os.environ.get('XDG_CACHE_HOME') or os.path.expanduser('~/.cache')
+	account   = hashlib.sha1(access_token.encode('utf-8')).hexdigest()[:16]
 
+	return os.path.join(cache_dir, 'pb4py', '{}-{}.sqlite3'.format(name, account))
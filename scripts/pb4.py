@@ -1,17 +1,35 @@
 #!/usr/bin/env python
 
-from __future__ import print_function
-
 import argparse
+import contextlib
+import io
 import json
+import os
+import subprocess
 import sys
-import tabulate
+import time
 
 import pb4py
 import pb4py.exceptions
 
 
 
+def add_batch_arguments(parser):
+	parser.add_argument(
+		'-y',
+		'--yes',
+		action = 'store_true',
+		help   = 'Don\'t ask for confirmation',
+	)
+
+	parser.add_argument(
+		'--max-workers',
+		dest    = 'max_workers',
+		type    = int,
+		default = None,
+		help    = 'The number of requests to make at once',
+	)
+
 def add_device_commands(parsers):
 	device_parsers = parsers.add_subparsers()
 
@@ -50,8 +68,9 @@ def add_device_commands(parsers):
 
 	update_device.add_argument(
 		'iden',
-		type = str,
-		help = 'The ID of the device',
+		type  = str,
+		nargs = '+',
+		help  = 'The IDs of the devices',
 	)
 
 	update_device.add_argument(
@@ -69,6 +88,8 @@ def add_device_commands(parsers):
 		help    = 'Set the device type',
 	)
 
+	add_batch_arguments(update_device)
+
 	update_device.set_defaults(func = command_devices_update)
 
 
@@ -80,10 +101,13 @@ def add_device_commands(parsers):
 
 	delete_device.add_argument(
 		'iden',
-		type = str,
-		help = 'The ID of the device',
+		type  = str,
+		nargs = '+',
+		help  = 'The IDs of the devices',
 	)
 
+	add_batch_arguments(delete_device)
+
 	delete_device.set_defaults(func = command_devices_delete)
 
 def add_contact_commands(parsers):
@@ -153,13 +177,19 @@ def add_contact_commands(parsers):
 
 	delete_contact.add_argument(
 		'iden',
-		type = str,
-		help = 'The ID of the contact',
+		type  = str,
+		nargs = '+',
+		help  = 'The IDs of the contacts',
 	)
 
+	add_batch_arguments(delete_contact)
+
 	delete_contact.set_defaults(func = command_contacts_delete)
 
 def add_push_commands(parsers):
+	# The helper has the push types without importing the client and requests
+	from pb4py.helpers import PushHelper
+
 	push_parsers = parsers.add_subparsers()
 
 	send_push = push_parsers.add_parser(
@@ -193,10 +223,32 @@ def add_push_commands(parsers):
 		help = 'An OAuth client ID',
 	)
 
+	target_group.add_argument(
+		'--targets-file',
+		dest = 'targets_file',
+		type = str,
+		help = 'A file with one target per line to send the push to. Lines are either an email or target_type=value (ex: device_iden=abc123)',
+	)
+
+	send_push.add_argument(
+		'--max-workers',
+		dest    = 'max_workers',
+		type    = int,
+		default = None,
+		help    = 'The number of pushes to send at once (only used with --targets-file)',
+	)
+
+	send_push.add_argument(
+		'--processes',
+		type    = int,
+		default = None,
+		help    = 'Send from this many processes, each sending --max-workers pushes at once (only used with --targets-file)',
+	)
+
 	send_push.add_argument(
 		'push_type',
 		type    = str,
-		choices = pb4py.Client.PUSH_TYPES,
+		choices = PushHelper.PUSH_TYPES,
 		help    = 'The type of push to send',
 	)
 
@@ -223,9 +275,10 @@ def add_push_commands(parsers):
 
 	send_push.add_argument(
 		'--file-path',
-		dest = 'file_path',
-		type = str,
-		help = 'The path to the file (only used for file pushes)',
+		dest  = 'file_path',
+		type  = str,
+		nargs = '+',
+		help  = 'The path to the file (only used for file pushes). Several files are uploaded and pushed in parallel',
 	)
 
 	send_push.add_argument(
@@ -256,40 +309,132 @@ def add_push_commands(parsers):
 	push_history.add_argument(
 		'--filter-type',
 		type    = str,
-		choices = pb4py.Client.PUSH_TYPES,
+		choices = PushHelper.PUSH_TYPES,
 		help    = 'Filter the pushes by their type',
 	)
 
+	push_history.add_argument(
+		'--limit',
+		type    = int,
+		default = None,
+		help    = 'The maximum number of pushes to show',
+	)
+
+	push_history.add_argument(
+		'--page-size',
+		dest    = 'page_size',
+		type    = int,
+		default = 100,
+		help    = 'The number of pushes to fetch and print at a time',
+	)
+
 	push_history.set_defaults(func = command_push_history)
 
 
 
+	search_pushes = push_parsers.add_parser(
+		'search',
+		help = 'Search your push history using the local push store.',
+	)
+
+	search_pushes.add_argument(
+		'--type',
+		dest    = 'push_type',
+		type    = str,
+		choices = PushHelper.PUSH_TYPES,
+		default = None,
+		help    = 'Only show pushes of this type',
+	)
+
+	search_pushes.add_argument(
+		'--sender',
+		dest    = 'sender_email',
+		type    = str,
+		default = None,
+		help    = 'Only show pushes sent by this email',
+	)
+
+	search_pushes.add_argument(
+		'--device',
+		dest    = 'target_device_iden',
+		type    = str,
+		default = None,
+		help    = 'Only show pushes sent to this device ID',
+	)
+
+	search_pushes.add_argument(
+		'--after',
+		dest    = 'modified_after',
+		type    = float,
+		default = None,
+		help    = 'Only show pushes modified after this UNIX timestamp',
+	)
+
+	search_pushes.add_argument(
+		'--before',
+		dest    = 'modified_before',
+		type    = float,
+		default = None,
+		help    = 'Only show pushes modified before this UNIX timestamp',
+	)
+
+	search_pushes.add_argument(
+		'--limit',
+		type    = int,
+		default = None,
+		help    = 'The maximum number of pushes to show',
+	)
+
+	search_pushes.add_argument(
+		'--no-refresh',
+		dest   = 'refresh',
+		action = 'store_false',
+		help   = 'Search the store without syncing it with PushBullet first',
+	)
+
+	search_pushes.set_defaults(func = command_push_search)
+
+
+
 	dismiss_push = push_parsers.add_parser(
 		'dismiss',
-		help = 'Dismiss a push.',
+		help = 'Dismiss pushes.',
 	)
 
 	dismiss_push.add_argument(
 		'iden',
-		type = str,
-		help = 'The push ID',
+		type  = str,
+		nargs = '+',
+		help  = 'The push IDs',
 	)
 
+	add_batch_arguments(dismiss_push)
+
 	dismiss_push.set_defaults(func = command_push_dismiss)
 
 
 
 	delete_push = push_parsers.add_parser(
 		'delete',
-		help = 'Delete a push',
+		help = 'Delete pushes',
 	)
 
 	delete_push.add_argument(
 		'iden',
-		type = str,
-		help = 'The push ID',
+		type  = str,
+		nargs = '*',
+		help  = 'The push IDs',
 	)
 
+	delete_push.add_argument(
+		'--all',
+		dest   = 'delete_all',
+		action = 'store_true',
+		help   = 'Delete every push',
+	)
+
+	add_batch_arguments(delete_push)
+
 	delete_push.set_defaults(func = command_push_delete)
 
 def add_subscription_commands(parsers):
@@ -344,57 +489,96 @@ def add_channel_commands(parsers):
 
 	subscribe.set_defaults(func = command_channel_subscribe)
 
-def add_parser_commands(parsers):
-	parsers.add_parser(
-		'generate-config',
-		help = 'Generate a sane set of config options. These can then bet put in the ~/.pb4pyrc file.',
-	).set_defaults(func = command_generate_default_config)
+def add_stream_commands(parser):
+	parser.add_argument(
+		'--nops',
+		action = 'store_true',
+		help   = 'Also show the keep-alive messages',
+	)
 
-	add_device_commands(parsers.add_parser(
-		'devices',
-		help = 'Manage connected devices.',
-	))
+	parser.set_defaults(func = command_stream)
 
-	add_contact_commands(parsers.add_parser(
-		'contacts',
-		help = 'Manage contacts.',
-	))
+def add_daemon_commands(parsers):
+	daemon_parsers = parsers.add_subparsers()
+
+	start_daemon = daemon_parsers.add_parser(
+		'start',
+		help = 'Start the daemon in the background.',
+	)
 
-	parsers.add_parser(
-		'me',
-		help = 'Get information about yourself.',
-	).set_defaults(func = command_me_get)
+	start_daemon.add_argument(
+		'--foreground',
+		action = 'store_true',
+		help   = 'Run the daemon in this process instead',
+	)
 
-	add_push_commands(parsers.add_parser(
-		'pushes',
-		help = 'Manage pushes',
-	))
+	start_daemon.set_defaults(func = command_daemon_start)
+
+	daemon_parsers.add_parser(
+		'stop',
+		help = 'Stop the daemon.',
+	).set_defaults(func = command_daemon_stop)
+
+	daemon_parsers.add_parser(
+		'status',
+		help = 'Show whether the daemon is running.',
+	).set_defaults(func = command_daemon_status)
+
+def add_generate_config_commands(parser):
+	parser.set_defaults(func = command_generate_default_config)
+
+def add_me_commands(parser):
+	parser.set_defaults(func = command_me_get)
+
+# The subcommands, their help and the function that adds their arguments. Only
+# the arguments of the command being run are added, building the whole tree
+# costs more than most commands take to run.
+COMMANDS = [
+	('generate-config', 'Generate a sane set of config options. These can then bet put in the ~/.pb4pyrc file.', add_generate_config_commands),
+	('devices',         'Manage connected devices.',         add_device_commands),
+	('contacts',        'Manage contacts.',                  add_contact_commands),
+	('me',              'Get information about yourself.',   add_me_commands),
+	('pushes',          'Manage pushes',                     add_push_commands),
+	('subscriptions',   'Manage subscriptions',              add_subscription_commands),
+	('channels',        'Manage channels',                   add_channel_commands),
+	('stream',          'Watch the realtime event stream.',  add_stream_commands),
+	('daemon',          'Keep a client running in the background for faster commands.', add_daemon_commands),
+]
+
+def selected_command(argv):
+	"""
+	The name of the subcommand on the command line. The top level parser has
+	no options that take a value so it is the first positional argument.
+	"""
 
-	add_subscription_commands(parsers.add_parser(
-		'subscriptions',
-		help = 'Manage subscriptions',
-	))
+	for arg in argv:
+		if not arg.startswith('-'):
+			return arg
 
-	add_channel_commands(parsers.add_parser(
-		'channels',
-		help = 'Manage channels',
-	))
+	return None
+
+def add_parser_commands(parsers, selected = None):
+	for name, help_text, add_commands in COMMANDS:
+		parser = parsers.add_parser(name, help = help_text)
 
-def parse_args():
+		if name == selected:
+			add_commands(parser)
+
+def parse_args(argv):
 	parser = argparse.ArgumentParser(
 		description = 'A CLI command for working with PushBullet',
 	)
 
 	command_parsers = parser.add_subparsers(title = 'commands')
-	add_parser_commands(command_parsers)
+	add_parser_commands(command_parsers, selected_command(argv))
 
-	return parser.parse_args()
+	return parser.parse_args(argv)
 
 
 
 def prompt(question, default = "yes"):
 	"""
-	Ask a yes/no question via raw_input() and return their answer.
+	Ask a yes/no question via input() and return their answer.
 
 	"question" is a string that is presented to the user.
 	"default" is the presumed answer if the user just hits <Enter>.
@@ -414,9 +598,13 @@ def prompt(question, default = "yes"):
 	else:
 		raise ValueError('invalid default answer: \'%s\'' % default)
 
+	# The daemon has no terminal, the CLI runs the command itself instead
+	if daemon_client is not None:
+		raise NeedsTerminal()
+
 	while True:
 		sys.stdout.write(question + options)
-		choice = raw_input().lower()
+		choice = input().lower()
 		if default is not None and choice == '':
 			return valid[default]
 		elif choice in valid:
@@ -424,7 +612,39 @@ def prompt(question, default = "yes"):
 		else:
 			sys.stdout.write('Please respond with \'yes\' or \'no\' (or \'y\' or \'n\').\n')
 
+def plural(count, noun):
+	if count == 1:
+		return '{} {}'.format(count, noun)
+
+	return '{} {}{}'.format(count, noun, 'es' if noun.endswith('sh') else 's')
+
+def confirm_batch(args, action, noun):
+	"""
+	Ask once whether to run a batch command unless --yes was given.
+	"""
+
+	if args.yes:
+		return True
+
+	if len(args.iden) == 1:
+		question = 'Are you sure you want to {} {} {}?'.format(action, noun, args.iden[0])
+	else:
+		question = 'Are you sure you want to {} {}?'.format(action, plural(len(args.iden), noun))
+
+	return prompt(question, default = 'no')
+
+def print_batch_report(report, action, noun):
+	for iden, error in report.failed:
+		print('Failed on {}: {}'.format(iden, error), file = sys.stderr)
+
+	print('{} {}'.format(plural(len(report.succeeded), noun), action))
+
+	if not report.ok:
+		sys.exit(1)
+
 def build_table(data, columns):
+	import tabulate
+
 	return tabulate.tabulate(
 		[
 			[
@@ -438,11 +658,53 @@ def build_table(data, columns):
 
 
 
+# The daemon's client. Commands run by the daemon use it instead of creating
+# their own.
+daemon_client = None
+
+class NeedsTerminal(Exception):
+	"""
+	Raised when a command run by the daemon asks a question on stdin.
+	"""
+
+def interactive(func):
+	"""
+	Mark a command that asks for confirmation on stdin unless it is given
+	--yes. These aren't sent to the daemon.
+	"""
+
+	func.interactive = True
+
+	return func
+
+class LocalClient(pb4py.Client):
+	"""
+	Client for commands that aren't run by the daemon. It remembers the
+	collections it changes so a running daemon can drop its cached copies.
+	"""
+
+	def __init__(self, *args, **kwargs):
+		super(LocalClient, self).__init__(*args, **kwargs)
+
+		self.changed = set()
+
+	def _invalidate(self, path):
+		super(LocalClient, self)._invalidate(path)
+
+		self.changed.add(path)
+
 def client_command(func):
 	def wrapper(*args, **kwargs):
-		client = pb4py.Client()
+		if daemon_client is not None:
+			return func(daemon_client, *args, **kwargs)
+
+		client = LocalClient()
 
-		return func(client, *args, **kwargs)
+		try:
+			return func(client, *args, **kwargs)
+		finally:
+			if client.changed:
+				invalidate_daemon(sorted(client.changed))
 
 	return wrapper
 
@@ -458,9 +720,10 @@ def command_generate_default_config(args):
 
 @client_command
 def command_devices_list(client, args):
-	devices = client.devices()
+	columns = ['iden', 'nickname', 'type']
+	devices = client.devices(fields = columns)
 
-	print(build_table(devices, ['iden', 'nickname', 'type']))
+	print(build_table(devices, columns))
 
 @client_command
 def command_devices_create(client, args):
@@ -468,6 +731,7 @@ def command_devices_create(client, args):
 
 	print('Device created')
 
+@interactive
 @client_command
 def command_devices_update(client, args):
 	updates = {
@@ -476,26 +740,33 @@ def command_devices_update(client, args):
 		if getattr(args, k) is not None
 	}
 
-	client.update_device(args.iden, **updates)
+	if len(args.iden) == 1:
+		client.update_device(args.iden[0], **updates)
 
-	print('Device updated')
+		print('Device updated')
+		return
+
+	if not confirm_batch(args, 'update', 'device'):
+		return
+
+	report = client.update_devices({iden: updates for iden in args.iden}, args.max_workers)
 
+	print_batch_report(report, 'updated', 'device')
+
+@interactive
 @client_command
 def command_devices_delete(client, args):
-	device = args.iden
-	confirm = prompt('Are you sure you want to delete device {}?'.format(device), default = 'no')
-	if not confirm:
+	if not confirm_batch(args, 'delete', 'device'):
 		return
 
-	client.delete_device(device)
-
-	print('Device deleted')
+	print_batch_report(client.delete_devices(args.iden, args.max_workers), 'deleted', 'device')
 
 @client_command
 def command_contacts_list(client, args):
-	contacts = client.contacts()
+	columns  = ['iden', 'name', 'email']
+	contacts = client.contacts(fields = columns)
 
-	print(build_table(contacts, ['iden', 'name', 'email']))
+	print(build_table(contacts, columns))
 
 @client_command
 def command_contacts_create(client, args):
@@ -515,17 +786,13 @@ def command_contacts_update(client, args):
 
 	print('Contact updated')
 
+@interactive
 @client_command
 def command_contacts_delete(client, args):
-	contact = args.iden
-
-	confirm = prompt('Are you sure you want to delete contact {}?'.format(contact), default = 'no')
-	if not confirm:
+	if not confirm_batch(args, 'delete', 'contact'):
 		return
 
-	client.delete_contact(contact)
-
-	print('Contact deleted')
+	print_batch_report(client.delete_contacts(args.iden, args.max_workers), 'deleted', 'contact')
 
 @client_command
 def command_me_get(client, args):
@@ -540,17 +807,8 @@ def command_push_send(client, args):
 		if not args.file_path:
 			raise ValueError('No file was specified')
 
-		args.file_url = client.upload_file(
-			args.file_path,
-			filename  = args.file_name,
-			file_type = args.file_type,
-		)['file_url']
-
-		push_data = {
-			k: getattr(args, k)
-			for k in ['title', 'body', 'file_name', 'file_type', 'file_url']
-			if getattr(args, k) is not None
-		}
+		send_file_pushes(client, args)
+		return
 	elif push_type == 'link':
 		if not args.url:
 			raise ValueError('No URL was given')
@@ -567,9 +825,13 @@ def command_push_send(client, args):
 			if getattr(args, k) is not None
 		}
 
+	if args.targets_file:
+		send_push_to_targets(client, args, push_type, push_data)
+		return
+
 	push_data.update({
 		k: getattr(args, k)
-		for k in ['device_iden', 'email', 'channel_tag', 'client_iden']
+		for k in pb4py.Client.TARGET_TYPES
 		if getattr(args, k) is not None
 	})
 
@@ -577,17 +839,133 @@ def command_push_send(client, args):
 
 	print('Sent push')
 
+def send_file_pushes(client, args):
+	target = {
+		k: getattr(args, k)
+		for k in pb4py.Client.TARGET_TYPES
+		if getattr(args, k) is not None
+	}
+
+	if args.targets_file:
+		if len(args.file_path) > 1:
+			raise ValueError('Only one file can be pushed to a targets file')
+
+		# Upload the file once and push the same link to every target
+		upload = client.upload_file(args.file_path[0], filename = args.file_name, file_type = args.file_type)
+
+		push_data = {k: upload[k] for k in ['file_name', 'file_type', 'file_url']}
+		if args.body is not None:
+			push_data['body'] = args.body
+
+		send_push_to_targets(client, args, 'file', push_data)
+		return
+
+	if len(args.file_path) == 1:
+		client.push_file(
+			args.file_path[0],
+			body      = args.body,
+			filename  = args.file_name,
+			file_type = args.file_type,
+			**target
+		)
+
+		print('Sent push')
+		return
+
+	for result in client.push_files(args.file_path, body = args.body, max_workers = args.max_workers, **target):
+		if result.ok:
+			print('Pushed {}'.format(result.item))
+		else:
+			print('Failed to push {}: {}'.format(result.item, result.error))
+
+def read_targets(targets_file):
+	with open(targets_file, 'r') as fh:
+		for line in fh:
+			line = line.strip()
+			if not line or line.startswith('#'):
+				continue
+
+			target_type, sep, value = line.partition('=')
+			if sep and target_type in pb4py.Client.TARGET_TYPES:
+				yield {target_type: value}
+			else:
+				yield {'email': line}
+
+def send_push_to_targets(client, args, push_type, push_data):
+	sent   = 0
+	failed = 0
+
+	if args.processes:
+		results = client.push_many_processes(
+			push_type,
+			read_targets(args.targets_file),
+			processes   = args.processes,
+			max_workers = args.max_workers,
+			**push_data
+		)
+	else:
+		results = client.push_many(
+			push_type,
+			read_targets(args.targets_file),
+			max_workers = args.max_workers,
+			**push_data
+		)
+
+	for result in results:
+		target = list(result.item.values())[0]
+
+		if result.ok:
+			sent += 1
+			print('Sent push to {}'.format(target))
+		else:
+			failed += 1
+			print('Failed to push to {}: {}'.format(target, result.error))
+
+	print('Sent {} pushes, {} failed'.format(sent, failed))
+
+	for stats in getattr(results, 'workers', []):
+		print('Process {}: {} sent, {} failed, {:.1f} pushes/s'.format(stats.pid, stats.sent, stats.failed, stats.per_sec))
+
 @client_command
 def command_push_history(client, args):
-	pushes = client.push_history()
+	pushes = client.iter_push_history(
+		page_size = args.page_size,
+		limit     = args.limit,
+		push_type = args.filter_type,
+		fields    = PUSH_FIELDS,
+	)
 
-	if len(pushes) == 0:
+	shown = False
+	for page in paginate(pushes, args.page_size):
+		shown = True
+		print_pushes(page)
+
+	if not shown:
 		print('No pushes :\'(')
-		return
 
-	if args.filter_type:
-		pushes = [push for push in pushes if push['type'] == args.filter_type]
+def paginate(elements, page_size):
+	page = []
+
+	for element in elements:
+		page.append(element)
+
+		if len(page) >= page_size:
+			yield page
+			page = []
+
+	if page:
+		yield page
+
+PUSH_COLUMNS = {
+	'file': ['iden', 'sender_name', 'sender_email', 'file_url'],
+	'link': ['iden', 'sender_name', 'sender_email', 'title', 'body', 'url'],
+	'note': ['iden', 'sender_name', 'sender_email', 'title', 'body'],
+}
 
+# Every key that is shown, the rest aren't kept when fetching the history
+PUSH_FIELDS = sorted(set(column for columns in PUSH_COLUMNS.values() for column in columns) | {'type'})
+
+def print_pushes(pushes):
 	pushes = {
 		push_type: [push for push in pushes if push['type'] == push_type]
 		for push_type in pb4py.Client.PUSH_TYPES
@@ -600,54 +978,77 @@ def command_push_history(client, args):
 		if len(pushes_of_type) == 0:
 			continue
 
-		if push_type == 'file':
-			columns = ['iden', 'sender_name', 'sender_email', 'file_url']
-		elif push_type == 'link':
-			columns = ['iden', 'sender_name', 'sender_email', 'title', 'body', 'url']
-		elif push_type == 'note':
-			columns = ['iden', 'sender_name', 'sender_email', 'title', 'body']
-
 		print('===== ' + push_type.capitalize() + ' =====')
-		print(build_table(pushes_of_type, columns))
+		print(build_table(pushes_of_type, PUSH_COLUMNS[push_type]))
 
 @client_command
-def command_push_dismiss(client, args):
-	push = args.iden
+def command_push_search(client, args):
+	pushes = client.search_pushes(
+		refresh            = args.refresh,
+		limit              = args.limit,
+		push_type          = args.push_type,
+		sender_email       = args.sender_email,
+		target_device_iden = args.target_device_iden,
+		modified_after     = args.modified_after,
+		modified_before    = args.modified_before,
+	)
 
-	confirm = prompt('Are you sure you want to dismiss push {}?'.format(push), default = 'no')
-	if not confirm:
+	if len(pushes) == 0:
+		print('No pushes :\'(')
 		return
 
-	client.dismiss_push(push)
+	print_pushes(pushes)
+
+@interactive
+@client_command
+def command_push_dismiss(client, args):
+	if not confirm_batch(args, 'dismiss', 'push'):
+		return
 
-	print('Push dismissed')
+	print_batch_report(client.dismiss_pushes(args.iden, args.max_workers), 'dismissed', 'push')
 
+@interactive
 @client_command
 def command_push_delete(client, args):
-	push = args.iden
+	if args.delete_all:
+		if args.iden:
+			raise ValueError('Push IDs can\'t be given with --all')
 
-	confirm = prompt('Are you sure you want to delete push {}?'.format(push), default = 'no')
-	if not confirm:
+		if not args.yes and not prompt('Are you sure you want to delete every push?', default = 'no'):
+			return
+
+		client.delete_all_pushes()
+
+		print('All pushes deleted')
 		return
 
-	client.delete_push(push)
+	if not args.iden:
+		raise ValueError('No push IDs were given')
+
+	if not confirm_batch(args, 'delete', 'push'):
+		return
 
-	print('Push deleted')
+	print_batch_report(client.delete_pushes(args.iden, args.max_workers), 'deleted', 'push')
 
 @client_command
 def command_subscriptions_list(client, args):
-	subscriptions = client.subscriptions()
+	rows = []
 
-	for subscription in subscriptions:
+	# Rows are built separately as subscriptions may be read-only models
+	for subscription in client.subscriptions():
 		channel = subscription['channel']
 
-		subscription['name']        = channel.get('name',        '')
-		subscription['tag']         = channel.get('tag',         '')
-		subscription['website_url'] = channel.get('website_url', '')
-		subscription['description'] = channel.get('description', '')
+		rows.append({
+			'iden':        subscription['iden'],
+			'name':        channel.get('name',        ''),
+			'tag':         channel.get('tag',         ''),
+			'website_url': channel.get('website_url', ''),
+			'description': channel.get('description', ''),
+		})
 
-	print(build_table(subscriptions, ['iden', 'name', 'tag', 'website_url', 'description']))
+	print(build_table(rows, ['iden', 'name', 'tag', 'website_url', 'description']))
 
+@interactive
 @client_command
 def command_subscriptions_unsubscribe(client, args):
 	channel = args.tag
@@ -674,10 +1075,255 @@ def command_channel_subscribe(client, args):
 
 	print('Subscribed')
 
+@client_command
+def command_stream(client, args):
+	stream = client.stream(include_nops = args.nops)
+
+	try:
+		for event in stream:
+			if event.get('pushes'):
+				print_pushes(event['pushes'])
+			else:
+				print(json.dumps(event, sort_keys = True))
+
+			sys.stdout.flush()
+	except KeyboardInterrupt:
+		pass
+	finally:
+		stream.close()
+
+
+def command_daemon_start(args):
+	from pb4py import daemon
+
+	path = daemon.default_socket_path()
+
+	if daemon.is_running(path):
+		print('The daemon is already running')
+		return
+
+	if args.foreground:
+		serve_daemon(path)
+		return
+
+	log_path = os.path.join(os.path.dirname(path), 'daemon.log')
+	if not os.path.isdir(os.path.dirname(path)):
+		os.makedirs(os.path.dirname(path), 0o700)
+
+	with open(log_path, 'a') as log:
+		subprocess.Popen(
+			[sys.executable, os.path.abspath(__file__), 'daemon', 'start', '--foreground'],
+			stdin             = subprocess.DEVNULL,
+			stdout            = log,
+			stderr            = log,
+			close_fds         = True,
+			start_new_session = True,
+		)
+
+	for _ in range(DAEMON_START_TIMEOUT * 10):
+		if daemon.is_running(path):
+			print('Daemon started')
+			return
+
+		time.sleep(0.1)
+
+	print('The daemon did not start, see {}'.format(log_path))
+
+def command_daemon_stop(args):
+	from pb4py import daemon
+
+	try:
+		daemon.send_request(daemon.default_socket_path(), {'command': 'stop'}, timeout = 5)
+	except (OSError, pb4py.exceptions.PB4PyDaemonException):
+		print('The daemon is not running')
+		return
+
+	print('Daemon stopped')
+
+def command_daemon_status(args):
+	from pb4py import daemon
+
+	try:
+		status = daemon.send_request(daemon.default_socket_path(), {'command': 'status'}, timeout = 5)
+	except (OSError, pb4py.exceptions.PB4PyDaemonException):
+		print('The daemon is not running')
+		return
+
+	print('Daemon running with pid {}, up {:.0f} seconds, {} commands served'.format(
+		status['pid'],
+		time.time() - status['started'],
+		status['requests'],
+	))
+
+DAEMON_START_TIMEOUT = 10
+
+# Cache settings for the daemon's client when the config has none, so device
+# and contact lists are kept between commands.
+DAEMON_CACHE_SETTINGS = {
+	'ttl': {
+		'/v2/contacts': 60,
+	},
+}
+
+# Commands that are never sent to the daemon because they don't use a
+# client or run until interrupted
+LOCAL_COMMANDS = frozenset(['generate-config', 'daemon', 'stream'])
+
+def forwardable(argv):
+	"""
+	Whether the command can be run by the daemon. Commands that ask for
+	confirmation on stdin (see interactive) are run locally unless they are
+	given --yes.
+	"""
+
+	from pb4py import daemon
+
+	# Parsing is only worth it when there is a daemon to send the command to
+	if not os.path.exists(daemon.default_socket_path()):
+		return False
+
+	positional = [arg for arg in argv if not arg.startswith('-')]
+
+	if not positional or positional[0] in LOCAL_COMMANDS:
+		return False
+
+	args = parse_args(argv)
+
+	return not getattr(getattr(args, 'func', None), 'interactive', False) or getattr(args, 'yes', False)
+
+def forward_to_daemon(argv):
+	"""
+	Run the command in the daemon. Returns the daemon's reply, or None if no
+	daemon is running.
+	"""
+
+	from pb4py import daemon
+
+	path = daemon.default_socket_path()
+	if not os.path.exists(path):
+		return None
+
+	try:
+		daemon.check_private(os.path.dirname(path))
+	except pb4py.exceptions.PB4PyDaemonException as ex:
+		print('Not using the daemon: {}'.format(ex), file = sys.stderr)
+		return None
+
+	try:
+		return daemon.send_request(path, {'command': 'run', 'argv': argv, 'cwd': os.getcwd()})
+	except OSError:
+		return None
+
+def invalidate_daemon(paths):
+	"""
+	Tell a running daemon that a command run locally changed the collections
+	of paths, so it doesn't keep serving its cached copies of them.
+	"""
+
+	from pb4py import daemon
+
+	path = daemon.default_socket_path()
+	if not os.path.exists(path):
+		return
+
+	try:
+		daemon.send_request(path, {'command': 'invalidate', 'paths': paths}, timeout = 5)
+	except OSError:
+		# Nothing is listening, so nothing is cached either
+		pass
+	except pb4py.exceptions.PB4PyDaemonException as ex:
+		print('Unable to update the daemon, restart it if it shows stale data: {}'.format(ex), file = sys.stderr)
+
+def run_forwarded(request):
+	"""
+	Run a command sent to the daemon and capture what it prints. Commands are
+	run in the working directory of the CLI that sent them so relative paths
+	work. A command that turns out to need stdin is handed back to the CLI.
+	"invalidate" requests from commands run locally drop the daemon's cached
+	copies of the collections they changed.
+	"""
+
+	if request.get('command') == 'invalidate':
+		for path in request.get('paths', []):
+			daemon_client._invalidate(path)
+
+		return {'invalidated': len(request.get('paths', []))}
+
+	stdout = io.StringIO()
+	stderr = io.StringIO()
+	status = 0
+	cwd    = os.getcwd()
+
+	try:
+		os.chdir(request.get('cwd', cwd))
+
+		with contextlib.redirect_stdout(stdout), contextlib.redirect_stderr(stderr):
+			try:
+				main(request['argv'])
+			except SystemExit as ex:
+				status = ex.code if isinstance(ex.code, int) else int(ex.code is not None)
+			except NeedsTerminal:
+				return {'local': True}
+	finally:
+		os.chdir(cwd)
+
+	return {
+		'stdout': stdout.getvalue(),
+		'stderr': stderr.getvalue(),
+		'status': status,
+	}
+
+def serve_daemon(path):
+	global daemon_client
+
+	from pb4py import daemon
+	from pb4py.cache import ResponseCache
+
+	client = pb4py.Client()
+	if client.cache is None:
+		client.cache = ResponseCache(DAEMON_CACHE_SETTINGS)
+
+	# Open a connection and fill the cache before the first command
+	try:
+		client.devices()
+		client.contacts()
+	except pb4py.exceptions.PB4PyException as ex:
+		print('Unable to warm up the client: {}'.format(ex), file = sys.stderr)
+
+	daemon_client = client
+
+	try:
+		daemon.Daemon(run_forwarded, path).serve_forever()
+	finally:
+		daemon_client = None
+		client.close()
+
+
+
+def main(argv = None):
+	argv = sys.argv[1:] if argv is None else argv
+
+	if daemon_client is None and forwardable(argv):
+		try:
+			reply = forward_to_daemon(argv)
+		except pb4py.exceptions.PB4PyException as ex:
+			print(ex)
+			sys.exit(1)
+
+		if reply is not None and not reply.get('local'):
+			if 'error' in reply:
+				print(reply['error'], file = sys.stderr)
+				sys.exit(1)
+
+			sys.stdout.write(reply['stdout'])
+			sys.stderr.write(reply['stderr'])
+
+			if reply['status']:
+				sys.exit(reply['status'])
 
+			return
 
-def main():
-	args = parse_args()
+	args = parse_args(argv)
 
 	try:
 		args.func(args)
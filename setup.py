@@ -17,9 +17,14 @@ setup(
 	scripts          = [os.path.join('scripts', 'pb4.py')],
 	keywords         = ['PushBullet', 'notifications', 'messaging'],
 	classifiers      = [],
+	python_requires  = '>=3.7',
 	install_requires = [
 		'requests',
 		'tabulate',
 	],
+	extras_require   = {
+		'async': ['aiohttp'],
+		'fast':  ['orjson'],
+	},
 )
 
@@ -0,0 +1,46 @@
+import pb4py
+
+from pb4py.cache import ResponseCache
+from pb4py.transport import BufferedResponse
+
+DEVICES = b'{"devices": []}'
+
+def test_revalidates_with_a_lower_case_etag():
+	cache = ResponseCache({'ttl': {'/v2/devices': 60}})
+	key   = ('/v2/devices', None)
+
+	cache.store(key, BufferedResponse(200, {'etag': '"abc"'}, DEVICES))
+	cache.entries[key].expires = 0
+
+	kwargs = {}
+	assert cache.lookup(key, kwargs) is None
+	assert kwargs['headers'] == {'If-None-Match': '"abc"'}
+
+	resp = cache.store(key, BufferedResponse(304, {}, b''))
+	assert resp.status_code == 200
+	assert resp.content == DEVICES
+	assert cache.revalidations == 1
+
+def test_refetches_when_a_revalidated_entry_was_evicted():
+	client = pb4py.Client({'auth': {'type': 'basic', 'access_token': 'cache'}, 'cache': {}})
+	sent   = []
+
+	def request(method, url, **kwargs):
+		headers = kwargs.get('headers') or {}
+		sent.append(headers)
+
+		if 'If-None-Match' in headers:
+			# Evicted between the lookup and the 304 coming back
+			client.cache.entries.clear()
+			return BufferedResponse(304, {}, b'')
+
+		return BufferedResponse(200, {'ETag': '"abc"'}, DEVICES)
+
+	client.transport.request = request
+
+	list(client.devices())
+	for entry in client.cache.entries.values():
+		entry.expires = 0
+
+	assert list(client.devices()) == []
+	assert [h.get('If-None-Match') for h in sent] == [None, '"abc"', None]
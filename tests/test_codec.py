@@ -0,0 +1,65 @@
+import json
+import random
+
+import pytest
+
+from pb4py.codec import ListDecoder
+
+VALUES = [
+	0, 1, -2, 3.5, -0.25, 1e5, -1.5e-3, 123456789,
+	'text', '', 'café ☃', None, True, False,
+	{'a': -1.5, 'b': [1, 2.0]}, [3, -4e2], {},
+]
+
+def decode(chunks, key = 'pushes'):
+	decoder  = ListDecoder(key)
+	elements = []
+
+	for chunk in chunks:
+		elements.extend(decoder.feed(chunk))
+
+	decoder.close()
+
+	return elements, decoder.rest
+
+def split(data, rnd):
+	cuts = sorted(rnd.sample(range(1, len(data)), min(len(data) - 1, rnd.randint(1, 12))))
+
+	return [data[start:end] for start, end in zip([0] + cuts, cuts + [len(data)])]
+
+def test_whole_document():
+	doc = {'cursor': 'abc', 'pushes': VALUES}
+
+	assert decode([json.dumps(doc).encode('utf-8')]) == (VALUES, {'cursor': 'abc'})
+
+@pytest.mark.parametrize('seed', range(10))
+def test_random_chunk_boundaries(seed):
+	rnd = random.Random(seed)
+
+	for _ in range(300):
+		doc = {
+			'pushes': [rnd.choice(VALUES) for _ in range(rnd.randint(0, 8))],
+			'cursor': rnd.choice([None, 'next', 12, -3.5, 1e-7]),
+		}
+
+		data = json.dumps(doc, separators = rnd.choice([(',', ':'), (', ', ': ')]), ensure_ascii = False).encode('utf-8')
+
+		assert decode(split(data, rnd)) == (doc['pushes'], {'cursor': doc['cursor']})
+
+@pytest.mark.parametrize('number', ['1.5', '-2', '100000.0', '-1.5e-3', '2E+10'])
+def test_every_split_of_a_number(number):
+	data = '{{"pushes":[{0},{0}],"cursor":{0}}}'.format(number).encode('utf-8')
+
+	for cut in range(1, len(data)):
+		assert decode([data[:cut], data[cut:]]) == ([json.loads(number)] * 2, {'cursor': json.loads(number)})
+
+def test_one_byte_at_a_time():
+	doc  = {'pushes': VALUES, 'cursor': None}
+	data = json.dumps(doc, ensure_ascii = False).encode('utf-8')
+
+	assert decode([data[i:i + 1] for i in range(len(data))]) == (VALUES, {'cursor': None})
+
+@pytest.mark.parametrize('data', [b'{"pushes":[1,2', b'{"pushes":[1 2]}', b'{"pushes":[1.x]}'])
+def test_invalid_documents(data):
+	with pytest.raises(ValueError):
+		decode([data])
@@ -0,0 +1,88 @@
+import pytest
+
+import pb4py
+
+from pb4py import exceptions
+from pb4py.outbox import Outbox
+
+class FakeClient(object):
+	"""
+	Stands in for Client, raising the queued errors from push() before it
+	starts succeeding.
+	"""
+
+	def __init__(self, errors):
+		self.errors = list(errors)
+		self.pushed = []
+
+	def _check_push_type(self, push_type):
+		pass
+
+	def push(self, push_type, guid = None, **kwargs):
+		if self.errors:
+			raise self.errors.pop(0)
+
+		self.pushed.append(guid)
+
+		return {'iden': 'iden-' + guid}
+
+	def iter_push_history(self, **kwargs):
+		return iter([])
+
+def open_outbox(tmp_path, client, **settings):
+	settings.setdefault('workers', 1)
+	settings.setdefault('backoff', 0.01)
+
+	return Outbox(client, str(tmp_path / 'outbox.db'), settings)
+
+def test_unexpected_error_fails_the_push(tmp_path):
+	client = FakeClient([RuntimeError('boom')])
+
+	with open_outbox(tmp_path, client) as outbox:
+		guids = [outbox.enqueue('note', title = str(i)) for i in range(5)]
+
+		assert outbox.drain(timeout = 3)
+
+		failed = outbox.status(guids[0])
+		assert failed['state'] == Outbox.FAILED
+		assert 'RuntimeError: boom' in failed['error']
+
+		# The worker survived and sent everything after it
+		assert client.pushed == guids[1:]
+		assert outbox.counts() == {Outbox.FAILED: 1, Outbox.SENT: 4}
+
+def test_retryable_error_is_retried(tmp_path):
+	client = FakeClient([exceptions.PB4PyServerException('unavailable', status_code = 503)])
+
+	with open_outbox(tmp_path, client) as outbox:
+		guid = outbox.enqueue('note', title = 'retried')
+
+		assert outbox.drain(timeout = 3)
+		assert outbox.status(guid)['state'] == Outbox.SENT
+		assert outbox.status(guid)['attempts'] == 2
+
+def test_unexpected_error_while_recovering(tmp_path):
+	client = FakeClient([])
+
+	# Without workers the push is journaled but stays pending
+	with open_outbox(tmp_path, client, workers = 0) as outbox:
+		outbox.enqueue('note', title = 'left over')
+		outbox.flush()
+
+	def broken_history(**kwargs):
+		raise RuntimeError('history unavailable')
+
+	client.iter_push_history = broken_history
+
+	# The push can't be checked against the history before it is sent again
+	# so it fails, without stopping the journal or the workers
+	with open_outbox(tmp_path, client) as outbox:
+		assert outbox.drain(timeout = 3)
+		assert outbox.counts() == {Outbox.FAILED: 1}
+		assert client.pushed == []
+
+def test_async_client_has_no_outbox():
+	client = pb4py.AsyncClient({'auth': {'type': 'basic', 'access_token': 'outbox'}})
+
+	with pytest.raises(TypeError):
+		client.outbox
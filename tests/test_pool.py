@@ -0,0 +1,29 @@
+import time
+
+import pb4py
+
+def limit_headers(remaining, reset):
+	return {
+		'X-Ratelimit-Limit':     '100',
+		'X-Ratelimit-Remaining': str(remaining),
+		'X-Ratelimit-Reset':     str(reset),
+	}
+
+def test_evicted_accounts_keep_their_rate_limit():
+	with pb4py.ClientPool({'pool': {'max_clients': 1}}) as pool:
+		scheduler = pool.scheduler
+
+		pool.client('limited')
+		scheduler.rate_limit('limited').update(limit_headers(0, time.time() + 60))
+
+		pool.client('reset')
+		scheduler.rate_limit('reset').update(limit_headers(0, time.time() - 1))
+
+		# Evicting "reset" drops its limit, which has been reset since, but
+		# not the one "limited" is still held to
+		pool.client('other')
+		pool.client('limited')
+
+		assert len(pool) == 1
+		assert 'reset' not in scheduler.rate_limits
+		assert scheduler.throttle_delay('limited') > 50
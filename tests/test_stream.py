@@ -0,0 +1,147 @@
+import asyncio
+import base64
+import hashlib
+import socket
+import threading
+import time
+
+import pytest
+
+import pb4py
+
+from pb4py import exceptions
+from pb4py.stream import WEBSOCKET_GUID
+
+class DroppingServer(object):
+	"""
+	Websocket server that completes the handshake and then hangs up
+	straight away, counting the connections.
+	"""
+
+	def __init__(self):
+		self.sock = socket.socket()
+		self.sock.bind(('127.0.0.1', 0))
+		self.sock.listen(16)
+
+		self.connections = 0
+		self.url         = 'ws://127.0.0.1:{}/'.format(self.sock.getsockname()[1])
+
+		self.thread = threading.Thread(target = self._serve)
+		self.thread.daemon = True
+		self.thread.start()
+
+	def _serve(self):
+		while True:
+			try:
+				conn, _ = self.sock.accept()
+			except OSError:
+				return
+
+			with conn:
+				request = b''
+				while b'\r\n\r\n' not in request:
+					chunk = conn.recv(4096)
+					if not chunk:
+						break
+
+					request += chunk
+
+				key = None
+				for line in request.decode('latin-1').split('\r\n'):
+					name, _, value = line.partition(':')
+					if name.lower() == 'sec-websocket-key':
+						key = value.strip()
+
+				if key is None:
+					continue
+
+				accept = base64.b64encode(hashlib.sha1((key + WEBSOCKET_GUID).encode('ascii')).digest()).decode('ascii')
+
+				self.connections += 1
+				conn.sendall((
+					'HTTP/1.1 101 Switching Protocols\r\n'
+					'Upgrade: websocket\r\n'
+					'Connection: Upgrade\r\n'
+					'Sec-WebSocket-Accept: {}\r\n\r\n'
+				).format(accept).encode('ascii'))
+
+	def close(self):
+		self.sock.close()
+
+@pytest.fixture
+def server():
+	server = DroppingServer()
+	yield server
+	server.close()
+
+def stream_settings(server):
+	return {
+		'auth':   {'type': 'basic', 'access_token': 'token'},
+		'stream': {'url': server.url, 'backoff': 0.02, 'max_backoff': 0.2},
+	}
+
+def test_dropped_connections_back_off(server):
+	client  = pb4py.Client(stream_settings(server))
+	stopped = threading.Event()
+
+	def iter_push_history(**kwargs):
+		if stopped.is_set():
+			raise exceptions.PB4PyAuthenticationException('stop')
+
+		return iter([])
+
+	client.iter_push_history = iter_push_history
+
+	stream = client.stream()
+	ended  = threading.Event()
+
+	def consume():
+		try:
+			list(stream)
+		except exceptions.PB4PyAuthenticationException:
+			ended.set()
+
+	thread = threading.Thread(target = consume)
+	thread.daemon = True
+	thread.start()
+
+	time.sleep(1)
+	stopped.set()
+	thread.join(2)
+
+	assert ended.is_set()
+	assert 3 <= server.connections <= 15
+	assert stream.attempts >= 3
+
+def test_dropped_connections_back_off_async(server):
+	client  = pb4py.AsyncClient(stream_settings(server))
+	stopped = []
+
+	async def iter_push_history(**kwargs):
+		if stopped:
+			raise exceptions.PB4PyAuthenticationException('stop')
+
+		for push in []:
+			yield push
+
+	client.iter_push_history = iter_push_history
+
+	stream = client.stream()
+
+	async def consume():
+		async for _ in stream:
+			pass
+
+	async def run():
+		task = asyncio.ensure_future(consume())
+
+		await asyncio.sleep(1)
+		stopped.append(True)
+
+		with pytest.raises(exceptions.PB4PyAuthenticationException):
+			await asyncio.wait_for(task, 2)
+
+	asyncio.run(run())
+
+	assert 3 <= server.connections <= 15
+	assert stream.attempts >= 3
@@ -0,0 +1,95 @@
+import collections
+import threading
+
+import pb4py
+
+from benchmarks.mock_server import MockServer, MockState
+
+THREADS    = 8
+OPERATIONS = 15
+DEVICES    = 3
+
+def run_threads(target, count):
+	errors  = []
+	threads = []
+
+	def run(index):
+		try:
+			target(index)
+		except Exception as ex: # pylint: disable=broad-except
+			errors.append(ex)
+
+	for index in range(count):
+		threads.append(threading.Thread(target = run, args = (index,)))
+		threads[-1].start()
+
+	for thread in threads:
+		thread.join()
+
+	return errors
+
+def test_shared_client():
+	state = MockState(devices = DEVICES)
+
+	with MockServer(state) as server:
+		settings = {
+			'auth':      {'type': 'basic', 'access_token': 'threads'},
+			'api_root':  server.api_root,
+			'metrics':   {},
+			'cache':     {},
+			'transport': {'pool_maxsize': 4},
+		}
+
+		with pb4py.Client(settings) as client:
+			titles  = collections.defaultdict(list)
+			devices = []
+
+			def work(index):
+				for i in range(OPERATIONS):
+					title = 'thread {} push {}'.format(index, i)
+					push  = client.push('note', email = 'target@example.com', title = title, body = 'body')
+					titles[index].append((title, push['title']))
+
+					client.dismiss_push(push['iden'])
+					devices.append(len(client.devices()))
+
+			assert run_threads(work, THREADS) == []
+
+			sent = sum(
+				endpoint['requests'] - endpoint['cache_hits'] - endpoint['coalesced'] + endpoint['retries']
+				for endpoint in client.metrics.snapshot().values()
+			)
+
+			assert sent == state.requests
+			assert client.scheduler.rate_limit('threads').limit == 16384
+
+	created = collections.Counter(push['title'] for push in state.data['pushes'])
+
+	assert all(sent == received for pushes in titles.values() for sent, received in pushes)
+	assert len(created) == THREADS * OPERATIONS
+	assert set(created.values()) == {1}
+	assert all(push['dismissed'] for push in state.data['pushes'])
+	assert devices == [DEVICES] * (THREADS * OPERATIONS)
+
+def test_shared_pool():
+	state = MockState(devices = DEVICES)
+
+	with MockServer(state) as server:
+		settings = {
+			'auth':     {'type': 'basic'},
+			'api_root': server.api_root,
+			'cache':    {},
+			'pool':     {'max_clients': 2},
+		}
+
+		with pb4py.ClientPool(settings) as pool:
+			def work(index):
+				futures = [
+					pool.submit('account-{}'.format((index + i) % 5), lambda client: len(client.devices()))
+					for i in range(OPERATIONS)
+				]
+
+				assert [future.result() for future in futures] == [DEVICES] * OPERATIONS
+
+			assert run_threads(work, THREADS) == []
+			assert pool.cache.stats()['hits'] > 0